@@ -0,0 +1,34 @@
+"""
+The asyncio benchmark scenario. It requires Python 3.6 or later.
+"""
+
+import asyncio
+
+def run_async(workload, ids, concurrency, url):
+    """
+    Make the requests of a scenario with the asyncio API.
+
+    :param workload: The workload function. It is called with the aio module and an identifier.
+    :param ids: The identifiers to request, in order.
+    :param concurrency: The number of simultaneous requests.
+    :param url: The fake API server URL.
+    """
+
+    from pythemoviedb.api import aio
+
+    async def main():
+        ids_iterator = iter(ids)
+
+        async def worker():
+            for _id in ids_iterator:
+                await workload(aio, _id)
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        aio.get_transport(url).close()
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
@@ -0,0 +1,77 @@
+"""
+Compare two benchmark result files written by `run.py`.
+
+Run it with:
+
+    python benchmarks/compare.py before.json after.json
+"""
+
+import argparse
+import json
+import sys
+
+METRICS = [
+    ('requests_per_second', 'req/s', True),
+    ('latency_p50', 'p50', False),
+    ('latency_p95', 'p95', False),
+    ('latency_p99', 'p99', False),
+    ('cpu_per_request', 'cpu/req', False),
+    ('peak_memory', 'peak mem', False),
+]
+
+def load_results(path):
+    """
+    Load a result file.
+
+    :returns: A dictionary of scenario names and results.
+    """
+
+    with open(path) as result_file:
+        return dict((result['scenario'], result) for result in json.load(result_file)['results'])
+
+def compare(before, after):
+    """
+    Compare two sets of results.
+
+    :returns: A list of (scenario, label, before, after, change, better) tuples, where change is relative.
+    """
+
+    rows = []
+
+    for scenario in sorted(set(before) & set(after)):
+        for key, label, higher_is_better in METRICS:
+            old_value = before[scenario].get(key)
+            new_value = after[scenario].get(key)
+
+            if not old_value or new_value is None:
+                continue
+
+            change = (new_value - old_value) / float(old_value)
+            better = change > 0 if higher_is_better else change < 0
+            rows.append((scenario, label, old_value, new_value, change, better))
+
+    return rows
+
+def main(args=sys.argv[1:]):
+    """
+    Print the comparison of two result files.
+    """
+
+    parser = argparse.ArgumentParser(description='Compare two pyTheMovieDB benchmark result files.')
+    parser.add_argument('before', help='The reference result file.')
+    parser.add_argument('after', help='The new result file.')
+    parser.add_argument('--threshold', type=float, default=5.0, help='The relative change, in percent, under which a change is considered noise.')
+    args = parser.parse_args(args)
+
+    print('%-12s %-10s %14s %14s %9s' % ('scenario', 'metric', 'before', 'after', 'change'))
+
+    for scenario, label, old_value, new_value, change, better in compare(load_results(args.before), load_results(args.after)):
+        if abs(change) * 100 < args.threshold:
+            verdict = ''
+        else:
+            verdict = 'better' if better else 'WORSE'
+
+        print('%-12s %-10s %14.6g %14.6g %+8.1f%% %s' % (scenario, label, old_value, new_value, change * 100, verdict))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,413 @@
+"""
+A local fake TMDb API server.
+
+It serves the JSON fixtures of the `fixtures` directory for the most common
+actions, with a configurable latency and payload size, over keep-alive
+HTTP/1.1 connections. Any API key is accepted. Like the real API, it
+compresses the responses for the clients that accept gzip or deflate, and
+answers conditional requests whose ETag or date matches with a 304.
+
+Run it with:
+
+    python benchmarks/fake_server.py --port 8080 --latency 20
+
+and point pythemoviedb at it with PYTHEMOVIEDB_API_URL=http://127.0.0.1:8080.
+"""
+
+import argparse
+import copy
+import email.utils
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import zlib
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    import urlparse
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    import urllib.parse as urlparse
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+MOVIE_SUB_RESOURCES = (
+    'alternative_titles',
+    'casts',
+    'images',
+    'keywords',
+    'releases',
+    'trailers',
+    'translations',
+    'similar_movies',
+    'lists',
+)
+
+def load_fixture(name):
+    """
+    Load a fixture.
+
+    :param name: The fixture name, without extension.
+    :returns: The fixture data.
+    """
+
+    with open(os.path.join(FIXTURES_DIRECTORY, name + '.json')) as fixture_file:
+        return json.load(fixture_file)
+
+def scale_lists(data, scale):
+    """
+    Repeat the items of the lists of a payload.
+
+    :param data: The payload.
+    :param scale: The number of times the items of each list are repeated.
+    :returns: The scaled payload.
+    """
+
+    if isinstance(data, dict):
+        return dict((key, scale_lists(value, scale)) for key, value in data.items())
+    elif isinstance(data, list):
+        return [scale_lists(value, scale) for value in data] * scale
+
+    return data
+
+class FakeAPI(object):
+    """
+    The fake API: maps actions to responses.
+    """
+
+    def __init__(self, payload_scale=1):
+        """
+        Load the fixtures.
+
+        :param payload_scale: The number of times the items of the payload lists are repeated.
+        """
+
+        self.fixtures = dict(
+            (name, scale_lists(load_fixture(name), payload_scale))
+            for name in ('configuration', 'genre_list', 'movie', 'person', 'collection', 'search_movie')
+        )
+        self.routes = [
+            (re.compile(r'^configuration$'), self.get_configuration),
+            (re.compile(r'^genre/list$'), self.get_genres),
+            (re.compile(r'^movie/(\d+)$'), self.get_movie),
+            (re.compile(r'^movie/(\d+)/(%s)$' % '|'.join(MOVIE_SUB_RESOURCES)), self.get_movie_sub_resource),
+            (re.compile(r'^person/(\d+)$'), self.get_person),
+            (re.compile(r'^collection/(\d+)$'), self.get_collection),
+            (re.compile(r'^(keyword|company)/(\d+)$'), self.get_named_entity),
+            (re.compile(r'^search/movie$'), self.search_movie),
+            (re.compile(r'^(movie|person)/changes$'), self.get_changes),
+        ]
+
+    def handle(self, action, parameters):
+        """
+        Handle a request.
+
+        :param action: The action, relative to the API version.
+        :param parameters: The query string parameters.
+        :returns: A (status, data) tuple.
+        """
+
+        for regex, handler in self.routes:
+            match = regex.match(action)
+
+            if match:
+                return handler(parameters, *match.groups())
+
+        return 404, {'status_code': 6, 'status_message': 'Invalid id - The pre-requisite id is invalid or not found.'}
+
+    def get_configuration(self, parameters):
+        """
+        Serve the configuration.
+        """
+
+        return 200, self.fixtures['configuration']
+
+    def get_genres(self, parameters):
+        """
+        Serve the genre list.
+        """
+
+        return 200, self.fixtures['genre_list']
+
+    def get_movie(self, parameters, _id):
+        """
+        Serve a movie, with the requested sub-resources appended.
+        """
+
+        movie = self.fixtures['movie']
+        data = dict((key, value) for key, value in movie.items() if key not in MOVIE_SUB_RESOURCES)
+        data['id'] = int(_id)
+
+        for sub_resource in parameters.get('append_to_response', '').split(','):
+            if sub_resource in movie:
+                data[sub_resource] = movie[sub_resource]
+
+        return 200, data
+
+    def get_movie_sub_resource(self, parameters, _id, sub_resource):
+        """
+        Serve a movie sub-resource.
+        """
+
+        data = dict(self.fixtures['movie'][sub_resource], id=int(_id))
+
+        return 200, data
+
+    def get_person(self, parameters, _id):
+        """
+        Serve a person.
+        """
+
+        return 200, dict(self.fixtures['person'], id=int(_id))
+
+    def get_collection(self, parameters, _id):
+        """
+        Serve a collection.
+        """
+
+        return 200, dict(self.fixtures['collection'], id=int(_id))
+
+    def get_named_entity(self, parameters, kind, _id):
+        """
+        Serve a keyword or a company.
+        """
+
+        return 200, {'id': int(_id), 'name': '%s %s' % (kind, _id)}
+
+    def search_movie(self, parameters):
+        """
+        Serve a page of movie search results.
+        """
+
+        data = copy.copy(self.fixtures['search_movie'])
+        data['page'] = int(parameters.get('page', 1))
+
+        return 200, data
+
+    def get_changes(self, parameters, kind):
+        """
+        Serve a page of changes.
+        """
+
+        page = int(parameters.get('page', 1))
+
+        return 200, {
+            'page': page,
+            'total_pages': 3,
+            'total_results': 300,
+            'results': [{'id': (page - 1) * 100 + i, 'adult': False} for i in range(100)],
+        }
+
+def compress(body, encoding):
+    """
+    Compress a response body.
+
+    :param body: The body.
+    :param encoding: 'gzip' or 'deflate'.
+    :returns: The compressed body.
+    """
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS)
+
+    return compressor.compress(body) + compressor.flush()
+
+def get_encoding(accept_encoding):
+    """
+    Choose the encoding of a response.
+
+    :param accept_encoding: The Accept-Encoding header of the request, or None.
+    :returns: 'gzip', 'deflate' or None.
+    """
+
+    accepted = [value.split(';')[0].strip().lower() for value in (accept_encoding or '').split(',')]
+
+    for encoding in ('gzip', 'deflate'):
+        if encoding in accepted:
+            return encoding
+
+    return None
+
+def make_server(host='127.0.0.1', port=0, latency=0.0, jitter=0.0, payload_scale=1, throttle_rate=0.0, compression=True, validators=True, slow_rate=0.0, slow_latency=0.0):
+    """
+    Create a fake API server.
+
+    :param host: The address to listen on.
+    :param port: The port to listen on. 0 picks a free port.
+    :param latency: The latency added to each response, in seconds.
+    :param jitter: The maximum random latency added on top of `latency`, in seconds.
+    :param payload_scale: The number of times the items of the payload lists are repeated.
+    :param throttle_rate: The fraction of requests answered with a 429 error.
+    :param compression: True to compress the responses for the clients that accept it.
+    :param validators: True to send ETag and Last-Modified headers and to answer the matching conditional requests with a 304.
+    :param slow_rate: The fraction of requests that are slow, to simulate a latency tail.
+    :param slow_latency: The latency added to the slow requests, in seconds.
+    :returns: The server. Its `url` attribute holds its base URL, its `not_modified` attribute counts the 304 responses.
+    """
+
+    api = FakeAPI(payload_scale=payload_scale)
+    last_modified = email.utils.formatdate(time.time(), usegmt=True)
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        """
+        The fake API request handler.
+        """
+
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            """
+            Silence the request logs.
+            """
+
+            pass
+
+        def do_GET(self):
+            """
+            Handle a GET request.
+            """
+
+            parsed_url = urlparse.urlsplit(self.path)
+            parameters = dict(urlparse.parse_qsl(parsed_url.query))
+            action = parsed_url.path.strip('/').split('/', 1)[-1]
+
+            if latency or jitter:
+                time.sleep(latency + random.uniform(0, jitter))
+
+            if slow_rate and random.random() < slow_rate:
+                time.sleep(slow_latency)
+
+            if throttle_rate and random.random() < throttle_rate:
+                status, data, headers = 429, {'status_code': 25, 'status_message': 'Your request count is over the allowed limit.'}, {'Retry-After': '1'}
+            else:
+                status, data = api.handle(action, parameters)
+                headers = {}
+
+            body = json.dumps(data).encode('utf-8')
+
+            if validators and status == 200:
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                headers.update({'ETag': etag, 'Last-Modified': last_modified})
+
+                if_none_match = self.headers.get('If-None-Match')
+
+                # If-Modified-Since is ignored when If-None-Match is present (RFC 7232).
+                if if_none_match is not None:
+                    not_modified = if_none_match == etag
+                else:
+                    not_modified = self.headers.get('If-Modified-Since') == last_modified
+
+                if not_modified:
+                    server.not_modified += 1
+                    self.send_response(304)
+
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+
+                    self.end_headers()
+
+                    return
+
+            encoding = compression and get_encoding(self.headers.get('Accept-Encoding'))
+
+            if encoding:
+                body = compress(body, encoding)
+                headers.update({'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'})
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json;charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+
+            for key, value in headers.items():
+                self.send_header(key, value)
+
+            self.end_headers()
+            self.wfile.write(body)
+
+    class Server(ThreadingMixIn, HTTPServer):
+        """
+        A multi-threaded HTTP server.
+        """
+
+        daemon_threads = True
+        request_queue_size = 128
+
+        def handle_error(self, request, client_address):
+            """
+            Ignore the clients that disconnect, e.g. cancelled hedged requests.
+            """
+
+            if not isinstance(sys.exc_info()[1], socket.error):
+                HTTPServer.handle_error(self, request, client_address)
+
+    server = Server((host, port), RequestHandler)
+    server.url = 'http://%s:%s' % server.server_address[:2]
+    server.not_modified = 0
+
+    return server
+
+def start_server(**kwargs):
+    """
+    Start a fake API server in a background thread.
+
+    :param kwargs: The make_server parameters.
+    :returns: The server. Call its `shutdown` method to stop it.
+    """
+
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+def main(args=sys.argv[1:]):
+    """
+    Run the fake API server until interrupted.
+    """
+
+    parser = argparse.ArgumentParser(description='Run a local fake TMDb API server.')
+    parser.add_argument('--host', default='127.0.0.1', help='The address to listen on.')
+    parser.add_argument('--port', type=int, default=0, help='The port to listen on. 0 picks a free port.')
+    parser.add_argument('--latency', type=float, default=0.0, help='The latency added to each response, in milliseconds.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='The maximum random latency added on top of --latency, in milliseconds.')
+    parser.add_argument('--payload-scale', type=int, default=1, help='The number of times the items of the payload lists are repeated.')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='The fraction of requests answered with a 429 error.')
+    parser.add_argument('--no-compression', action='store_true', help='Never compress the responses.')
+    parser.add_argument('--no-validators', action='store_true', help='Never send validators nor answer conditional requests.')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='The fraction of requests that are slow.')
+    parser.add_argument('--slow-latency', type=float, default=0.0, help='The latency added to the slow requests, in milliseconds.')
+    args = parser.parse_args(args)
+
+    server = make_server(
+        host=args.host,
+        port=args.port,
+        latency=args.latency / 1000.0,
+        jitter=args.jitter / 1000.0,
+        payload_scale=args.payload_scale,
+        throttle_rate=args.throttle_rate,
+        compression=not args.no_compression,
+        validators=not args.no_validators,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency / 1000.0,
+    )
+
+    # The benchmark runner reads the URL from the first line of the output.
+    sys.stdout.write(server.url + '\n')
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
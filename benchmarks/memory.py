@@ -0,0 +1,80 @@
+"""
+Measure the memory used per record by the result models, compared with dictionaries.
+
+Run it from the repository root with:
+
+    python benchmarks/memory.py --records 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIRECTORY))
+
+from fake_server import MOVIE_SUB_RESOURCES, load_fixture
+from pythemoviedb.api.objects import Cast, Movie, Person
+
+def get_payloads():
+    """
+    Get the payloads to measure.
+
+    :returns: A list of (name, model_class, body) tuples.
+    """
+
+    movie = load_fixture('movie')
+
+    return [
+        ('movie', Movie, json.dumps(dict((key, value) for key, value in movie.items() if key not in MOVIE_SUB_RESOURCES))),
+        ('person', Person, json.dumps(load_fixture('person'))),
+        ('cast', Cast, json.dumps(movie['casts']['cast'][0])),
+    ]
+
+def measure(build, count):
+    """
+    Measure the memory retained by records.
+
+    :param build: A function that builds a record.
+    :param count: The number of records to build.
+    :returns: The number of bytes retained per record.
+    """
+
+    tracemalloc.start()
+    records = [build() for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del records
+
+    return size / float(count)
+
+def main(args=sys.argv[1:]):
+    """
+    Print the memory used per record.
+    """
+
+    parser = argparse.ArgumentParser(description='Measure the memory used per record by the result models.')
+    parser.add_argument('--records', type=int, default=5000, help='The number of records built for each measurement.')
+    args = parser.parse_args(args)
+
+    if tracemalloc is None:
+        sys.exit('This benchmark requires the tracemalloc module (Python 3.4 or later).')
+
+    print('%-10s %12s %12s %10s' % ('record', 'dict (B)', 'model (B)', 'saving'))
+
+    for name, model_class, body in get_payloads():
+        dict_size = measure(lambda: json.loads(body), args.records)
+        model_size = measure(lambda: model_class(json.loads(body)), args.records)
+
+        print('%-10s %12.0f %12.0f %9.0f%%' % (name, dict_size, model_size, (1 - model_size / dict_size) * 100))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+The pyTheMovieDB benchmark runner.
+
+It starts the fake API server in a subprocess, runs each scenario against it
+and reports, for each of them, the throughput, the latency percentiles, the
+CPU time per request and, measured in a second untimed pass, the peak
+memory. Results are written as JSON so that two runs can be compared with
+`compare.py`.
+
+Run it from the repository root with:
+
+    python benchmarks/run.py --requests 2000 --latency 5 --output results.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIRECTORY))
+sys.path.insert(0, BENCHMARKS_DIRECTORY)
+
+WORKLOADS = {
+    'movie': lambda methods, _id: methods.get_movie(_id),
+    'movie_all': lambda methods, _id: methods.get_movie_all(_id),
+    'search': lambda methods, _id: methods.search_movie('title %s' % _id),
+    'configuration': lambda methods, _id: methods.get_configuration(),
+}
+
+SCENARIOS = ['sequential', 'pooled', 'cached', 'hedged', 'concurrent', 'async']
+
+def start_server(latency, jitter, payload_scale, slow_rate=0.0, slow_latency=0.0):
+    """
+    Start the fake API server in a subprocess.
+
+    :returns: A (process, url) tuple.
+    """
+
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(BENCHMARKS_DIRECTORY, 'fake_server.py'),
+            '--latency', str(latency),
+            '--jitter', str(jitter),
+            '--payload-scale', str(payload_scale),
+            '--slow-rate', str(slow_rate),
+            '--slow-latency', str(slow_latency),
+        ],
+        stdout=subprocess.PIPE,
+    )
+    url = process.stdout.readline().decode('ascii').strip()
+
+    return process, url
+
+def percentile(sorted_values, fraction):
+    """
+    Get a percentile of sorted values, by the nearest-rank method.
+    """
+
+    from pythemoviedb.api.instrumentation import percentile
+
+    return percentile(sorted_values, fraction) if sorted_values else None
+
+class Scenario(object):
+    """
+    A benchmark scenario: sets the library up, then makes the requests.
+    """
+
+    def __init__(self, name, workload, ids, concurrency):
+        """
+        Create a scenario.
+
+        :param name: The scenario name.
+        :param workload: The workload name.
+        :param ids: The identifiers to request, in order.
+        :param concurrency: The number of simultaneous requests, for the concurrent scenarios.
+        """
+
+        self.name = name
+        self.workload = WORKLOADS[workload]
+        self.ids = ids
+        self.concurrency = concurrency
+
+    def setup(self, url):
+        """
+        Reset the shared state of the library for the scenario.
+        """
+
+        from pythemoviedb.api import cache, hedging, transport
+
+        transport.set_transport(transport.Transport(url, pool_size=max(self.concurrency, 1)))
+        cache.set_cache(cache.MemoryCache() if self.name == 'cached' else None)
+        hedging.set_hedge_policy(hedging.HedgePolicy() if self.name == 'hedged' else None)
+
+    def run(self, url):
+        """
+        Make the requests of the scenario.
+        """
+
+        from pythemoviedb.api import methods, transport
+
+        if self.name == 'sequential':
+            # Close the connection after each request, as make_request used to.
+            shared_transport = transport.get_transport(url)
+
+            for _id in self.ids:
+                self.workload(methods, _id)
+                shared_transport.close()
+
+        elif self.name in ('pooled', 'cached', 'hedged'):
+            for _id in self.ids:
+                self.workload(methods, _id)
+
+        elif self.name == 'concurrent':
+            ids = iter(self.ids)
+            lock = threading.Lock()
+
+            def worker():
+                while True:
+                    with lock:
+                        _id = next(ids, None)
+
+                    if _id is None:
+                        return
+
+                    self.workload(methods, _id)
+
+            threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+        elif self.name == 'async':
+            # Imported lazily: the asyncio scenario is not valid Python 2 syntax.
+            from async_scenario import run_async
+
+            run_async(self.workload, self.ids, self.concurrency, url)
+
+def measure_peak_memory(scenario, url):
+    """
+    Run a scenario again to measure its peak memory.
+
+    Tracing the allocations slows the Python code down several times, so it
+    is done in a pass of its own rather than in the timed one.
+
+    :returns: A (peak_memory, method) tuple. The peak memory is in bytes, or None if it cannot be measured.
+    """
+
+    if tracemalloc is None:
+        if resource is None:
+            return None, None
+
+        # The peak of the whole process so far, which includes the timed pass.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, 'ru_maxrss'
+
+    scenario.setup(url)
+    tracemalloc.start()
+
+    try:
+        scenario.run(url)
+
+        return tracemalloc.get_traced_memory()[1], 'tracemalloc'
+
+    finally:
+        tracemalloc.stop()
+
+def run_scenario(scenario, url):
+    """
+    Run a scenario and measure it.
+
+    :returns: A dictionary of results.
+    """
+
+    from pythemoviedb.api import instrumentation
+
+    latencies = []
+
+    def hook(event):
+        latencies.append(event.total_time)
+
+    scenario.setup(url)
+    instrumentation.add_hook(hook)
+
+    start_times = os.times()
+    start = time.time()
+
+    try:
+        scenario.run(url)
+
+    finally:
+        duration = time.time() - start
+        stop_times = os.times()
+        instrumentation.remove_hook(hook)
+
+    peak_memory, peak_memory_method = measure_peak_memory(scenario, url)
+    cpu_time = (stop_times[0] - start_times[0]) + (stop_times[1] - start_times[1])
+    latencies.sort()
+    count = len(scenario.ids)
+
+    return {
+        'scenario': scenario.name,
+        'requests': count,
+        'duration': duration,
+        'requests_per_second': count / duration if duration else None,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p95': percentile(latencies, 0.95),
+        'latency_p99': percentile(latencies, 0.99),
+        'cpu_per_request': cpu_time / count if count else None,
+        'peak_memory': peak_memory,
+        'peak_memory_method': peak_memory_method,
+    }
+
+def format_results(results):
+    """
+    Format results as a text table.
+    """
+
+    def format_value(value, scale=1.0, pattern='%10.2f'):
+        return pattern % (value * scale) if value is not None else '%10s' % '-'
+
+    lines = ['%-12s %10s %10s %10s %10s %10s %12s' % ('scenario', 'req/s', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'cpu (ms)', 'peak (KiB)')]
+
+    for result in results:
+        lines.append('%-12s %s %s %s %s %s %12s' % (
+            result['scenario'],
+            format_value(result['requests_per_second'], pattern='%10.1f'),
+            format_value(result['latency_p50'], 1000),
+            format_value(result['latency_p95'], 1000),
+            format_value(result['latency_p99'], 1000),
+            format_value(result['cpu_per_request'], 1000, '%10.3f'),
+            '%12d' % (result['peak_memory'] // 1024) if result['peak_memory'] is not None else '-',
+        ))
+
+    return '\n'.join(lines)
+
+def main(args=sys.argv[1:]):
+    """
+    Run the benchmarks.
+    """
+
+    parser = argparse.ArgumentParser(description='Benchmark pyTheMovieDB against a local fake API server.')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='A scenario to run. Can be repeated. Defaults to all the scenarios available.')
+    parser.add_argument('--workload', choices=sorted(WORKLOADS), default='movie', help='The request made by the scenarios.')
+    parser.add_argument('--requests', type=int, default=1000, help='The number of requests per scenario.')
+    parser.add_argument('--distinct-ids', type=int, default=100, help='The number of distinct identifiers requested.')
+    parser.add_argument('--concurrency', type=int, default=10, help='The number of simultaneous requests of the concurrent scenarios.')
+    parser.add_argument('--latency', type=float, default=0.0, help='The server latency, in milliseconds.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='The maximum random latency added on top of --latency, in milliseconds.')
+    parser.add_argument('--payload-scale', type=int, default=1, help='The number of times the items of the payload lists are repeated.')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='The fraction of requests the server answers slowly, to simulate a latency tail.')
+    parser.add_argument('--slow-latency', type=float, default=0.0, help='The latency added to the slow requests, in milliseconds.')
+    parser.add_argument('--seed', type=int, default=0, help='The random seed of the identifiers sequence.')
+    parser.add_argument('--output', help='The file where the JSON results are written.')
+    args = parser.parse_args(args)
+
+    scenarios = args.scenario or [scenario for scenario in SCENARIOS if scenario != 'async' or sys.version_info >= (3, 6)]
+    random.seed(args.seed)
+    ids = [random.randint(1, args.distinct_ids) for _ in range(args.requests)]
+
+    process, url = start_server(args.latency, args.jitter, args.payload_scale, args.slow_rate, args.slow_latency)
+
+    try:
+        # The shared client reads the API URL and key on first use.
+        os.environ['PYTHEMOVIEDB_API_URL'] = url
+        os.environ.setdefault('PYTHEMOVIEDB_API_KEY', 'benchmark')
+
+        results = [run_scenario(Scenario(name, args.workload, ids, args.concurrency), url) for name in scenarios]
+
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({
+                'date': datetime.datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'parameters': vars(args),
+                'results': results,
+            }, output_file, indent=4, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
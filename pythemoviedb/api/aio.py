@@ -0,0 +1,800 @@
+"""
+The asyncio API methods.
+
+This module provides a coroutine for each request function of
+`pythemoviedb.api.methods`, with the same name and the same parameters. It
+requires Python 3.6 or later.
+"""
+
+import pythemoviedb.configuration as configuration
+import pythemoviedb.api.methods as methods
+from pythemoviedb.api.request import BodyFetch, RequestAttempts, build_query_string, decode_body
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.transport import Response, decode_content
+from pythemoviedb.api.instrumentation import RequestEvent, emit, get_endpoint, has_hooks
+from pythemoviedb.api.error import APIError
+from pythemoviedb.api.client import get_client
+from pythemoviedb.api.hedging import can_win, get_hedge_policy
+from pythemoviedb.api.prefetch import get_prefetcher
+
+import asyncio
+import collections
+import functools
+import inspect
+import socket
+import time
+import weakref
+
+import urllib.parse as urlparse
+
+TRANSIENT_ERRORS = (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError)
+
+class AsyncTransport(object):
+    """
+    A pool of persistent HTTP/1.1 connections to a single host, for asyncio.
+
+    At most `pool_size` requests are in flight at the same time: the others
+    wait on a semaphore until a connection is released.
+    """
+
+    def __init__(self, base_url=configuration.API_URL, pool_size=configuration.POOL_SIZE, timeout=configuration.TIMEOUT):
+        """
+        Create an asynchronous transport.
+
+        :param base_url: The URL of the host to connect to. Only the scheme and the network location are used.
+        :param pool_size: The maximum number of simultaneous connections and requests.
+        :param timeout: The timeout of a request, in seconds.
+        """
+
+        parsed_url = urlparse.urlsplit(base_url)
+
+        if parsed_url.scheme not in ('http', 'https'):
+            raise ValueError('Unsupported URL scheme: %r' % parsed_url.scheme)
+
+        self.scheme = parsed_url.scheme
+        self.netloc = parsed_url.netloc
+        self.host = parsed_url.hostname
+        self.port = parsed_url.port or (443 if self.scheme == 'https' else 80)
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._connections = []
+        self._semaphore = None
+
+    def __repr__(self):
+        """
+        Get a Python representation of the AsyncTransport.
+        """
+
+        return '%s(%s://%s, pool_size=%s)' % (
+            self.__class__.__name__,
+            self.scheme,
+            self.netloc,
+            self.pool_size,
+        )
+
+    async def _connect(self, timings):
+        """
+        Open a new connection.
+
+        :param timings: A dictionary where the 'dns' and 'connect' times are stored.
+        """
+
+        loop = asyncio.get_event_loop()
+        start = time.time()
+        addresses = await loop.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        timings['dns'] = time.time() - start
+        start = time.time()
+        error = None
+
+        for _, _, _, _, sockaddr in addresses:
+            try:
+                connection = await asyncio.open_connection(
+                    sockaddr[0],
+                    sockaddr[1],
+                    ssl=(self.scheme == 'https') or None,
+                    server_hostname=self.host if self.scheme == 'https' else None,
+                )
+            except OSError as ex:
+                error = ex
+            else:
+                timings['connect'] = time.time() - start
+
+                return connection
+
+        raise error or OSError('getaddrinfo returned an empty list')
+
+    @staticmethod
+    async def _read_response(reader, timings):
+        """
+        Read a response from a connection.
+
+        :returns: A (Response, will_close) tuple.
+        """
+
+        start = time.time()
+        status_line = await reader.readline()
+
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+
+        parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        version, status = parts[0], int(parts[1])
+        reason = parts[2] if len(parts) > 2 else ''
+        headers = {}
+
+        while True:
+            line = await reader.readline()
+
+            if line in (b'\r\n', b'\n', b''):
+                break
+
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        timings['ttfb'] += time.time() - start
+        start = time.time()
+        connection_header = headers.get('connection', '').lower()
+        will_close = connection_header == 'close' or (version == 'HTTP/1.0' and connection_header != 'keep-alive')
+
+        if status in (204, 304) or 100 <= status < 200:
+            body = b''
+
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0], 16)
+
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+
+                    break
+
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+
+            body = b''.join(chunks)
+
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+
+        else:
+            body = await reader.read()
+            will_close = True
+
+        timings['transfer'] = time.time() - start
+        response = Response(
+            status=status,
+            reason=reason,
+            headers=headers,
+            body=decode_content(headers.get('content-encoding'), body),
+            timings=timings,
+            wire_bytes=len(body),
+        )
+
+        return response, will_close
+
+    async def _request(self, connection, method, path, headers, timings):
+        """
+        Send a request on a connection and read its response.
+        """
+
+        start = time.time()
+        reader, writer = connection
+        lines = ['%s %s HTTP/1.1' % (method, path), 'Host: %s' % self.netloc]
+        lines.extend('%s: %s' % item for item in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+        await writer.drain()
+
+        timings['ttfb'] = time.time() - start
+
+        return await self._read_response(reader, timings)
+
+    def is_saturated(self):
+        """
+        Check whether all the connections are in use.
+
+        :returns: True if a new request would wait for a connection.
+        """
+
+        return self._semaphore is not None and self._semaphore.locked()
+
+    async def request(self, url, headers=None, method='GET'):
+        """
+        Send a request and read its response.
+
+        :param url: The URL to request. Its scheme and network location must match those of the transport.
+        :param headers: A dictionary of headers to send.
+        :param method: The HTTP method.
+        :returns: A Response instance.
+        """
+
+        parsed_url = urlparse.urlsplit(url)
+
+        if (parsed_url.scheme, parsed_url.netloc) != (self.scheme, self.netloc):
+            raise ValueError('%r cannot be requested through %r' % (url, self))
+
+        path = urlparse.urlunsplit(('', '', parsed_url.path or '/', parsed_url.query, ''))
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+
+        start = time.time()
+
+        async with self._semaphore:
+            timings = {
+                'pool_wait': time.time() - start,
+            }
+            connection = self._connections.pop() if self._connections else None
+
+            # A reused connection may have been closed by the server while it
+            # was idle: in that case we retry once on a fresh connection.
+            reused = connection is not None
+
+            while True:
+                if connection is None:
+                    connection = await asyncio.wait_for(self._connect(timings), self.timeout)
+
+                try:
+                    response, will_close = await asyncio.wait_for(self._request(connection, method, path, headers or {}, timings), self.timeout)
+
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    connection[1].close()
+                    connection = None
+
+                    if not reused:
+                        raise
+
+                    reused = False
+
+                except BaseException:
+                    connection[1].close()
+
+                    raise
+
+                else:
+                    break
+
+            if will_close:
+                connection[1].close()
+            else:
+                self._connections.append(connection)
+
+        return response
+
+    def close(self):
+        """
+        Close all the idle connections.
+        """
+
+        while self._connections:
+            self._connections.pop()[1].close()
+
+_TRANSPORTS = weakref.WeakKeyDictionary()
+
+def get_transport(url):
+    """
+    Get the shared asynchronous transport for the host of the specified URL and the running event loop.
+
+    :param url: An URL.
+    :returns: An AsyncTransport instance, created on first use.
+    """
+
+    parsed_url = urlparse.urlsplit(url)
+    key = (parsed_url.scheme, parsed_url.netloc)
+    transports = _TRANSPORTS.setdefault(asyncio.get_event_loop(), {})
+    transport = transports.get(key)
+
+    if transport is None:
+        transport = transports[key] = AsyncTransport('%s://%s' % key)
+
+    return transport
+
+def set_transport(transport):
+    """
+    Register an asynchronous transport as the shared transport for its host and the running event loop.
+
+    :param transport: The AsyncTransport instance to use from now on.
+    """
+
+    _TRANSPORTS.setdefault(asyncio.get_event_loop(), {})[(transport.scheme, transport.netloc)] = transport
+
+class AsyncSingleFlight(object):
+    """
+    Coalesce concurrent identical calls into a single one, for asyncio.
+
+    This is the asynchronous counterpart of `pythemoviedb.api.singleflight.SingleFlight`.
+    """
+
+    def __init__(self):
+        """
+        Create a single-flight group.
+        """
+
+        self.calls = 0
+        self.coalesced = 0
+
+        self._futures = {}
+
+    async def do(self, key, function):
+        """
+        Call a coroutine function, unless a call with the same key is already in flight.
+
+        Cancelling one of the callers does not cancel the shared call.
+
+        :param key: The key of the call.
+        :param function: The coroutine function to call, without arguments.
+        :returns: The result of the call.
+        """
+
+        key = (asyncio.get_event_loop(), key)
+        future = self._futures.get(key)
+        self.calls += 1
+
+        if future is None:
+            future = self._futures[key] = asyncio.ensure_future(function())
+            future.add_done_callback(lambda _: self._futures.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(future)
+
+    def is_in_flight(self, key):
+        """
+        Check whether a call is in flight.
+
+        :param key: The key of the call.
+        :returns: True if a call with the key is in flight.
+        """
+
+        return (asyncio.get_event_loop(), key) in self._futures
+
+    def get_statistics(self):
+        """
+        Get the coalescing statistics.
+
+        :returns: A dictionary with the number of calls and the number of calls that were coalesced.
+        """
+
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+        }
+
+_SINGLE_FLIGHT = AsyncSingleFlight()
+
+def get_single_flight():
+    """
+    Get the shared asynchronous single-flight group.
+
+    :returns: The AsyncSingleFlight instance, or None if requests are not coalesced.
+    """
+
+    return _SINGLE_FLIGHT
+
+def set_single_flight(single_flight):
+    """
+    Set the shared asynchronous single-flight group.
+
+    :param single_flight: An AsyncSingleFlight instance, or None to disable request coalescing.
+    """
+
+    global _SINGLE_FLIGHT
+
+    _SINGLE_FLIGHT = single_flight
+
+async def hedged_request(hedge_policy, transport, endpoint, url, headers=None, measurements=None, key=None):
+    """
+    Send a request through an AsyncTransport, and hedge it if it is slow.
+
+    This is the asynchronous counterpart of `pythemoviedb.api.hedging.HedgePolicy.request`.
+    The request that loses is cancelled.
+
+    :param hedge_policy: The HedgePolicy.
+    :param transport: The AsyncTransport to use.
+    :param endpoint: The endpoint template, e.g. 'movie/{id}'.
+    :param url: The URL to request.
+    :param headers: A dictionary of headers to send.
+    :param measurements: A dictionary where the 'hedge' measurement is stored, if specified.
+    :param key: The client APIKey the URL carries, if any.
+    :returns: The successful Response that arrived first, or the outcome of the request if neither succeeded.
+    """
+
+    hedge_policy.start()
+
+    delay = hedge_policy.get_delay(endpoint)
+    start = time.time()
+    primary = asyncio.ensure_future(transport.request(url, headers=headers))
+    pending = set([primary])
+
+    try:
+        if delay is not None:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+
+        if delay is None or not pending or not hedge_policy.try_hedge(transport, key):
+            response = await primary
+        else:
+            hedge = asyncio.ensure_future(transport.request(url, headers=headers))
+            pending.add(hedge)
+
+            # The first successful response wins: an error response leaves the other request running. If both fail, the primary outcome is returned.
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None and can_win(task.result())]
+
+                if winners or not pending:
+                    break
+
+            if hedge in winners and primary not in winners:
+                hedge_policy.won()
+                response = hedge.result()
+
+                if measurements is not None:
+                    measurements['hedge'] = 'won'
+            else:
+                response = primary.result()
+
+                if measurements is not None:
+                    measurements['hedge'] = 'lost'
+
+    finally:
+        for task in pending:
+            task.cancel()
+
+    hedge_policy.observe(endpoint, time.time() - start)
+
+    return response
+
+async def send_request(action, url, transport, measurements=None, headers=None, client=None):
+    """
+    Send a request, with rate limiting and retries, and check its response.
+
+    This is the asynchronous counterpart of `pythemoviedb.api.request.send_request`.
+
+    :param action: The action, for logging purposes.
+    :param url: The URL to request.
+    :param transport: The AsyncTransport to use.
+    :param measurements: A dictionary where the RequestEvent measurements of the request are stored, if specified.
+    :param headers: A dictionary of additional headers, e.g. conditional request headers.
+    :param client: The Client whose keys are added to the URL, or None if the URL already has a key.
+    :returns: The successful transport Response.
+    """
+
+    attempts = RequestAttempts(action, url, measurements, headers, client)
+    hedge_policy = get_hedge_policy()
+
+    if hedge_policy is not None and not hedge_policy.accepts(action):
+        hedge_policy = None
+
+    while True:
+        request_url, delay = attempts.start()
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        try:
+            if hedge_policy is not None:
+                response = await hedged_request(hedge_policy, transport, get_endpoint(action), request_url, headers=attempts.headers, measurements=measurements, key=attempts.key)
+            else:
+                response = await transport.request(request_url, headers=attempts.headers)
+
+        except TRANSIENT_ERRORS as ex:
+            delay = attempts.fail(ex)
+
+            if delay is None:
+                raise
+
+        else:
+            delay = attempts.complete(response)
+
+            if delay is None:
+                break
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    return attempts.finish(response)
+
+async def fetch_body(action, query_string, base_url, api_version, api_key, transport, cache, measurements, client=None):
+    """
+    Get the body of a request, from the cache, from the entity store or from the server.
+
+    This is the asynchronous counterpart of `pythemoviedb.api.request.fetch_body`,
+    including the circuit breaker and the stale responses.
+
+    :param api_key: The API key, or None to use the keys of the client.
+    :param measurements: The dictionary where the RequestEvent measurements are stored.
+    :param client: The Client whose keys are used when no API key is specified.
+    :returns: The body, as bytes, or as a memoryview when it comes from the entity store.
+    """
+
+    body_fetch = BodyFetch(action, query_string, base_url, api_version, api_key, cache, measurements, TRANSIENT_ERRORS)
+    body = body_fetch.lookup()
+
+    if body is not None:
+        return body
+
+    if transport is None:
+        transport = get_transport(body_fetch.url)
+
+    async def fetch():
+        headers = body_fetch.start()
+
+        try:
+            response = await send_request(action, body_fetch.url, transport, measurements, headers=headers, client=None if api_key else client)
+
+        except Exception as ex:
+            body_fetch.fail(ex)
+
+            raise
+
+        except BaseException:
+            body_fetch.interrupt()
+
+            raise
+
+        return body_fetch.complete(response)
+
+    single_flight = get_single_flight()
+
+    try:
+        if single_flight is not None:
+            body = body_fetch.get_in_flight_stale(single_flight)
+
+            if body is not None:
+                return body
+
+            measurements['coalesced'] = True
+
+            return await single_flight.do(body_fetch.url, fetch)
+
+        return await fetch()
+
+    except Exception as ex:
+        body = body_fetch.get_fallback(ex)
+
+        if body is None:
+            raise
+
+        return body
+
+async def make_request(action, parameters=None, base_url=None, api_version=None, api_key=None, transport=None, cache=None, fields=None, client=None, model=None):
+    """
+    Make a request to the server.
+
+    This is the asynchronous counterpart of `pythemoviedb.api.methods.make_request`.
+
+    :param base_url: The API base URL. Defaults to the one of the client.
+    :param api_version: The API version. Defaults to the one of the client.
+    :param api_key: The API key. Defaults to the keys of the client.
+    :param transport: The AsyncTransport to use. If not specified, the shared transport for base_url is used.
+    :param cache: The Cache to use. If not specified, the shared cache is used, if any.
+    :param fields: A list of the fields of the response to keep, or None to keep them all.
+    :param client: The Client to use. If not specified, the shared client is used.
+    :param model: A function that builds the result from the decoded response, e.g. a Model subclass of `pythemoviedb.api.objects`, or None to get the dictionary.
+    """
+
+    if client is None:
+        client = get_client()
+
+    if not api_key and not client.keys:
+        raise RuntimeError('No API key defined. Request would fail.')
+
+    base_url = base_url or client.base_url
+    api_version = api_version or client.api_version
+
+    start = time.time()
+    query_string = build_query_string(parameters)
+    measurements = {}
+
+    LOGGER.debug('Making request to %s with %s', action, query_string)
+
+    try:
+        body = await fetch_body(action, query_string, base_url, api_version, api_key, transport, cache, measurements, client)
+
+        decode_start = time.time()
+        result = decode_body(body, fields)
+        measurements['decode_time'] = time.time() - decode_start
+
+        prefetcher = get_prefetcher()
+
+        if prefetcher is not None:
+            prefetcher.observe(action, parameters, query_string, result, measurements, client)
+
+        if model is not None:
+            result = model(result)
+
+        return result
+
+    except Exception as ex:
+        measurements['error'] = ex
+
+        raise
+
+    finally:
+        if has_hooks():
+            measurements['total_time'] = time.time() - start
+            emit(RequestEvent(action, **measurements))
+
+def _make_coroutine_function(function):
+    """
+    Make a coroutine function out of a request function of the methods module.
+
+    The action and parameters are computed with `methods.capture_request`, so
+    by the very same code as the synchronous API.
+    """
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        action, parameters, request_kwargs = methods.capture_request(function, *args, **kwargs)
+
+        return await make_request(action, parameters, **request_kwargs)
+
+    return wrapper
+
+def _is_request_function(function):
+    """
+    Check whether a member of the methods module is a request function.
+    """
+
+    return (
+        inspect.isfunction(function)
+        and function.__module__ == methods.__name__
+        and function is not methods.make_request
+        and 'make_request' in function.__code__.co_names
+    )
+
+_DONE = object()
+
+async def fetch_all(function, ids, concurrency=configuration.POOL_SIZE, *args, **kwargs):
+    """
+    Call a request coroutine function for many identifiers concurrently.
+
+    This is the asynchronous counterpart of `pythemoviedb.api.bulk.fetch_all`.
+
+    :param function: The request coroutine function. Its first parameter must be the identifier.
+    :param ids: An iterable of identifiers.
+    :param concurrency: The number of simultaneous requests.
+    :param args: Additional positional arguments for `function`.
+    :param kwargs: Additional keyword arguments for `function`.
+    :returns: An asynchronous generator of (id, result_or_APIError) tuples, in completion order.
+    """
+
+    ids = iter(ids)
+    results = asyncio.Queue(concurrency * 2)
+
+    async def worker():
+        try:
+            for _id in ids:
+                try:
+                    result = await function(_id, *args, **kwargs)
+                except APIError as ex:
+                    result = ex
+
+                await results.put((_id, result))
+
+        except Exception as ex:
+            await results.put((_DONE, ex))
+
+        await results.put((_DONE, None))
+
+    tasks = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+
+    try:
+        running = len(tasks)
+
+        while running:
+            _id, result = await results.get()
+
+            if _id is _DONE:
+                if result is None:
+                    running -= 1
+                else:
+                    raise result
+
+            else:
+                yield _id, result
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def get_movies(ids, language=None, append_to_response=None, concurrency=configuration.POOL_SIZE):
+    """
+    Get many movies concurrently.
+
+    :param ids: An iterable of movie identifiers.
+    :param language: The language as a ISO 639-1 code.
+    :param append_to_response: A list of additinal methods to append to the response.
+    :param concurrency: The number of simultaneous requests.
+    :returns: An asynchronous generator of (id, movie_or_APIError) tuples, in completion order.
+    """
+
+    return fetch_all(get_movie, ids, concurrency, language=language, append_to_response=append_to_response)
+
+def get_persons(ids, concurrency=configuration.POOL_SIZE):
+    """
+    Get many persons concurrently.
+
+    :param ids: An iterable of person identifiers.
+    :param concurrency: The number of simultaneous requests.
+    :returns: An asynchronous generator of (id, person_or_APIError) tuples, in completion order.
+    """
+
+    return fetch_all(get_person, ids, concurrency)
+
+def get_collections(ids, language=None, concurrency=configuration.POOL_SIZE):
+    """
+    Get many collections concurrently.
+
+    :param ids: An iterable of collection identifiers.
+    :param language: The language as a ISO 639-1 code.
+    :param concurrency: The number of simultaneous requests.
+    :returns: An asynchronous generator of (id, collection_or_APIError) tuples, in completion order.
+    """
+
+    return fetch_all(get_collection, ids, concurrency, language=language)
+
+async def iterate_pages(function, *args, prefetch=2, max_items=None, max_pages=None, first_page=1, **kwargs):
+    """
+    Iterate over the results of all the pages of a paginated request coroutine function.
+
+    This is the asynchronous counterpart of `pythemoviedb.api.pagination.iterate_pages`.
+
+    :param function: The paginated request coroutine function. It must accept a `page` keyword argument.
+    :param args: The positional arguments for `function`.
+    :param kwargs: The keyword arguments for `function`.
+    :param prefetch: The number of pages to fetch ahead.
+    :param max_items: The maximum number of results to yield.
+    :param max_pages: The maximum number of pages to fetch.
+    :param first_page: The first page to fetch.
+    :returns: An asynchronous generator of results.
+    """
+
+    if max_items is not None and max_items <= 0:
+        return
+
+    data = await function(*args, page=first_page, **kwargs)
+    last_page = data.get('total_pages') or first_page
+
+    if max_pages is not None:
+        last_page = min(last_page, first_page + max_pages - 1)
+
+    next_page = first_page + 1
+    tasks = collections.deque()
+    count = 0
+
+    try:
+        while True:
+            while next_page <= last_page and len(tasks) < prefetch:
+                tasks.append(asyncio.ensure_future(function(*args, page=next_page, **kwargs)))
+                next_page += 1
+
+            for result in data.get('results') or ():
+                yield result
+
+                count += 1
+
+                if max_items is not None and count >= max_items:
+                    return
+
+            if tasks:
+                data = await tasks.popleft()
+            elif next_page <= last_page:
+                data = await function(*args, page=next_page, **kwargs)
+                next_page += 1
+            else:
+                return
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+__all__ = ['AsyncTransport', 'get_transport', 'set_transport', 'AsyncSingleFlight', 'get_single_flight', 'set_single_flight', 'hedged_request', 'send_request', 'fetch_body', 'make_request', 'fetch_all', 'get_movies', 'get_persons', 'get_collections', 'iterate_pages']
+
+for _name, _function in inspect.getmembers(methods, _is_request_function):
+    globals()[_name] = _make_coroutine_function(_function)
+    __all__.append(_name)
@@ -0,0 +1,92 @@
+"""
+The API bulk request functions.
+"""
+
+import pythemoviedb.configuration as configuration
+from pythemoviedb.api.error import APIError
+
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+_DONE = object()
+
+def fetch_all(function, ids, concurrency=configuration.POOL_SIZE, *args, **kwargs):
+    """
+    Call a request function for many identifiers concurrently.
+
+    The identifiers are consumed lazily by a pool of worker threads. API
+    errors, such as an invalid identifier, are returned in place of the
+    result instead of aborting the whole batch. Any other exception stops the
+    workers and is raised by the generator.
+
+    :param function: The request function. Its first parameter must be the identifier.
+    :param ids: An iterable of identifiers.
+    :param concurrency: The number of worker threads.
+    :param args: Additional positional arguments for `function`.
+    :param kwargs: Additional keyword arguments for `function`.
+    :returns: A generator of (id, result_or_APIError) tuples, in completion order.
+    """
+
+    ids = iter(ids)
+    ids_lock = threading.Lock()
+    results = queue.Queue(concurrency * 2)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                results.put(item, timeout=0.1)
+
+                return
+            except queue.Full:
+                pass
+
+    def worker():
+        try:
+            while not stopped.is_set():
+                with ids_lock:
+                    _id = next(ids, _DONE)
+
+                if _id is _DONE:
+                    break
+
+                try:
+                    result = function(_id, *args, **kwargs)
+                except APIError as ex:
+                    result = ex
+
+                put((_id, result))
+
+        except Exception as ex:
+            put((_DONE, ex))
+
+        finally:
+            put((_DONE, None))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    try:
+        running = len(threads)
+
+        while running:
+            _id, result = results.get()
+
+            if _id is _DONE:
+                if result is None:
+                    running -= 1
+                else:
+                    raise result
+
+            else:
+                yield _id, result
+
+    finally:
+        stopped.set()
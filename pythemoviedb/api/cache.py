@@ -0,0 +1,423 @@
+"""
+The API response cache classes.
+"""
+
+from pythemoviedb.log import LOGGER
+
+import fnmatch
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from collections import OrderedDict
+
+try:
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import urlencode
+
+DEFAULT_TTL = 3600
+
+DEFAULT_TTLS = {
+    'authentication/*': 0,
+    'configuration': 86400,
+    'genre/list': 86400,
+    'movie/latest': 60,
+    'person/latest': 60,
+    'movie/changes': 300,
+    'person/changes': 300,
+}
+
+def make_cache_key(action, query_string):
+    """
+    Get the cache key of a request.
+
+    :param action: The action.
+    :param query_string: The stringified parameters of the request. The API key, if present, is ignored.
+    :returns: The cache key.
+    """
+
+    items = sorted((key, value) for key, value in query_string.items() if key != 'api_key')
+
+    return action + '?' + urlencode(items)
+
+class Cache(object):
+    """
+    The base class for response caches.
+
+    Caches store raw response bodies for a time-to-live that depends on the
+    action. Subclasses implement the storage with `_get`, `_get_stale`, `_set`
+    and `clear`.
+
+    The entries are kept after they expire, until they are evicted, so that
+    they can be revalidated with a conditional request when they were stored
+    with validators, i.e. the ETag or Last-Modified headers of their response,
+    and served as stale data while the API fails.
+    """
+
+    def __init__(self, max_size, default_ttl=DEFAULT_TTL, ttls=None):
+        """
+        Create a cache.
+
+        :param max_size: The maximum size of the stored bodies, in bytes.
+        :param default_ttl: The time-to-live of the entries, in seconds, for the actions that have no specific TTL.
+        :param ttls: A dictionary of fnmatch-style action patterns and their TTL, in seconds. A TTL of 0 disables caching. Defaults to DEFAULT_TTLS.
+        """
+
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+
+        # Longest patterns first, so that the most specific pattern wins.
+        self._ttl_patterns = sorted(self.ttls.items(), key=lambda item: len(item[0]), reverse=True)
+        self._lock = threading.RLock()
+
+    def get_ttl(self, action):
+        """
+        Get the time-to-live of an action.
+
+        :param action: The action.
+        :returns: The TTL in seconds.
+        """
+
+        for pattern, ttl in self._ttl_patterns:
+            if fnmatch.fnmatchcase(action, pattern):
+                return ttl
+
+        return self.default_ttl
+
+    def get(self, key):
+        """
+        Get a fresh entry from the cache.
+
+        :param key: The cache key.
+        :returns: The body, or None if there is no fresh entry.
+        """
+
+        with self._lock:
+            body = self._get(key, time.time())
+
+            if body is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            return body
+
+    def get_stale(self, key):
+        """
+        Get an entry, fresh or not.
+
+        :param key: The cache key.
+        :returns: A (body, validators) tuple, or None if there is no entry. The validators are None if the entry has none.
+        """
+
+        with self._lock:
+            return self._get_stale(key)
+
+    def set(self, key, body, ttl, validators=None):
+        """
+        Store an entry in the cache.
+
+        :param key: The cache key.
+        :param body: The body, as bytes.
+        :param ttl: The time-to-live, in seconds.
+        :param validators: A dictionary with the 'etag' and/or 'last-modified' response headers, or None.
+        """
+
+        if ttl <= 0 or len(body) > self.max_size:
+            return
+
+        with self._lock:
+            self._set(key, body, time.time() + ttl, validators or None)
+
+    def renew(self, key, body, ttl, validators):
+        """
+        Store again an entry that the server reported as not modified.
+
+        :param key: The cache key.
+        :param body: The body of the stale entry.
+        :param ttl: The time-to-live, in seconds.
+        :param validators: The validators of the entry.
+        """
+
+        with self._lock:
+            self.revalidations += 1
+
+        self.set(key, body, ttl, validators)
+
+    def get_statistics(self):
+        """
+        Get the cache statistics.
+
+        :returns: A dictionary with the hits, misses, evictions and revalidations counters, and the current size.
+        """
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'revalidations': self.revalidations,
+                'size': self.size,
+            }
+
+class MemoryCache(Cache):
+    """
+    An in-memory LRU cache.
+    """
+
+    def __init__(self, max_size=64 * 1024 * 1024, **kwargs):
+        """
+        Create an in-memory cache.
+
+        :param max_size: The maximum size of the stored bodies, in bytes.
+        """
+
+        super(MemoryCache, self).__init__(max_size, **kwargs)
+
+        self._entries = OrderedDict()
+        self.size = 0
+
+    def _get(self, key, now):
+        """
+        Get a fresh entry and mark it as the most recently used.
+        """
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        if entry[1] <= now:
+            return None
+
+        self._entries[key] = self._entries.pop(key)
+
+        return entry[0]
+
+    def _get_stale(self, key):
+        """
+        Get an entry, fresh or not.
+        """
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        return entry[0], entry[2]
+
+    def _set(self, key, body, expires_at, validators):
+        """
+        Store an entry and evict the least recently used ones if needed.
+        """
+
+        old_entry = self._entries.pop(key, None)
+
+        if old_entry is not None:
+            self.size -= len(old_entry[0])
+
+        self._entries[key] = (body, expires_at, validators)
+        self.size += len(body)
+
+        while self.size > self.max_size:
+            _, (old_body, _, _) = self._entries.popitem(last=False)
+            self.size -= len(old_body)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all the entries.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+class DiskCache(Cache):
+    """
+    An on-disk LRU cache.
+
+    Each entry is stored in its own file, named after the hash of its key. The
+    recency of an entry is tracked through the modification time of its file,
+    so the cache survives restarts.
+    """
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024, **kwargs):
+        """
+        Create an on-disk cache.
+
+        :param directory: The cache directory. It is created if it does not exist.
+        :param max_size: The maximum size of the stored bodies, in bytes.
+        """
+
+        super(DiskCache, self).__init__(max_size, **kwargs)
+
+        self.directory = directory
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._entries = OrderedDict()
+        self.size = 0
+
+        entries = []
+
+        for filename in os.listdir(directory):
+            if filename.endswith('.cache'):
+                stat = os.stat(os.path.join(directory, filename))
+                entries.append((stat.st_mtime, filename, stat.st_size))
+
+        for _, filename, size in sorted(entries):
+            self._entries[filename] = size
+            self.size += size
+
+    def _get_filename(self, key):
+        """
+        Get the filename of an entry.
+        """
+
+        return hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache'
+
+    def _remove(self, filename):
+        """
+        Remove an entry file.
+        """
+
+        self.size -= self._entries.pop(filename)
+
+        try:
+            os.remove(os.path.join(self.directory, filename))
+        except OSError as ex:
+            LOGGER.warning('Unable to remove cache file %s: %s', filename, ex)
+
+    def _read(self, filename):
+        """
+        Read an entry file.
+
+        The first line of the file holds the expiration time and the JSON
+        validators, if any, separated by a space; the body follows.
+
+        :returns: A (body, expires_at, validators) tuple, or None if the file is not readable.
+        """
+
+        try:
+            with open(os.path.join(self.directory, filename), 'rb') as cache_file:
+                header = cache_file.readline().decode('ascii').split(' ', 1)
+                body = cache_file.read()
+
+            return body, float(header[0]), json.loads(header[1]) if len(header) > 1 else None
+
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _get(self, key, now):
+        """
+        Get a fresh entry and mark it as the most recently used.
+        """
+
+        filename = self._get_filename(key)
+
+        if filename not in self._entries:
+            return None
+
+        entry = self._read(filename)
+
+        if entry is None:
+            self._remove(filename)
+
+            return None
+
+        if entry[1] <= now:
+            return None
+
+        os.utime(os.path.join(self.directory, filename), None)
+        self._entries[filename] = self._entries.pop(filename)
+
+        return entry[0]
+
+    def _get_stale(self, key):
+        """
+        Get an entry, fresh or not.
+        """
+
+        filename = self._get_filename(key)
+
+        if filename not in self._entries:
+            return None
+
+        entry = self._read(filename)
+
+        if entry is None:
+            return None
+
+        return entry[0], entry[2]
+
+    def _set(self, key, body, expires_at, validators):
+        """
+        Store an entry and evict the least recently used ones if needed.
+        """
+
+        filename = self._get_filename(key)
+
+        if filename in self._entries:
+            self._remove(filename)
+
+        header = '%r' % expires_at
+
+        if validators is not None:
+            # ensure_ascii keeps the header line decodable whatever the validators.
+            header += ' ' + json.dumps(validators, sort_keys=True)
+
+        data = (header + '\n').encode('ascii') + body
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        with os.fdopen(fd, 'wb') as cache_file:
+            cache_file.write(data)
+
+        os.rename(temporary_path, os.path.join(self.directory, filename))
+        self._entries[filename] = len(data)
+        self.size += len(data)
+
+        while self.size > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all the entries.
+        """
+
+        with self._lock:
+            for filename in list(self._entries):
+                self._remove(filename)
+
+_CACHE = None
+
+def get_cache():
+    """
+    Get the shared cache.
+
+    :returns: The Cache instance set with set_cache, or None if caching is disabled.
+    """
+
+    return _CACHE
+
+def set_cache(cache):
+    """
+    Set the shared cache.
+
+    :param cache: A Cache instance, or None to disable caching.
+    """
+
+    global _CACHE
+
+    _CACHE = cache
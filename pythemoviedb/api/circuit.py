@@ -0,0 +1,262 @@
+"""
+The API circuit breaker classes.
+
+When an endpoint keeps failing, e.g. while the API is offline, retrying
+every request only piles threads up on timeouts. A CircuitBreaker counts
+the consecutive failures of each endpoint, and opens its circuit after
+`failure_threshold` of them: the requests then fail fast with a
+CircuitOpenError, or get the last known good response as stale data, for
+`reset_timeout` seconds. A few probe requests are then let through: the
+circuit closes if they succeed and opens again, for twice as long, if they
+fail.
+
+Circuits are off by default, like hedging and prefetching:
+
+    set_circuit_breaker(CircuitBreaker(failure_threshold=5))
+"""
+
+import pythemoviedb.configuration as configuration
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.error import APIError, CircuitOpenError
+from pythemoviedb.api.transport import TRANSIENT_ERRORS
+
+import threading
+import time
+
+try:
+    from urllib2 import HTTPError
+except ImportError:
+    from urllib.error import HTTPError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+def is_failure(error, transient_errors=TRANSIENT_ERRORS):
+    """
+    Check whether a request error is a failure of the API, rather than of the request.
+
+    :param error: The exception raised by the request.
+    :param transient_errors: The connection level exceptions of the transport.
+    :returns: True for server errors, the SERVICE_OFFLINE and INTERNAL_ERROR API errors, and connection errors.
+    """
+
+    if isinstance(error, HTTPError):
+        return error.code >= 500
+
+    if isinstance(error, APIError):
+        return error.status_code in (APIError.SERVICE_OFFLINE, APIError.INTERNAL_ERROR)
+
+    return isinstance(error, transient_errors)
+
+class _Circuit(object):
+    """
+    The state of the circuit of an endpoint.
+    """
+
+    __slots__ = ('state', 'failures', 'reset_timeout', 'retry_at', 'probes', 'opened', 'rejected', 'stale')
+
+    def __init__(self, reset_timeout):
+        """
+        Create a closed circuit.
+        """
+
+        self.state = CLOSED
+        self.failures = 0
+        self.reset_timeout = reset_timeout
+        self.retry_at = 0.0
+        self.probes = 0
+        self.opened = 0
+        self.rejected = 0
+        self.stale = 0
+
+class CircuitBreaker(object):
+    """
+    A circuit breaker per endpoint template, e.g. 'movie/{id}'.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=configuration.CIRCUIT_RESET_TIMEOUT, max_reset_timeout=600.0, probes=1):
+        """
+        Create a circuit breaker.
+
+        :param failure_threshold: The number of consecutive failures after which the circuit of an endpoint opens.
+        :param reset_timeout: The time, in seconds, the circuit stays open before it is probed.
+        :param max_reset_timeout: The maximum time, in seconds, the circuit stays open after failed probes.
+        :param probes: The number of simultaneous probe requests of a half-open circuit.
+        """
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probes = probes
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _get_circuit(self, endpoint):
+        """
+        Get the circuit of an endpoint. The caller holds the lock.
+        """
+
+        circuit = self._circuits.get(endpoint)
+
+        if circuit is None:
+            circuit = self._circuits[endpoint] = _Circuit(self.reset_timeout)
+
+        return circuit
+
+    def get_state(self, endpoint):
+        """
+        Get the state of the circuit of an endpoint.
+
+        :param endpoint: The endpoint template.
+        :returns: CLOSED, OPEN or HALF_OPEN.
+        """
+
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+
+            return circuit.state if circuit is not None else CLOSED
+
+    def acquire(self, endpoint):
+        """
+        Check that a request can be made, before making it.
+
+        Every acquired request must be recorded with `record` once it is done,
+        or released with `release` if it was interrupted.
+
+        :param endpoint: The endpoint template.
+        :raises CircuitOpenError: if the circuit is open, or half-open with all its probes in flight.
+        """
+
+        with self._lock:
+            circuit = self._get_circuit(endpoint)
+
+            if circuit.state == CLOSED:
+                return
+
+            now = time.time()
+
+            if circuit.state == OPEN and now >= circuit.retry_at:
+                circuit.state = HALF_OPEN
+                circuit.probes = 0
+
+            if circuit.state == HALF_OPEN and circuit.probes < self.probes:
+                circuit.probes += 1
+
+                return
+
+            circuit.rejected += 1
+
+            raise CircuitOpenError(endpoint, max(circuit.retry_at - now, 0.0))
+
+    def record(self, endpoint, failed):
+        """
+        Record the outcome of an acquired request.
+
+        :param endpoint: The endpoint template.
+        :param failed: True if the request failed because of the API. See is_failure.
+        """
+
+        with self._lock:
+            circuit = self._get_circuit(endpoint)
+
+            if circuit.state == OPEN:
+                # A request made before the circuit opened.
+                return
+
+            if circuit.state == HALF_OPEN:
+                circuit.probes = max(circuit.probes - 1, 0)
+
+                if failed:
+                    circuit.reset_timeout = min(self.max_reset_timeout, circuit.reset_timeout * 2)
+                    self._open(endpoint, circuit)
+                else:
+                    LOGGER.info('The %s endpoint recovered: closing its circuit', endpoint)
+                    circuit.state = CLOSED
+                    circuit.failures = 0
+                    circuit.reset_timeout = self.reset_timeout
+
+            elif failed:
+                circuit.failures += 1
+
+                if circuit.failures >= self.failure_threshold:
+                    self._open(endpoint, circuit)
+
+            else:
+                circuit.failures = 0
+
+    def release(self, endpoint):
+        """
+        Release an acquired request that was interrupted, e.g. cancelled, before its outcome was known.
+
+        :param endpoint: The endpoint template.
+        """
+
+        with self._lock:
+            circuit = self._get_circuit(endpoint)
+
+            if circuit.state == HALF_OPEN:
+                circuit.probes = max(circuit.probes - 1, 0)
+
+    def _open(self, endpoint, circuit):
+        """
+        Open a circuit. The caller holds the lock.
+        """
+
+        LOGGER.warning('The %s endpoint is failing: opening its circuit for %.1fs', endpoint, circuit.reset_timeout)
+
+        circuit.state = OPEN
+        circuit.retry_at = time.time() + circuit.reset_timeout
+        circuit.opened += 1
+
+    def record_stale(self, endpoint):
+        """
+        Count a stale response served instead of a failed or suspended request.
+
+        :param endpoint: The endpoint template.
+        """
+
+        with self._lock:
+            self._get_circuit(endpoint).stale += 1
+
+    def get_statistics(self):
+        """
+        Get the circuit statistics.
+
+        :returns: A dictionary of endpoint templates and dictionaries with the circuit 'state', the consecutive 'failures', the number of times the circuit 'opened', of 'rejected' requests and of 'stale' responses served, and the time before the next probe, 'retry_in', in seconds.
+        """
+
+        now = time.time()
+
+        with self._lock:
+            return dict((endpoint, {
+                'state': circuit.state,
+                'failures': circuit.failures,
+                'opened': circuit.opened,
+                'rejected': circuit.rejected,
+                'stale': circuit.stale,
+                'retry_in': max(circuit.retry_at - now, 0.0) if circuit.state == OPEN else 0.0,
+            }) for endpoint, circuit in self._circuits.items())
+
+_CIRCUIT_BREAKER = CircuitBreaker(configuration.CIRCUIT_FAILURES) if configuration.CIRCUIT_FAILURES else None
+
+def get_circuit_breaker():
+    """
+    Get the shared circuit breaker.
+
+    :returns: The CircuitBreaker instance, or None if circuits are disabled.
+    """
+
+    return _CIRCUIT_BREAKER
+
+def set_circuit_breaker(circuit_breaker):
+    """
+    Set the shared circuit breaker.
+
+    :param circuit_breaker: A CircuitBreaker instance, or None to disable circuits and stale responses.
+    """
+
+    global _CIRCUIT_BREAKER
+
+    _CIRCUIT_BREAKER = circuit_breaker
@@ -0,0 +1,410 @@
+"""
+The API client classes.
+
+A Client holds the API endpoint and a set of API keys. Requests are spread
+across the keys, each with its own rate limit and health state: a key that
+is rejected as invalid or suspended is taken out of rotation, and a key
+that is throttled rests until the server allows it again, while the other
+keys keep serving. The request functions of `pythemoviedb.api.methods` are
+available on a client:
+
+    client = Client(['key1', 'key2', 'key3'], rate=40)
+    client.get_movie(550)
+
+Requests made without a client go through the shared client, created from
+the environment on first use.
+"""
+
+import pythemoviedb.configuration as configuration
+from pythemoviedb.api.decoder import get_json_input
+from pythemoviedb.api.error import APIError
+from pythemoviedb.api.ratelimit import RateLimiter, parse_retry_after
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+class APIKey(object):
+    """
+    An API key, with its rate limit and health state.
+    """
+
+    def __init__(self, key, rate=None, burst=None, cooldown=1.0, max_cooldown=600.0):
+        """
+        Create an API key.
+
+        :param key: The API key.
+        :param rate: The number of requests per second allowed with this key, or None for no limit.
+        :param burst: The maximum number of requests that can be made at once with this key. Defaults to `rate`.
+        :param cooldown: The time, in seconds, a throttled key rests when the server does not tell, doubled at each consecutive throttling.
+        :param max_cooldown: The maximum rest time, in seconds.
+        """
+
+        self.key = key
+        self.rate_limiter = RateLimiter(rate, burst) if rate else None
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.disabled = False
+        self.disabled_reason = None
+        self.available_at = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+
+        self._consecutive_throttles = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """
+        Get a representation of the key that does not disclose it.
+        """
+
+        return '<APIKey %s>' % self.get_name()
+
+    def get_name(self):
+        """
+        Get a name of the key that does not disclose it, for logs and statistics.
+
+        :returns: The first characters of the key.
+        """
+
+        return self.key[:4] + '...'
+
+    def get_delay(self, now=None):
+        """
+        Get the delay a request would wait with this key, without reserving it.
+
+        :param now: The current time, if already known.
+        :returns: The delay, in seconds.
+        """
+
+        delay = max(self.available_at - (now or time.time()), 0.0)
+
+        if self.rate_limiter is not None:
+            delay = max(delay, self.rate_limiter.get_delay())
+
+        return delay
+
+    def reserve(self, now=None):
+        """
+        Reserve a request with this key.
+
+        :param now: The current time, if already known.
+        :returns: The delay, in seconds, to wait before making the request.
+        """
+
+        delay = max(self.available_at - (now or time.time()), 0.0)
+
+        if self.rate_limiter is not None:
+            delay = max(delay, self.rate_limiter.reserve())
+
+        with self._lock:
+            self.requests += 1
+
+        return delay
+
+    def report(self, response=None, error=None):
+        """
+        Update the health state of the key from the outcome of a request.
+
+        :param response: The transport Response, if one was received.
+        :param error: The exception raised by the transport, if no response was received.
+        :returns: True if the request failed because of the key, and may succeed with another one.
+        """
+
+        with self._lock:
+            if response is None:
+                # Connection level failures are not the fault of the key.
+                self.errors += 1
+
+                return False
+
+            if response.status == 429:
+                self.throttled += 1
+                self._consecutive_throttles += 1
+
+                delay = parse_retry_after(response.headers.get('retry-after'))
+
+                if delay is None:
+                    delay = min(self.max_cooldown, self.cooldown * 2 ** (self._consecutive_throttles - 1))
+
+                self.available_at = max(self.available_at, time.time() + delay)
+
+                return True
+
+            if response.status == 401:
+                error = get_api_error(response)
+
+                if error is not None and error.status_code in (APIError.INVALID_API_KEY, APIError.SUSPENDED_API_KEY):
+                    self.disabled = True
+                    self.disabled_reason = error.status_message
+
+                    return True
+
+            if response.status >= 500:
+                self.errors += 1
+            else:
+                self._consecutive_throttles = 0
+
+            return False
+
+    def get_statistics(self):
+        """
+        Get the statistics of the key.
+
+        :returns: A dictionary with the 'key' name, the number of 'requests', 'throttled' responses and 'errors', whether the key is 'disabled' and why, and the time it is 'resting' for, in seconds.
+        """
+
+        with self._lock:
+            return {
+                'key': self.get_name(),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'disabled': self.disabled,
+                'disabled_reason': self.disabled_reason,
+                'resting': max(self.available_at - time.time(), 0.0),
+            }
+
+def get_api_error(response):
+    """
+    Get the API error of a response.
+
+    :param response: The transport Response.
+    :returns: The APIError described by the body, or None if the body does not describe one.
+    """
+
+    try:
+        data = json.loads(get_json_input(response.body))
+
+        return APIError(data['status_code'], data['status_message'])
+
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def parse_api_keys(value):
+    """
+    Parse a list of API keys.
+
+    :param value: A comma separated list of API keys, e.g. the PYTHEMOVIEDB_API_KEY environment variable, or None.
+    :returns: The list of the API keys.
+    """
+
+    return [key.strip() for key in (value or '').split(',') if key.strip()]
+
+class Client(object):
+    """
+    An API client, that spreads requests across a set of API keys.
+
+    Each request is made with the next key of the rotation that can make it
+    without waiting, or with the one that waits the least. The keys that are
+    disabled are skipped, and a request rejected because of its key is
+    retried with another one.
+    """
+
+    def __init__(self, api_keys=None, base_url=None, api_version=None, rate=None, burst=None, cooldown=1.0, max_cooldown=600.0):
+        """
+        Create a client.
+
+        :param api_keys: A list of API keys or of APIKey instances, or a comma separated string. Defaults to `configuration.API_KEY`.
+        :param base_url: The API base URL. Defaults to `configuration.API_URL`.
+        :param api_version: The API version. Defaults to `configuration.API_VERSION`.
+        :param rate: The number of requests per second allowed with each key, or None for no limit. Defaults to `configuration.KEY_RATE_LIMIT`.
+        :param burst: The maximum number of requests that can be made at once with each key. Defaults to `rate`.
+        :param cooldown: The time, in seconds, a throttled key rests when the server does not tell.
+        :param max_cooldown: The maximum rest time of a key, in seconds.
+        """
+
+        if api_keys is None:
+            api_keys = configuration.API_KEY
+
+        if not isinstance(api_keys, (list, tuple)):
+            api_keys = parse_api_keys(api_keys)
+
+        if rate is None:
+            rate = configuration.KEY_RATE_LIMIT or None
+
+        self.base_url = base_url or configuration.API_URL
+        self.api_version = api_version or configuration.API_VERSION
+        self.keys = [
+            key if isinstance(key, APIKey) else APIKey(key, rate, burst, cooldown, max_cooldown)
+            for key in api_keys
+        ]
+
+        self._next = 0
+        self._lock = threading.Lock()
+        self._functions = None
+
+    @classmethod
+    def from_environment(cls, environ=None, **kwargs):
+        """
+        Create a client from the environment variables, as they are now.
+
+        :param environ: The environment. Defaults to `os.environ`.
+        :param kwargs: Other arguments of the Client constructor.
+        :returns: The client.
+        """
+
+        if environ is None:
+            environ = os.environ
+
+        kwargs.setdefault('api_keys', environ.get('PYTHEMOVIEDB_API_KEY'))
+        kwargs.setdefault('base_url', environ.get('PYTHEMOVIEDB_API_URL'))
+        kwargs.setdefault('api_version', environ.get('PYTHEMOVIEDB_API_VERSION'))
+        kwargs.setdefault('rate', float(environ.get('PYTHEMOVIEDB_KEY_RATE_LIMIT') or 0))
+
+        return cls(**kwargs)
+
+    def __repr__(self):
+        """
+        Get a representation of the client.
+        """
+
+        return '<Client %s with %d key(s)>' % (self.base_url, len(self.keys))
+
+    def __getattr__(self, name):
+        """
+        Get a request function of `pythemoviedb.api.methods` that runs through this client.
+        """
+
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        if self._functions is None:
+            self._functions = self._bind_functions()
+
+        try:
+            return self._functions[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def _bind_functions(self):
+        """
+        Rebind the functions of the methods module to this client.
+
+        The functions are re-created in a copy of the module namespace where
+        `make_request` is bound to the client, so that functions calling other
+        request functions, e.g. get_movies, go through the client too.
+        """
+
+        import pythemoviedb.api.methods as methods
+
+        namespace = dict(methods.__dict__)
+        functions = {'make_request': functools.partial(methods.make_request, client=self)}
+
+        for name, function in methods.__dict__.items():
+            if inspect.isfunction(function) and function.__module__ == methods.__name__ and function is not methods.make_request:
+                functions[name] = methods.rebind(function, namespace)
+
+        namespace.update(functions)
+
+        return functions
+
+    def get_usable_keys(self):
+        """
+        Get the keys that are not disabled.
+
+        :returns: The list of the usable APIKey instances.
+        """
+
+        return [key for key in self.keys if not key.disabled]
+
+    def reserve(self):
+        """
+        Choose the key of the next request and reserve it.
+
+        :returns: An (APIKey, delay) tuple. The request must wait for the delay, in seconds, before being made.
+        """
+
+        with self._lock:
+            keys = self.get_usable_keys()
+
+            if not keys:
+                if self.keys:
+                    raise RuntimeError('All the API keys are disabled. Request would fail.')
+
+                raise RuntimeError('No API key defined. Request would fail.')
+
+            now = time.time()
+            best, best_delay = None, None
+
+            for offset in range(len(keys)):
+                key = keys[(self._next + offset) % len(keys)]
+                delay = key.get_delay(now)
+
+                if best is None or delay < best_delay:
+                    best, best_delay = key, delay
+
+                if delay <= 0:
+                    break
+
+            self._next = (keys.index(best) + 1) % len(keys)
+
+            return best, best.reserve(now)
+
+    def acquire(self):
+        """
+        Choose the key of the next request and wait until it can be used.
+
+        :returns: The APIKey.
+        """
+
+        key, delay = self.reserve()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return key
+
+    def report(self, key, response=None, error=None):
+        """
+        Update the health state of a key from the outcome of a request.
+
+        :param key: The APIKey the request was made with.
+        :param response: The transport Response, if one was received.
+        :param error: The exception raised by the transport, if no response was received.
+        :returns: True if the request may succeed with another key, which is then usable.
+        """
+
+        return key.report(response, error) and any(other is not key for other in self.get_usable_keys())
+
+    def get_statistics(self):
+        """
+        Get the statistics of the keys.
+
+        :returns: A list of dictionaries, one per key, as returned by APIKey.get_statistics.
+        """
+
+        return [key.get_statistics() for key in self.keys]
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def get_client():
+    """
+    Get the shared client.
+
+    :returns: The shared Client, created from the environment on first use.
+    """
+
+    global _CLIENT
+
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = Client.from_environment()
+
+        return _CLIENT
+
+def set_client(client):
+    """
+    Set the shared client.
+
+    :param client: The Client to use from now on.
+    """
+
+    global _CLIENT
+
+    _CLIENT = client
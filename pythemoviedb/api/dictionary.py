@@ -0,0 +1,211 @@
+"""
+The API name dictionary functions and classes.
+
+A NameDictionary resolves genre, keyword and company identifiers, e.g. the
+`genre_ids` of search results, to names without a request per identifier:
+the genres are loaded in bulk, one request per language, and the keywords
+and companies are fetched concurrently the first time they are resolved.
+The names are kept in memory and can be persisted to a compact file.
+
+    dictionary = NameDictionary('names.gz')
+    dictionary.resolve('genre', movie['genre_ids'])
+    dictionary.save()
+"""
+
+import pythemoviedb.configuration as configuration
+import pythemoviedb.api.methods as methods
+from pythemoviedb.api.bulk import fetch_all
+from pythemoviedb.api.error import APIError
+
+import gzip
+import json
+import os
+import tempfile
+import threading
+
+KINDS = ('genre', 'keyword', 'company')
+
+FETCH_FUNCTIONS = {
+    'keyword': methods.get_keyword,
+    'company': methods.get_company,
+}
+
+class NameDictionary(object):
+    """
+    A store of the names of genres, keywords and companies.
+
+    Genre names depend on the language; keyword and company names do not.
+    """
+
+    def __init__(self, path=configuration.DICTIONARY_PATH, concurrency=configuration.POOL_SIZE):
+        """
+        Create a name dictionary, loading its file if it exists.
+
+        :param path: The path of the file where the names are persisted, or None.
+        :param concurrency: The number of simultaneous requests made to fetch missing names.
+        """
+
+        self.path = path
+        self.concurrency = concurrency
+        self.requests = 0
+
+        self._names = {}
+        self._missing = set()
+        self._modified = False
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def load_genres(self, language=None):
+        """
+        Load the names of all the genres of a language, in a single request.
+
+        :param language: The language as a ISO 639-1 code.
+        """
+
+        genres = methods.get_genres(language=language)['genres']
+
+        with self._lock:
+            self.requests += 1
+            self._names[('genre', language)] = dict((genre['id'], genre['name']) for genre in genres)
+            self._modified = True
+
+    def resolve(self, kind, ids, language=None):
+        """
+        Resolve identifiers to names.
+
+        The names that are not known yet are fetched, concurrently.
+
+        :param kind: 'genre', 'keyword' or 'company'.
+        :param ids: A list of identifiers.
+        :param language: The language of the genre names, as a ISO 639-1 code.
+        :returns: The list of the names, in the order of the identifiers. Unknown identifiers have a None name.
+        """
+
+        if kind not in KINDS:
+            raise ValueError('Unknown kind: %s' % kind)
+
+        key = (kind, language if kind == 'genre' else None)
+
+        if kind == 'genre' and key not in self._names:
+            self.load_genres(language)
+
+        with self._lock:
+            table = self._names.setdefault(key, {})
+            missing = set(_id for _id in ids if _id not in table and (kind, _id) not in self._missing)
+
+        # Genres are loaded in bulk: any other identifier does not exist.
+        if missing and kind != 'genre':
+            self._fetch(kind, table, missing)
+
+        return [table.get(_id) for _id in ids]
+
+    def get_name(self, kind, _id, language=None):
+        """
+        Resolve an identifier to a name.
+
+        :param kind: 'genre', 'keyword' or 'company'.
+        :param _id: The identifier.
+        :param language: The language of the genre names, as a ISO 639-1 code.
+        :returns: The name, or None if the identifier does not exist.
+        """
+
+        return self.resolve(kind, [_id], language=language)[0]
+
+    def _fetch(self, kind, table, ids):
+        """
+        Fetch missing names concurrently and store them.
+        """
+
+        for _id, result in fetch_all(FETCH_FUNCTIONS[kind], list(ids), self.concurrency):
+            with self._lock:
+                self.requests += 1
+
+                if isinstance(result, APIError):
+                    # Only remembered in memory: the identifier may be valid on another day.
+                    self._missing.add((kind, _id))
+                else:
+                    table[_id] = result['name']
+                    self._modified = True
+
+    def load(self, path):
+        """
+        Load the names from a file.
+
+        :param path: The path of the file, as written by save.
+        """
+
+        names = {}
+
+        with gzip.open(path, 'rb') as dictionary_file:
+            for line in dictionary_file:
+                kind, language, _id, name = line.decode('utf-8').rstrip('\n').split('\t', 3)
+                names.setdefault((kind, language or None), {})[int(_id)] = json.loads(name)
+
+        with self._lock:
+            self._names.update(names)
+
+    def save(self, path=None):
+        """
+        Persist the names atomically, if they changed since they were loaded.
+
+        The file is a gzipped list of tab separated kinds, languages, identifiers and JSON names.
+
+        :param path: The path of the file. Defaults to the dictionary path.
+        """
+
+        path = path or self.path
+
+        with self._lock:
+            if not self._modified and path == self.path:
+                return
+
+            lines = [
+                '%s\t%s\t%s\t%s\n' % (kind, language or '', _id, json.dumps(name))
+                for (kind, language), table in sorted(self._names.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+                for _id, name in sorted(table.items())
+            ]
+
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        os.close(fd)
+
+        with gzip.open(temporary_path, 'wb') as dictionary_file:
+            dictionary_file.write(''.join(lines).encode('utf-8'))
+
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+
+        os.rename(temporary_path, path)
+
+        if path == self.path:
+            self._modified = False
+
+_DICTIONARY = None
+_DICTIONARY_LOCK = threading.Lock()
+
+def get_dictionary():
+    """
+    Get the shared name dictionary.
+
+    :returns: The shared NameDictionary, created on first use.
+    """
+
+    global _DICTIONARY
+
+    with _DICTIONARY_LOCK:
+        if _DICTIONARY is None:
+            _DICTIONARY = NameDictionary()
+
+        return _DICTIONARY
+
+def set_dictionary(dictionary):
+    """
+    Set the shared name dictionary.
+
+    :param dictionary: The NameDictionary to use from now on.
+    """
+
+    global _DICTIONARY
+
+    _DICTIONARY = dictionary
@@ -20,6 +20,7 @@ class APIError(Exception):
     SERVICE_OFFLINE = 9
     SUSPENDED_API_KEY = 10
     INTERNAL_ERROR = 11
+    REQUEST_LIMIT_EXCEEDED = 25
 
     def __init__(self, status_code, status_message):
         """
@@ -58,3 +59,21 @@ class APIError(Exception):
             return wrapper
 
         return decorator
+
+class CircuitOpenError(APIError):
+    """
+    An exception raised instead of making a request while the circuit of its endpoint is open.
+    """
+
+    def __init__(self, endpoint, retry_in):
+        """
+        Create a circuit open exception.
+
+        :param endpoint: The endpoint template.
+        :param retry_in: The time, in seconds, before a request is tried again.
+        """
+
+        super(CircuitOpenError, self).__init__(APIError.SERVICE_OFFLINE, 'The %s endpoint is failing: requests are suspended for %.1fs' % (endpoint, retry_in))
+
+        self.endpoint = endpoint
+        self.retry_in = retry_in
@@ -0,0 +1,395 @@
+"""
+The API request hedging classes.
+
+A slow response is most often an unlucky one: the same request sent again
+is likely to be answered faster. With a HedgePolicy, a request whose
+response has not arrived after a delay is sent a second time, and the
+first successful response wins while the other request is cancelled. The delay is
+either fixed or the observed latency percentile of the endpoint, and the
+hedges are capped to a fraction of the requests so that they do not burn
+the quota:
+
+    set_hedge_policy(HedgePolicy(budget=0.05))
+
+Hedging is off by default. Only the read-only actions are hedged.
+"""
+
+import pythemoviedb.configuration as configuration
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.instrumentation import percentile
+from pythemoviedb.api.ratelimit import get_rate_limiter
+from pythemoviedb.api.transport import Cancellation
+
+import collections
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+
+# Creating a token or a session is not idempotent.
+_NON_IDEMPOTENT_ACTION_REGEX = re.compile(r'^authentication/')
+
+# The number of latencies observed before the delay of an endpoint is computed again.
+_DELAY_UPDATE_INTERVAL = 16
+
+class _Timer(object):
+    """
+    A single thread that calls functions after a delay.
+    """
+
+    def __init__(self):
+        """
+        Create a timer. Its thread is started on first use.
+        """
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def schedule(self, delay, function, *args):
+        """
+        Call a function after a delay, in the timer thread. It must not block.
+
+        :param delay: The delay, in seconds.
+        :param function: The function.
+        :param args: The arguments of the function.
+        """
+
+        with self._condition:
+            # Threads do not survive a fork.
+            if self._pid != os.getpid():
+                self._heap = []
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+            heapq.heappush(self._heap, (time.time() + delay, next(self._counter), function, args))
+            self._condition.notify()
+
+    def _run(self):
+        """
+        Call the functions when they are due. Runs in the timer thread.
+        """
+
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.time():
+                    self._condition.wait(self._heap[0][0] - time.time() if self._heap else None)
+
+                _, _, function, args = heapq.heappop(self._heap)
+
+            try:
+                function(*args)
+            except Exception:
+                LOGGER.exception('Timer function %r failed', function)
+
+_TIMER = _Timer()
+
+def can_win(response):
+    """
+    Check whether the response of one of the requests of a hedged call may win over the other request.
+
+    An error response, e.g. a 429 or a 503, does not win: the other request,
+    still in flight, is likely to succeed.
+
+    :param response: The transport Response.
+    :returns: True if the response is successful.
+    """
+
+    return response.status < 400
+
+class _HedgedCall(object):
+    """
+    The state of a request that may be hedged.
+    """
+
+    def __init__(self, transport, url, headers, key=None):
+        """
+        Create a hedged call.
+        """
+
+        self.transport = transport
+        self.url = url
+        self.headers = headers
+        self.key = key
+        self.primary = Cancellation()
+        self.hedge = None
+        self.hedge_response = None
+        self.hedge_done = threading.Event()
+        self.done = False
+        self.lock = threading.Lock()
+
+class HedgePolicy(object):
+    """
+    A request hedging policy.
+
+    Until enough latencies of an endpoint were observed, its requests are
+    not hedged, unless the delay is fixed. A hedge is only sent when the
+    budget allows it, and when neither the shared rate limiter, if any, nor
+    the rate limit of the API key of the request, nor the connection pool
+    would make it wait: a queued hedge only adds load.
+    """
+
+    def __init__(self, delay=None, percentile=0.95, budget=0.05, min_delay=0.005, min_samples=20, max_samples=1000):
+        """
+        Create a hedging policy.
+
+        :param delay: The time, in seconds, after which a request is hedged, or None to use the observed latency percentile of its endpoint.
+        :param percentile: The latency percentile used as the delay, between 0 and 1.
+        :param budget: The maximum fraction of the requests that are hedged, e.g. 0.05 for 5%.
+        :param min_delay: The minimum delay, in seconds.
+        :param min_samples: The number of latencies of an endpoint observed before its requests are hedged.
+        :param max_samples: The number of latencies kept per endpoint.
+        """
+
+        self.delay = delay
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.requests = 0
+        self.hedges = 0
+        self.wins = 0
+        self.skipped = 0
+
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.max_samples))
+        self._delays = {}
+        self._updates = collections.Counter()
+        self._lock = threading.Lock()
+
+    def accepts(self, action):
+        """
+        Check whether the requests of an action may be hedged.
+
+        :param action: The action.
+        :returns: True if the action is read-only.
+        """
+
+        return not _NON_IDEMPOTENT_ACTION_REGEX.match(action)
+
+    def get_delay(self, endpoint):
+        """
+        Get the time after which a request is hedged.
+
+        :param endpoint: The endpoint template.
+        :returns: The delay, in seconds, or None if the request must not be hedged.
+        """
+
+        if self.delay is not None:
+            return self.delay
+
+        return self._delays.get(endpoint)
+
+    def observe(self, endpoint, latency):
+        """
+        Record the latency of a request.
+
+        :param endpoint: The endpoint template.
+        :param latency: The latency, in seconds.
+        """
+
+        if self.delay is not None:
+            return
+
+        with self._lock:
+            samples = self._samples[endpoint]
+            samples.append(latency)
+            self._updates[endpoint] += 1
+
+            if len(samples) >= self.min_samples and (self._updates[endpoint] >= _DELAY_UPDATE_INTERVAL or endpoint not in self._delays):
+                self._delays[endpoint] = max(self.min_delay, percentile(sorted(samples), self.percentile))
+                self._updates[endpoint] = 0
+
+    def start(self):
+        """
+        Count a request that may be hedged.
+        """
+
+        with self._lock:
+            self.requests += 1
+
+    def try_hedge(self, transport=None, key=None):
+        """
+        Take a hedge from the budget.
+
+        :param transport: The transport the hedge would be sent through. A hedge that would wait for a connection is not sent.
+        :param key: The client APIKey the hedge would be sent with, if any. Its rate limit is reserved for the hedge.
+        :returns: True if a hedge may be sent.
+        """
+
+        rate_limiter = get_rate_limiter()
+
+        with self._lock:
+            if (
+                self.hedges + 1 > self.budget * self.requests
+                or rate_limiter is not None and rate_limiter.get_delay() > 0
+                or transport is not None and transport.is_saturated()
+                or key is not None and key.get_delay() > 0
+            ):
+                self.skipped += 1
+
+                return False
+
+            self.hedges += 1
+
+        if rate_limiter is not None:
+            rate_limiter.reserve()
+
+        if key is not None:
+            key.reserve()
+
+        return True
+
+    def won(self):
+        """
+        Count a hedge that won.
+        """
+
+        with self._lock:
+            self.wins += 1
+
+    def request(self, transport, endpoint, url, headers=None, measurements=None, key=None):
+        """
+        Send a request through a Transport, and hedge it if it is slow.
+
+        :param transport: The Transport to use.
+        :param endpoint: The endpoint template, e.g. 'movie/{id}'.
+        :param url: The URL to request.
+        :param headers: A dictionary of headers to send.
+        :param measurements: A dictionary where the 'hedge' measurement is stored, if specified: 'won' or 'lost' when a hedge was sent.
+        :param key: The client APIKey the URL carries, if any.
+        :returns: The successful Response that arrived first, or the Response of the request if the hedge did not succeed.
+        """
+
+        self.start()
+
+        delay = self.get_delay(endpoint)
+        start = time.time()
+
+        if delay is None:
+            response = transport.request(url, headers=headers)
+            self.observe(endpoint, time.time() - start)
+
+            return response
+
+        call = _HedgedCall(transport, url, headers, key)
+        _TIMER.schedule(delay, self._send_hedge, call)
+
+        try:
+            response = transport.request(url, headers=headers, cancellation=call.primary)
+
+        except Exception:
+            # Cancelled because the hedge won, or failed: the hedge, if any, decides.
+            with call.lock:
+                call.done = True
+                hedge = call.hedge
+
+            if hedge is None:
+                raise
+
+            call.hedge_done.wait()
+
+            if call.hedge_response is None:
+                raise
+
+            response = call.hedge_response
+            self.won()
+
+            if measurements is not None:
+                measurements['hedge'] = 'won'
+
+        else:
+            with call.lock:
+                call.done = True
+                hedge = call.hedge
+
+            if hedge is not None:
+                hedge.cancel()
+
+                if measurements is not None:
+                    measurements['hedge'] = 'lost'
+
+        self.observe(endpoint, time.time() - start)
+
+        return response
+
+    def _send_hedge(self, call):
+        """
+        Start the hedge of a request that is still in flight. Runs in the timer thread.
+        """
+
+        with call.lock:
+            if call.done or not self.try_hedge(call.transport, call.key):
+                return
+
+            call.hedge = Cancellation()
+
+        thread = threading.Thread(target=self._run_hedge, args=(call,))
+        thread.daemon = True
+        thread.start()
+
+    def _run_hedge(self, call):
+        """
+        Send the hedge of a request. Runs in its own thread.
+        """
+
+        try:
+            response = call.transport.request(call.url, headers=call.headers, cancellation=call.hedge)
+        except Exception as ex:
+            LOGGER.debug('Hedged request to %s failed: %s', call.url, ex)
+        else:
+            if can_win(response):
+                call.hedge_response = response
+                call.primary.cancel()
+            else:
+                # The request keeps running, and its outcome is returned.
+                LOGGER.debug('Hedged request to %s failed (HTTP %s)', call.url, response.status)
+
+        finally:
+            call.hedge_done.set()
+
+    def get_statistics(self):
+        """
+        Get the hedging statistics.
+
+        :returns: A dictionary with the number of 'requests' that could be hedged, of 'hedges' sent, of hedges that won ('wins'), of hedges 'skipped' because of the budget or the rate limit, the 'hedge_rate' and 'win_rate' ratios, and the observed 'delays' per endpoint, in seconds.
+        """
+
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'wins': self.wins,
+                'skipped': self.skipped,
+                'hedge_rate': float(self.hedges) / self.requests if self.requests else 0.0,
+                'win_rate': float(self.wins) / self.hedges if self.hedges else 0.0,
+                'delays': dict(self._delays) if self.delay is None else {},
+            }
+
+_HEDGE_POLICY = HedgePolicy(configuration.HEDGE_DELAY, budget=configuration.HEDGE_BUDGET) if configuration.HEDGE_BUDGET else None
+
+def get_hedge_policy():
+    """
+    Get the shared hedging policy.
+
+    :returns: The HedgePolicy instance, or None if requests are not hedged.
+    """
+
+    return _HEDGE_POLICY
+
+def set_hedge_policy(hedge_policy):
+    """
+    Set the shared hedging policy.
+
+    :param hedge_policy: A HedgePolicy instance, or None to disable hedging.
+    """
+
+    global _HEDGE_POLICY
+
+    _HEDGE_POLICY = hedge_policy
@@ -0,0 +1,327 @@
+"""
+The API configuration and image URL functions and classes.
+
+The API configuration, which holds the image base URL and sizes, is loaded
+once per process by the shared APIConfiguration and refreshed in the
+background when it gets older than its TTL. An ImageURLBuilder turns image
+file paths into URLs from it, without any request once it was loaded:
+
+    builder = ImageURLBuilder()
+    builder.load()
+
+    for movie in movies:
+        render(builder.get_best_url('poster', movie['poster_path'], 300))
+"""
+
+import pythemoviedb.configuration as configuration
+import pythemoviedb.api.methods as methods
+from pythemoviedb.log import LOGGER
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+
+IMAGE_KINDS = ('backdrop', 'logo', 'poster', 'profile', 'still')
+
+class APIConfiguration(object):
+    """
+    A lazily loaded, automatically refreshed API configuration.
+
+    The first access blocks until the configuration is loaded, from the disk
+    if a fresh enough copy was persisted, from the API otherwise. Then, the
+    accesses never block: an expired configuration is still returned while a
+    background thread refreshes it.
+    """
+
+    def __init__(self, ttl=configuration.CONFIGURATION_TTL, path=configuration.CONFIGURATION_PATH, retry_delay=60):
+        """
+        Create an API configuration. Nothing is loaded until the first access.
+
+        :param ttl: The time, in seconds, after which the configuration is refreshed.
+        :param path: The path of the file where the configuration is persisted, for warm starts, or None.
+        :param retry_delay: The time, in seconds, after which a failed refresh is retried.
+        """
+
+        self.ttl = ttl
+        self.path = path
+        self.retry_delay = retry_delay
+        self.data = None
+        self.fetched_at = None
+        self.refreshes = 0
+
+        self._expires_at = 0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Get the configuration.
+
+        :returns: The configuration, as returned by get_configuration.
+        """
+
+        if time.time() >= self._expires_at:
+            self._expire()
+
+        return self.data
+
+    def load(self):
+        """
+        Load the configuration now, unless it is already loaded.
+
+        :returns: The configuration.
+        """
+
+        return self.get()
+
+    def refresh(self):
+        """
+        Fetch the configuration from the API and persist it.
+        """
+
+        data = methods.get_configuration()
+        fetched_at = time.time()
+
+        with self._lock:
+            self._set(data, fetched_at)
+            self.refreshes += 1
+
+        if self.path:
+            self._save(data, fetched_at)
+
+    def _expire(self):
+        """
+        Load a missing configuration, or start a background refresh of an expired one.
+        """
+
+        with self._lock:
+            if self.data is None and self.path:
+                self._load()
+
+            if time.time() < self._expires_at or self._refreshing:
+                return
+
+            if self.data is not None:
+                self._refreshing = True
+                thread = threading.Thread(target=self._refresh_in_background)
+                thread.daemon = True
+                thread.start()
+
+                return
+
+        # Nothing to return meanwhile: fetch synchronously.
+        self.refresh()
+
+    def _refresh_in_background(self):
+        """
+        Refresh the configuration. Runs in a background thread.
+        """
+
+        try:
+            self.refresh()
+        except Exception as ex:
+            LOGGER.warning('Unable to refresh the API configuration: %s', ex)
+
+            with self._lock:
+                self._expires_at = time.time() + self.retry_delay
+
+        finally:
+            self._refreshing = False
+
+    def _set(self, data, fetched_at):
+        """
+        Replace the configuration. The caller holds the lock.
+        """
+
+        self.data = data
+        self.fetched_at = fetched_at
+        self._expires_at = fetched_at + self.ttl
+
+    def _load(self):
+        """
+        Load the persisted configuration, if any. The caller holds the lock.
+        """
+
+        try:
+            with open(self.path) as configuration_file:
+                persisted = json.load(configuration_file)
+
+            self._set(persisted['data'], persisted['fetched_at'])
+
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    def _save(self, data, fetched_at):
+        """
+        Persist the configuration atomically.
+        """
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+
+        try:
+            fd, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+            with os.fdopen(fd, 'w') as configuration_file:
+                json.dump({'fetched_at': fetched_at, 'data': data}, configuration_file)
+
+            if os.name == 'nt' and os.path.exists(self.path):
+                os.remove(self.path)
+
+            os.rename(temporary_path, self.path)
+
+        except (IOError, OSError) as ex:
+            LOGGER.warning('Unable to persist the API configuration to %s: %s', self.path, ex)
+
+_API_CONFIGURATION = APIConfiguration()
+
+def get_api_configuration():
+    """
+    Get the shared API configuration.
+
+    :returns: The shared APIConfiguration.
+    """
+
+    return _API_CONFIGURATION
+
+def set_api_configuration(api_configuration):
+    """
+    Set the shared API configuration.
+
+    :param api_configuration: The APIConfiguration to use from now on.
+    """
+
+    global _API_CONFIGURATION
+
+    _API_CONFIGURATION = api_configuration
+
+class ImageURLBuilder(object):
+    """
+    Builds image URLs from the API configuration.
+
+    The sizes of each image kind are indexed by width when the configuration
+    is loaded or refreshed, and the best size for a width is memoized, so
+    that building an URL is a couple of dictionary lookups.
+    """
+
+    def __init__(self, api_configuration=None, secure=True):
+        """
+        Create an image URL builder.
+
+        :param api_configuration: The APIConfiguration to use. Defaults to the shared one.
+        :param secure: True to build HTTPS URLs.
+        """
+
+        self.api_configuration = api_configuration
+        self.secure = secure
+
+        self._data = None
+        self._base_url = None
+        self._widths = {}
+        self._best_sizes = {}
+
+    def load(self):
+        """
+        Load the configuration, so that the next calls make no request.
+
+        :returns: The builder.
+        """
+
+        self._update()
+
+        return self
+
+    def _update(self):
+        """
+        Rebuild the index if the configuration changed.
+        """
+
+        api_configuration = self.api_configuration or get_api_configuration()
+        data = api_configuration.get()
+
+        if data is self._data:
+            return
+
+        images = data['images']
+        widths = {}
+
+        for kind in IMAGE_KINDS:
+            sizes = images.get('%s_sizes' % kind, [])
+
+            # Height based sizes, e.g. 'h632', can only be requested by name.
+            widths[kind] = (
+                sorted((int(size[1:]), size) for size in sizes if size.startswith('w') and size[1:].isdigit()),
+                'original' if 'original' in sizes else None,
+            )
+
+        self._base_url = images['secure_base_url' if self.secure else 'base_url']
+        self._widths = widths
+        self._best_sizes = {}
+        self._data = data
+
+    def get_url(self, file_path, size='original'):
+        """
+        Get the URL of an image.
+
+        :param file_path: The image file path, e.g. '/2lECpi35Hnbpa4y46JX0aY3AWTy.jpg'.
+        :param size: The size name, e.g. 'w342'.
+        :returns: The URL, or None if file_path is None.
+        """
+
+        if file_path is None:
+            return None
+
+        self._update()
+
+        return self._base_url + size + file_path
+
+    def get_best_size(self, kind, width):
+        """
+        Get the smallest size at least as wide as a width.
+
+        :param kind: The image kind: 'backdrop', 'logo', 'poster', 'profile' or 'still'.
+        :param width: The target width, in pixels.
+        :returns: The size name. The original size is used when no size is wide enough.
+        """
+
+        self._update()
+
+        try:
+            return self._best_sizes[kind, width]
+        except KeyError:
+            pass
+
+        try:
+            sizes, original = self._widths[kind]
+        except KeyError:
+            raise ValueError('Unknown image kind: %s' % kind)
+
+        index = bisect.bisect_left(sizes, (width, ''))
+
+        if index < len(sizes):
+            size = sizes[index][1]
+        else:
+            size = original or (sizes[-1][1] if sizes else 'original')
+
+        self._best_sizes[kind, width] = size
+
+        return size
+
+    def get_best_url(self, kind, file_path, width):
+        """
+        Get the URL of an image in the smallest size at least as wide as a width.
+
+        :param kind: The image kind: 'backdrop', 'logo', 'poster', 'profile' or 'still'.
+        :param file_path: The image file path.
+        :param width: The target width, in pixels.
+        :returns: The URL, or None if file_path is None.
+        """
+
+        if file_path is None:
+            return None
+
+        size = self.get_best_size(kind, width)
+
+        return self._base_url + size + file_path
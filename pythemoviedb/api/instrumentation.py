@@ -0,0 +1,314 @@
+"""
+The API instrumentation functions and classes.
+
+Callbacks registered with `add_hook` are called with a RequestEvent after
+each request made with `make_request`.
+"""
+
+from pythemoviedb.log import LOGGER
+
+import collections
+import math
+import re
+import threading
+
+_ID_SEGMENT_REGEX = re.compile(r'^(\d+|[0-9a-f]{24})$')
+
+def get_endpoint(action):
+    """
+    Get the endpoint template of an action.
+
+    :param action: The action, e.g. 'movie/550/casts'.
+    :returns: The endpoint template, e.g. 'movie/{id}/casts'.
+    """
+
+    return '/'.join('{id}' if _ID_SEGMENT_REGEX.match(segment) else segment for segment in action.split('/'))
+
+class RequestEvent(object):
+    """
+    The measurements of a request.
+
+    Durations are in seconds and are None when they do not apply, e.g. there
+    are no DNS and connection times when a pooled connection was reused.
+    `response_bytes` is the size of the body and `wire_bytes` the size that
+    was received for it: smaller when the response was compressed, and 0
+    when the request was `revalidated`, i.e. answered with a 304. `api_key` is
+    the name of the client key the request was last sent with. `hedge` is
+    'won' or 'lost' when a hedged copy of the request was sent. `stale` is
+    True when the last known good response was served instead, because the
+    API failed or its circuit was open. `prefetch` is True for the requests
+    made in the background by the prefetcher.
+    """
+
+    __slots__ = (
+        'action',
+        'endpoint',
+        'status',
+        'error',
+        'cache',
+        'store',
+        'coalesced',
+        'retries',
+        'pool_wait_time',
+        'dns_time',
+        'connect_time',
+        'ttfb',
+        'transfer_time',
+        'decode_time',
+        'total_time',
+        'response_bytes',
+        'wire_bytes',
+        'revalidated',
+        'api_key',
+        'hedge',
+        'stale',
+        'prefetch',
+    )
+
+    def __init__(self, action, **kwargs):
+        """
+        Create a request event.
+
+        :param action: The action.
+        :param kwargs: The measurements. See __slots__ for the names.
+        """
+
+        self.action = action
+        self.endpoint = get_endpoint(action)
+
+        for name in self.__slots__[2:]:
+            setattr(self, name, kwargs.pop(name, None))
+
+        if kwargs:
+            raise TypeError('Unexpected measurements: %s' % ', '.join(kwargs))
+
+    def __repr__(self):
+        """
+        Get a Python representation of the RequestEvent.
+        """
+
+        return '%s(%s)' % (
+            self.__class__.__name__,
+            ', '.join('%s=%r' % (name, getattr(self, name)) for name in self.__slots__ if getattr(self, name) is not None),
+        )
+
+_HOOKS = []
+
+def add_hook(hook):
+    """
+    Register a request hook.
+
+    :param hook: A callable that takes a RequestEvent. It is called in the thread that made the request and must be fast.
+    """
+
+    _HOOKS.append(hook)
+
+def remove_hook(hook):
+    """
+    Unregister a request hook.
+
+    :param hook: A callable previously registered with add_hook.
+    """
+
+    _HOOKS.remove(hook)
+
+def has_hooks():
+    """
+    Check whether some hooks are registered.
+
+    :returns: True if at least one hook is registered.
+    """
+
+    return bool(_HOOKS)
+
+def emit(event):
+    """
+    Call the registered hooks with an event.
+
+    Hook exceptions are logged and ignored.
+
+    :param event: The RequestEvent.
+    """
+
+    for hook in list(_HOOKS):
+        try:
+            hook(event)
+        except Exception:
+            LOGGER.exception('Request hook %r failed', hook)
+
+def percentile(sorted_values, fraction):
+    """
+    Get a percentile of sorted values, by the nearest-rank method.
+
+    :param sorted_values: A non-empty sorted sequence.
+    :param fraction: The percentile, between 0 and 1.
+    :returns: The percentile.
+    """
+
+    index = int(math.ceil(fraction * len(sorted_values))) - 1
+
+    return sorted_values[min(max(index, 0), len(sorted_values) - 1)]
+
+class LatencyAggregator(object):
+    """
+    A request hook that aggregates the latencies per endpoint.
+
+    Only the last `max_samples` latencies of each endpoint are kept, so the
+    memory usage is bounded.
+    """
+
+    def __init__(self, max_samples=10000):
+        """
+        Create a latency aggregator.
+
+        :param max_samples: The number of latencies kept per endpoint.
+        """
+
+        self.max_samples = max_samples
+
+        self._samples = collections.defaultdict(lambda: collections.deque(maxlen=self.max_samples))
+        self._counts = collections.Counter()
+        self._errors = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        """
+        Record a request event.
+
+        :param event: The RequestEvent.
+        """
+
+        with self._lock:
+            self._counts[event.endpoint] += 1
+
+            if event.error is not None:
+                self._errors[event.endpoint] += 1
+
+            if event.total_time is not None:
+                self._samples[event.endpoint].append(event.total_time)
+
+    def get_percentile(self, endpoint, fraction):
+        """
+        Get a latency percentile of an endpoint.
+
+        :param endpoint: The endpoint template.
+        :param fraction: The percentile, between 0 and 1.
+        :returns: The latency in seconds, or None if no latency was recorded.
+        """
+
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+
+        return percentile(samples, fraction) if samples else None
+
+    def get_statistics(self):
+        """
+        Get the latency statistics.
+
+        :returns: A dictionary of endpoint templates and dictionaries with the 'count', 'errors', 'p50', 'p95' and 'p99' keys.
+        """
+
+        with self._lock:
+            samples = dict((endpoint, sorted(values)) for endpoint, values in self._samples.items())
+            counts = dict(self._counts)
+            errors = dict(self._errors)
+
+        statistics = {}
+
+        for endpoint, count in counts.items():
+            values = samples.get(endpoint)
+
+            statistics[endpoint] = {
+                'count': count,
+                'errors': errors.get(endpoint, 0),
+                'p50': percentile(values, 0.50) if values else None,
+                'p95': percentile(values, 0.95) if values else None,
+                'p99': percentile(values, 0.99) if values else None,
+            }
+
+        return statistics
+
+    def report(self):
+        """
+        Get a text report of the latencies, slowest endpoints first.
+
+        :returns: The report.
+        """
+
+        lines = ['%-40s %8s %8s %10s %10s %10s' % ('endpoint', 'count', 'errors', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)')]
+        statistics = self.get_statistics()
+
+        def format_latency(value):
+            return '%10.1f' % (value * 1000) if value is not None else '%10s' % '-'
+
+        for endpoint, values in sorted(statistics.items(), key=lambda item: item[1]['p95'] or 0, reverse=True):
+            lines.append('%-40s %8d %8d %s %s %s' % (
+                endpoint,
+                values['count'],
+                values['errors'],
+                format_latency(values['p50']),
+                format_latency(values['p95']),
+                format_latency(values['p99']),
+            ))
+
+        return '\n'.join(lines)
+
+class TransferAggregator(object):
+    """
+    A request hook that counts the bytes saved by compression and revalidation.
+    """
+
+    def __init__(self):
+        """
+        Create a transfer aggregator.
+        """
+
+        self.requests = 0
+        self.revalidations = 0
+        self.response_bytes = 0
+        self.wire_bytes = 0
+        self.compression_saved_bytes = 0
+        self.revalidation_saved_bytes = 0
+
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        """
+        Record a request event.
+
+        Only the requests that reached the server are counted.
+
+        :param event: The RequestEvent.
+        """
+
+        if event.wire_bytes is None or event.response_bytes is None:
+            return
+
+        with self._lock:
+            self.requests += 1
+            self.response_bytes += event.response_bytes
+            self.wire_bytes += event.wire_bytes
+
+            if event.revalidated:
+                self.revalidations += 1
+                self.revalidation_saved_bytes += event.response_bytes - event.wire_bytes
+            else:
+                self.compression_saved_bytes += event.response_bytes - event.wire_bytes
+
+    def get_statistics(self):
+        """
+        Get the transfer statistics.
+
+        :returns: A dictionary with the 'requests', 'revalidations', 'response_bytes', 'wire_bytes', 'compression_saved_bytes', 'revalidation_saved_bytes' and 'saved_bytes' keys.
+        """
+
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'revalidations': self.revalidations,
+                'response_bytes': self.response_bytes,
+                'wire_bytes': self.wire_bytes,
+                'compression_saved_bytes': self.compression_saved_bytes,
+                'revalidation_saved_bytes': self.revalidation_saved_bytes,
+                'saved_bytes': self.compression_saved_bytes + self.revalidation_saved_bytes,
+            }
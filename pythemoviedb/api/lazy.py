@@ -0,0 +1,322 @@
+"""
+The API lazy handles.
+
+A handle wraps an identifier and fetches the resource only when one of its
+fields is accessed. Sub-resources, such as the casts of a movie, are fetched
+on first access too, and the sub-resources requested while no request is in
+flight are merged into a single `append_to_response` request:
+
+    movie = LazyMovie(550).prefetch('casts', 'keywords')
+    movie['title']      # One request for the movie, its casts and keywords.
+    movie['casts']      # Memoized, no request.
+    movie['images']     # One request for the images.
+
+Each handle class also remembers the sub-resources accessed on the previous
+handles, and requests them with the resource, so that a loop over many
+identifiers makes a single request per identifier after the first one.
+"""
+
+import pythemoviedb.api.methods as methods
+
+import threading
+
+# The time, in seconds, a request of a handle waits for other threads by default.
+DEFAULT_BATCH_WINDOW = 0.005
+
+class LazyResource(object):
+    """
+    The base class of the lazy handles.
+
+    Subclasses define `SUB_RESOURCES`, the names accepted in
+    `append_to_response`, and `get_resource`, the request function.
+    """
+
+    SUB_RESOURCES = ()
+
+    def __init__(self, _id, learn=True, batch_window=DEFAULT_BATCH_WINDOW, **parameters):
+        """
+        Create a lazy handle. No request is made.
+
+        :param _id: The resource identifier.
+        :param learn: True to request the sub-resources accessed on the previous handles of the same class with the resource.
+        :param batch_window: The time, in seconds, a request waits for other threads to access more sub-resources before it is sent. The default, 5 ms, lets the threads that access a shared handle at about the same time share a request, for a fraction of the latency of a request. 0 sends the requests at once.
+        :param parameters: Additional parameters for the request function, e.g. language.
+        """
+
+        self.id = _id
+        self.learn = learn
+        self.batch_window = batch_window
+        self.parameters = parameters
+
+        self._data = None
+        self._sub_resources = {}
+        self._pending = set()
+        self._loading = False
+        self._condition = threading.Condition()
+
+    @classmethod
+    def get_resource(cls, _id, append_to_response=None, **parameters):
+        """
+        Request the resource.
+
+        :param _id: The resource identifier.
+        :param append_to_response: A list of sub-resources to append to the response.
+        :returns: The resource.
+        """
+
+        raise NotImplementedError()
+
+    def prefetch(self, *names):
+        """
+        Declare sub-resources that will be accessed, so that they are requested with the next request.
+
+        :param names: The sub-resource names.
+        :returns: The handle.
+        """
+
+        for name in names:
+            self._check_sub_resource(name)
+
+        with self._condition:
+            self._pending.update(name for name in names if name not in self._sub_resources)
+
+        return self
+
+    def is_loaded(self, name=None):
+        """
+        Check whether the resource or one of its sub-resources was fetched.
+
+        :param name: The sub-resource name, or None for the resource itself.
+        :returns: True if it was fetched.
+        """
+
+        if name is None:
+            return self._data is not None
+
+        return name in self._sub_resources
+
+    def load(self, *names):
+        """
+        Fetch the resource and the given sub-resources, unless they were already fetched.
+
+        :param names: The sub-resource names.
+        """
+
+        for name in names:
+            self._check_sub_resource(name)
+
+        with self._condition:
+            while not self._is_complete(names):
+                # Added at each iteration, since a failed request of another thread cleared them.
+                self._pending.update(name for name in names if name not in self._sub_resources)
+
+                if self._loading:
+                    # Another thread is fetching: the pending names are merged into its next request.
+                    self._condition.wait()
+                    continue
+
+                self._loading = True
+
+                try:
+                    if self.batch_window:
+                        self._condition.release()
+
+                        try:
+                            threading.Event().wait(self.batch_window)
+                        finally:
+                            self._condition.acquire()
+
+                    append_to_response = set(self._pending)
+
+                    if self._data is None and self.learn:
+                        append_to_response.update(self._get_learned())
+
+                    append_to_response.difference_update(self._sub_resources)
+                    self._pending.clear()
+
+                    self._condition.release()
+
+                    try:
+                        data = self.get_resource(self.id, append_to_response=sorted(append_to_response) or None, **self.parameters)
+                    finally:
+                        self._condition.acquire()
+
+                    self._store(data, append_to_response)
+
+                finally:
+                    self._loading = False
+                    self._condition.notify_all()
+
+        if self.learn and names:
+            self._add_learned(names)
+
+    def get(self, name, default=None):
+        """
+        Get a field or a sub-resource, fetching it if needed.
+
+        :param name: The field or sub-resource name.
+        :param default: The value returned if the resource has no such field.
+        :returns: The value.
+        """
+
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __getitem__(self, name):
+        """
+        Get a field or a sub-resource, fetching it if needed.
+        """
+
+        if name in self.SUB_RESOURCES:
+            self.load(name)
+
+            return self._sub_resources[name]
+
+        self.load()
+
+        return self._data[name]
+
+    def __getattr__(self, name):
+        """
+        Get a field or a sub-resource as an attribute, fetching it if needed.
+        """
+
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __repr__(self):
+        """
+        Get a Python representation of the handle.
+        """
+
+        return '%s(%r, loaded=%r)' % (
+            self.__class__.__name__,
+            self.id,
+            sorted(self._sub_resources) if self._data is not None else None,
+        )
+
+    def _check_sub_resource(self, name):
+        """
+        Check that a sub-resource name is supported.
+        """
+
+        if name not in self.SUB_RESOURCES:
+            raise ValueError('Unknown %s sub-resource: %s' % (self.__class__.__name__, name))
+
+    def _is_complete(self, names):
+        """
+        Check whether the resource and the given sub-resources were fetched. The caller holds the lock.
+        """
+
+        return self._data is not None and all(name in self._sub_resources for name in names)
+
+    def _store(self, data, append_to_response):
+        """
+        Memoize a response. The caller holds the lock.
+
+        :param data: The response.
+        :param append_to_response: The sub-resources requested with it.
+        """
+
+        for name in append_to_response:
+            self._sub_resources[name] = data.pop(name, None)
+
+        # The fields of the resource do not change between requests: keep the first ones.
+        if self._data is None:
+            self._data = data
+
+    @classmethod
+    def _get_learned(cls):
+        """
+        Get the sub-resources accessed on the previous handles of the class.
+        """
+
+        return cls.__dict__.get('_learned', ())
+
+    @classmethod
+    def _add_learned(cls, names):
+        """
+        Remember accessed sub-resources.
+        """
+
+        learned = cls._get_learned()
+
+        if not set(names).issubset(learned):
+            # Replaced rather than updated, so that readers never see the set change size.
+            cls._learned = frozenset(learned).union(names)
+
+    @classmethod
+    def forget(cls):
+        """
+        Forget the sub-resources accessed on the previous handles of the class.
+        """
+
+        cls._learned = frozenset()
+
+class LazyMovie(LazyResource):
+    """
+    A lazy movie handle.
+    """
+
+    SUB_RESOURCES = (
+        'alternative_titles',
+        'casts',
+        'images',
+        'keywords',
+        'releases',
+        'trailers',
+        'translations',
+        'similar_movies',
+        'lists',
+    )
+
+    @classmethod
+    def get_resource(cls, _id, append_to_response=None, **parameters):
+        """
+        Request the movie.
+        """
+
+        return methods.get_movie(_id, append_to_response=append_to_response, **parameters)
+
+class LazyPerson(LazyResource):
+    """
+    A lazy person handle.
+    """
+
+    SUB_RESOURCES = (
+        'credits',
+        'images',
+        'changes',
+    )
+
+    @classmethod
+    def get_resource(cls, _id, append_to_response=None, **parameters):
+        """
+        Request the person.
+        """
+
+        return methods.get_person(_id, append_to_response=append_to_response, **parameters)
+
+class LazyCollection(LazyResource):
+    """
+    A lazy collection handle.
+    """
+
+    SUB_RESOURCES = (
+        'images',
+    )
+
+    @classmethod
+    def get_resource(cls, _id, append_to_response=None, **parameters):
+        """
+        Request the collection.
+        """
+
+        return methods.get_collection(_id, append_to_response=append_to_response, **parameters)
@@ -4,62 +4,129 @@ The API methods.
 
 import pythemoviedb.configuration as configuration
 from pythemoviedb.log import LOGGER
+from pythemoviedb.api.request import build_query_string, decode_body, fetch_body
+from pythemoviedb.api.client import get_client
+from pythemoviedb.api.prefetch import get_prefetcher
+from pythemoviedb.api.instrumentation import RequestEvent, emit, has_hooks
+from pythemoviedb.api.bulk import fetch_all
+from pythemoviedb.api.objects import Collection, Company, Credits, Images, Keyword, Movie, Page, Person
 
-import urllib
-import urllib2
-import urlparse
-import json
+import functools
+import time
+import types
+import weakref
 
-def make_request(action, parameters=None, base_url=configuration.API_URL, api_version=configuration.API_VERSION, api_key=configuration.API_KEY):
+def make_request(action, parameters=None, base_url=None, api_version=None, api_key=None, transport=None, cache=None, fields=None, raw=False, client=None, model=None):
     """
     Make a request to the server.
+
+    Concurrent identical requests are coalesced into a single one, unless
+    coalescing was disabled with `set_single_flight(None)`. The related
+    requests are queued to the prefetcher, if any. A RequestEvent is passed to
+    the instrumentation hooks, if any, once the request is done.
+
+    :param base_url: The API base URL. Defaults to the one of the client.
+    :param api_version: The API version. Defaults to the one of the client.
+    :param api_key: The API key. Defaults to the keys of the client.
+    :param transport: The Transport to use. If not specified, the shared transport for base_url is used.
+    :param cache: The Cache to use. If not specified, the shared cache is used, if any.
+    :param fields: A list of the fields of the response to keep, or None to keep them all.
+    :param raw: True to get the response body as bytes, without decoding it.
+    :param client: The Client to use. If not specified, the shared client is used.
+    :param model: A function that builds the result from the decoded response, e.g. a Model subclass of `pythemoviedb.api.objects`, or None to get the dictionary.
     """
 
-    if not api_key:
+    if client is None:
+        client = get_client()
+
+    if not api_key and not client.keys:
         raise RuntimeError('No API key defined. Request would fail.')
 
-    def stringify_value(value):
+    base_url = base_url or client.base_url
+    api_version = api_version or client.api_version
 
-        if value is True:
-            return 'true'
-        elif value is False:
-            return 'false'
+    start = time.time()
+    query_string = build_query_string(parameters)
+    measurements = {}
 
-        return str(value)
+    LOGGER.debug('Making request to %s with %s', action, query_string)
 
-    query_string = dict((key, stringify_value(value)) for key, value in (parameters or {}).items() if value is not None)
+    try:
+        body = fetch_body(action, query_string, base_url, api_version, api_key, transport, cache, measurements, client)
 
-    query_string.update({
-        'api_key': api_key,
-    })
+        if raw:
+            result = bytes(body)
+        else:
+            # Each caller decodes the body, so that coalesced callers never share mutable results.
+            decode_start = time.time()
+            result = decode_body(body, fields)
+            measurements['decode_time'] = time.time() - decode_start
 
-    url = urlparse.urljoin(base_url, '/'.join([api_version, action])) + '?' + urllib.urlencode(query_string)
-    request = urllib2.Request(url)
-    request.add_header('Accept', 'application/json')
+        prefetcher = get_prefetcher()
 
-    LOGGER.debug('Making request to %s', request.get_full_url())
+        if prefetcher is not None:
+            prefetcher.observe(action, parameters, query_string, None if raw else result, measurements, client)
 
-    class APIHandler(urllib2.BaseHandler):
-        """
-        A HTTP error handler.
-        """
+        if model is not None and not raw:
+            result = model(result)
 
-        def http_error_401(self, request, response, code, msg, hdrs):
-            """
-            Handles 401 errors.
-            """
+        return result
 
-            data = json.loads(response.read())
+    except Exception as ex:
+        measurements['error'] = ex
 
-            raise APIError(**data)
+        raise
 
-        http_error_404 = http_error_401
+    finally:
+        if has_hooks():
+            measurements['total_time'] = time.time() - start
+            emit(RequestEvent(action, **measurements))
 
-    api_handler = urllib2.build_opener(APIHandler)
+def rebind(function, namespace=None, **overrides):
+    """
+    Re-create a function with other global variables, e.g. to redirect its calls to make_request.
+
+    :param function: The function.
+    :param namespace: The dictionary used as the global variables of the new function, updated with `overrides`. Functions rebound in the same namespace call each other. Defaults to a copy of the global variables of the function.
+    :param overrides: The global variables to replace, e.g. make_request=_capture_request.
+    :returns: The new function.
+    """
 
-    response = api_handler.open(request)
+    if namespace is None:
+        namespace = dict(function.__globals__)
 
-    return json.loads(response.read())
+    namespace.update(overrides)
+
+    rebound = types.FunctionType(function.__code__, namespace, function.__name__, function.__defaults__, function.__closure__)
+
+    return functools.update_wrapper(rebound, function)
+
+# The request functions rebound to _capture_request.
+_CAPTURE_FUNCTIONS = weakref.WeakKeyDictionary()
+
+def _capture_request(action, parameters=None, **kwargs):
+    """
+    Capture the arguments of a make_request call instead of making the request.
+    """
+
+    return action, parameters, kwargs
+
+def capture_request(function, *args, **kwargs):
+    """
+    Get the arguments a request function passes to make_request, without making the request.
+
+    :param function: The request function, e.g. get_movie.
+    :param args: The positional arguments of the function.
+    :param kwargs: The keyword arguments of the function.
+    :returns: An (action, parameters, make_request_kwargs) tuple.
+    """
+
+    capture = _CAPTURE_FUNCTIONS.get(function)
+
+    if capture is None:
+        capture = _CAPTURE_FUNCTIONS[function] = rebind(function, make_request=_capture_request)
+
+    return capture(*args, **kwargs)
 
 def parse_datetime(date):
     """
@@ -82,7 +149,7 @@ def format_date(date):
     """
 
     if date:
-        return date.format('%Y-%m-%d')
+        return date.strftime('%Y-%m-%d')
 
 def get_configuration():
     """
@@ -123,28 +190,32 @@ def new_guest_session():
 
     return make_request('authentication/guest_session/new')
 
-def get_movie(_id, language=None, append_to_response=None):
+def get_movie(_id, language=None, append_to_response=None, fields=None, model=False):
     """
     Get the movie that has the specified identifier.
 
     :param _id: The movie identifier.
     :param language: The language as a ISO 639-1 code.
     :param append_to_response: A list of additinal methods to append to the response.
+    :param fields: A list of the fields of the response to keep, e.g. ['id', 'title', 'casts.cast']. Defaults to all of them.
+    :param model: True to get a Movie model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The movie if it exists.
     """
 
     return make_request('movie/%s' % _id, parameters={
         'language': language,
         'append_to_response': append_to_response and ','.join(append_to_response) or None,
-    })
+    }, fields=fields, model=Movie if model else None)
 
-def get_movie_all(_id, language=None, country=None):
+def get_movie_all(_id, language=None, country=None, fields=None, model=False):
     """
     Get the movie that has the specified identifier with all the possible information.
 
     :param _id: The movie identifier.
     :param language: The language as a ISO 639-1 code.
     :param country: The country as an ISO 3166-1 code.
+    :param fields: A list of the fields of the response to keep, e.g. ['id', 'title', 'casts.cast']. Defaults to all of them.
+    :param model: True to get a Movie model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The movie if it exists.
     """
 
@@ -164,7 +235,7 @@ def get_movie_all(_id, language=None, country=None):
         'language': language,
         'country': country,
         'append_to_response': append_to_response and ','.join(append_to_response) or None,
-    })
+    }, fields=fields, model=Movie if model else None)
 
 def get_movie_alternative_titles(_id, country=None, append_to_response=None):
     """
@@ -181,33 +252,35 @@ def get_movie_alternative_titles(_id, country=None, append_to_response=None):
         'append_to_response': append_to_response and ','.join(append_to_response) or None,
     })
 
-def get_movie_casts(_id, append_to_response=None):
+def get_movie_casts(_id, append_to_response=None, model=False):
     """
     Get a movie casts.
 
     :param _id: The movie identifier.
     :param append_to_response: A list of additinal methods to append to the response.
+    :param model: True to get a Credits model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The movie casts if it exists.
     """
 
     return make_request('movie/%s/casts' % _id, parameters={
         'append_to_response': append_to_response and ','.join(append_to_response) or None,
-    })
+    }, model=Credits if model else None)
 
-def get_movie_images(_id, language=None, append_to_response=None):
+def get_movie_images(_id, language=None, append_to_response=None, model=False):
     """
     Get a movie images.
 
     :param _id: The movie identifier.
     :param language: The language as a ISO 639-1 code.
     :param append_to_response: A list of additinal methods to append to the response.
+    :param model: True to get an Images model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The movie if it exists.
     """
 
     return make_request('movie/%s/images' % _id, parameters={
         'language': language,
         'append_to_response': append_to_response and ','.join(append_to_response) or None,
-    })
+    }, model=Images if model else None)
 
 def get_movie_keywords(_id, append_to_response=None):
     """
@@ -261,20 +334,21 @@ def get_movie_translations(_id, append_to_response=None):
         'append_to_response': append_to_response and ','.join(append_to_response) or None,
     })
 
-def get_movie_similar_movies(_id, language=None, append_to_response=None):
+def get_movie_similar_movies(_id, language=None, append_to_response=None, model=False):
     """
     Get a movie similar :movies.
 
     :param _id: The movie identifier.
     :param language: The language as a ISO 639-1 code.
     :param append_to_response: A list of additinal methods to append to the response.
+    :param model: True to get a Page of Movie models of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The movie similar movies if it exists.
     """
 
     return make_request('movie/%s/similar_movies' % _id, parameters={
         'language': language,
         'append_to_response': append_to_response and ','.join(append_to_response) or None,
-    })
+    }, model=functools.partial(Page, model_class=Movie) if model else None)
 
 def get_movie_lists(_id, language=None, append_to_response=None):
     """
@@ -381,18 +455,22 @@ def set_movie_rating(_id, rating):
 
     raise NotImplementedError()
 
-def get_collection(_id, language=None):
+def get_collection(_id, language=None, append_to_response=None, fields=None, model=False):
     """
     Get a collection.
 
     :param _id: The collection identifier.
     :param language: The language as a ISO 639-1 code.
+    :param append_to_response: A list of additinal methods to append to the response.
+    :param fields: A list of the fields of the response to keep, e.g. ['id', 'title', 'casts.cast']. Defaults to all of them.
+    :param model: True to get a Collection model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The collection.
     """
 
     return make_request('collection/%s' % _id, parameters={
         'language': language,
-    })
+        'append_to_response': append_to_response and ','.join(append_to_response) or None,
+    }, fields=fields, model=Collection if model else None)
 
 def get_collection_images(_id, language=None):
     """
@@ -407,15 +485,20 @@ def get_collection_images(_id, language=None):
         'language': language,
     })
 
-def get_person(_id):
+def get_person(_id, append_to_response=None, fields=None, model=False):
     """
     Get the person that has the specified id.
 
     :param _id: The person identifier.
+    :param append_to_response: A list of additinal methods to append to the response.
+    :param fields: A list of the fields of the response to keep, e.g. ['id', 'title', 'casts.cast']. Defaults to all of them.
+    :param model: True to get a Person model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The person.
     """
 
-    return make_request('person/%s' % _id)
+    return make_request('person/%s' % _id, parameters={
+        'append_to_response': append_to_response and ','.join(append_to_response) or None,
+    }, fields=fields, model=Person if model else None)
 
 def get_person_credits(_id, language=None):
     """
@@ -474,15 +557,16 @@ def get_list(_id):
 
     return make_request('list/%s' % _id)
 
-def get_company(_id):
+def get_company(_id, model=False):
     """
     Get the company that has the specified id.
 
     :param _id: The company identifier.
+    :param model: True to get a Company model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The company.
     """
 
-    return make_request('company/%s' % _id)
+    return make_request('company/%s' % _id, model=Company if model else None)
 
 def get_company_movies(_id, page=None, language=None):
     """
@@ -528,15 +612,16 @@ def get_movies_by_genre(_id, page=None, language=None, include_all_movies=False)
         'include_all_movies': include_all_movies,
     })
 
-def get_keyword(_id):
+def get_keyword(_id, model=False):
     """
     Get the keyword that has the specified id.
 
     :param _id: The keyword identifier.
+    :param model: True to get a Keyword model of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The keyword.
     """
 
-    return make_request('keyword/%s' % _id)
+    return make_request('keyword/%s' % _id, model=Keyword if model else None)
 
 def get_movies_by_keyword(_id, page=None, language=None):
     """
@@ -553,7 +638,7 @@ def get_movies_by_keyword(_id, page=None, language=None):
         'language': language,
     })
 
-def search_movie(query, page=None, language=None, include_adult=False, year=None):
+def search_movie(query, page=None, language=None, include_adult=False, year=None, model=False):
     """
     Search for a movie.
 
@@ -562,6 +647,7 @@ def search_movie(query, page=None, language=None, include_adult=False, year=None
     :param language: The language as a ISO 639-1 code.
     :param include_adult: Whether to include adult movies in the result.
     :param year: Limit search to a specific year.
+    :param model: True to get a Page of Movie models of `pythemoviedb.api.objects` rather than a dictionary.
     :returns: The movies list.
     """
 
@@ -571,7 +657,7 @@ def search_movie(query, page=None, language=None, include_adult=False, year=None
         'language': language,
         'include_adult': include_adult,
         'year': year,
-    })
+    }, model=functools.partial(Page, model_class=Movie) if model else None)
 
 def search_collection(query, page=None, language=None):
     """
@@ -680,3 +766,39 @@ def get_changed_persons(page=None, start_date=None, stop_date=None):
         'start_date': format_date(start_date),
         'stop_date': format_date(stop_date),
     })
+
+def get_movies(ids, language=None, append_to_response=None, concurrency=configuration.POOL_SIZE):
+    """
+    Get many movies concurrently.
+
+    :param ids: An iterable of movie identifiers.
+    :param language: The language as a ISO 639-1 code.
+    :param append_to_response: A list of additinal methods to append to the response.
+    :param concurrency: The number of simultaneous requests.
+    :returns: A generator of (id, movie_or_APIError) tuples, in completion order.
+    """
+
+    return fetch_all(get_movie, ids, concurrency, language=language, append_to_response=append_to_response)
+
+def get_persons(ids, concurrency=configuration.POOL_SIZE):
+    """
+    Get many persons concurrently.
+
+    :param ids: An iterable of person identifiers.
+    :param concurrency: The number of simultaneous requests.
+    :returns: A generator of (id, person_or_APIError) tuples, in completion order.
+    """
+
+    return fetch_all(get_person, ids, concurrency)
+
+def get_collections(ids, language=None, concurrency=configuration.POOL_SIZE):
+    """
+    Get many collections concurrently.
+
+    :param ids: An iterable of collection identifiers.
+    :param language: The language as a ISO 639-1 code.
+    :param concurrency: The number of simultaneous requests.
+    :returns: A generator of (id, collection_or_APIError) tuples, in completion order.
+    """
+
+    return fetch_all(get_collection, ids, concurrency, language=language)
@@ -0,0 +1,159 @@
+"""
+The API pagination functions.
+
+This module provides an `iter_<name>` generator for each paginated request
+function of `pythemoviedb.api.methods`, that takes the same parameters except
+`page` and yields the results of all the pages.
+"""
+
+import pythemoviedb.api.methods as methods
+
+import collections
+import inspect
+import threading
+
+DEFAULT_PREFETCH = 2
+
+class _PageRequest(threading.Thread):
+    """
+    A page request running in a background thread.
+    """
+
+    def __init__(self, function, page, args, kwargs):
+        """
+        Create and start a page request.
+        """
+
+        super(_PageRequest, self).__init__()
+
+        self.function = function
+        self.page = page
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.exception = None
+
+        self.daemon = True
+        self.start()
+
+    def run(self):
+        """
+        Fetch the page.
+        """
+
+        try:
+            self.result = self.function(*self.args, page=self.page, **self.kwargs)
+        except Exception as ex:
+            self.exception = ex
+
+    def get_result(self):
+        """
+        Wait for the page and get it.
+
+        :returns: The page.
+        """
+
+        self.join()
+
+        if self.exception is not None:
+            raise self.exception
+
+        return self.result
+
+def iterate_pages(function, *args, **kwargs):
+    """
+    Iterate over the results of all the pages of a paginated request function.
+
+    The pages are fetched lazily: while the results of a page are consumed, the
+    next `prefetch` pages are fetched in background threads. At most
+    `prefetch + 1` pages are held in memory at any time.
+
+    :param function: The paginated request function. It must accept a `page` keyword argument.
+    :param args: The positional arguments for `function`.
+    :param kwargs: The keyword arguments for `function`.
+    :param prefetch: The number of pages to fetch ahead. Defaults to DEFAULT_PREFETCH.
+    :param max_items: The maximum number of results to yield.
+    :param max_pages: The maximum number of pages to fetch.
+    :param first_page: The first page to fetch. Defaults to 1.
+    :returns: A generator of results.
+    """
+
+    prefetch = kwargs.pop('prefetch', DEFAULT_PREFETCH)
+    max_items = kwargs.pop('max_items', None)
+    max_pages = kwargs.pop('max_pages', None)
+    first_page = kwargs.pop('first_page', 1)
+
+    if max_items is not None and max_items <= 0:
+        return
+
+    data = function(*args, page=first_page, **kwargs)
+    last_page = data.get('total_pages') or first_page
+
+    if max_pages is not None:
+        last_page = min(last_page, first_page + max_pages - 1)
+
+    next_page = first_page + 1
+    requests = collections.deque()
+    count = 0
+
+    while True:
+        while next_page <= last_page and len(requests) < prefetch:
+            requests.append(_PageRequest(function, next_page, args, kwargs))
+            next_page += 1
+
+        for result in data.get('results') or ():
+            yield result
+
+            count += 1
+
+            if max_items is not None and count >= max_items:
+                return
+
+        if requests:
+            data = requests.popleft().get_result()
+        elif next_page <= last_page:
+            data = function(*args, page=next_page, **kwargs)
+            next_page += 1
+        else:
+            return
+
+def _get_arguments(function):
+    """
+    Get the argument names of a function.
+    """
+
+    return function.__code__.co_varnames[:function.__code__.co_argcount]
+
+def _make_iterator_function(function):
+    """
+    Make an iterator function out of a paginated request function.
+    """
+
+    def wrapper(*args, **kwargs):
+        return iterate_pages(function, *args, **kwargs)
+
+    wrapper.__name__ = 'iter_' + function.__name__
+    wrapper.__doc__ = """
+    Iterate over the results of all the pages of `%s`.
+
+    See `iterate_pages` for the additional `prefetch`, `max_items`, `max_pages` and `first_page` keyword arguments.
+    """ % function.__name__
+
+    return wrapper
+
+def _is_paginated_function(function):
+    """
+    Check whether a member of the methods module is a paginated request function.
+    """
+
+    return (
+        inspect.isfunction(function)
+        and function.__module__ == methods.__name__
+        and 'page' in _get_arguments(function)
+    )
+
+__all__ = ['iterate_pages']
+
+for _name, _function in inspect.getmembers(methods, _is_paginated_function):
+    globals()['iter_' + _name] = _make_iterator_function(_function)
+    __all__.append('iter_' + _name)
@@ -0,0 +1,350 @@
+"""
+The API prefetching classes.
+
+Requests tend to follow each other: a movie is most often followed by its
+collection, its top-billed cast and its similar movies. A Prefetcher looks
+at the responses of the requests, and fetches the related entities in the
+background, at a low priority, so that they are in the cache, or in the
+entity store, when they are requested:
+
+    set_cache(MemoryCache(64 * 1024 * 1024))
+    set_prefetcher(Prefetcher(depth=1, budget=2.0))
+
+Prefetching is off by default, and needs a cache or an entity store to keep
+the prefetched responses.
+"""
+
+import pythemoviedb.configuration as configuration
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.cache import get_cache, make_cache_key
+from pythemoviedb.api.request import build_query_string
+from pythemoviedb.api.store import get_store
+from pythemoviedb.api.ratelimit import get_rate_limiter
+from pythemoviedb.api.transport import get_transport
+from pythemoviedb.api.instrumentation import get_endpoint
+
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from collections import OrderedDict
+
+# The time, in seconds, a prefetch waits before checking again that the transport has a free connection.
+_SATURATED_WAIT = 0.01
+
+def _get_ids(items, limit, key=None):
+    """
+    Get the identifiers of the first items of a list.
+    """
+
+    if not isinstance(items, list):
+        return []
+
+    items = [item for item in items if isinstance(item, dict) and item.get('id') is not None]
+
+    if key is not None:
+        items.sort(key=key)
+
+    return [item['id'] for item in items[:limit]]
+
+def get_related(action, parameters, result, max_people=3, max_movies=3):
+    """
+    Get the requests that are likely to follow a request.
+
+    :param action: The action of the request.
+    :param parameters: The parameters of the request.
+    :param result: The decoded response.
+    :param max_people: The maximum number of top-billed people to get.
+    :param max_movies: The maximum number of similar movies, or collection parts, to get.
+    :returns: A list of (action, parameters) tuples.
+    """
+
+    if not isinstance(result, dict):
+        return []
+
+    endpoint = get_endpoint(action)
+    language = (parameters or {}).get('language')
+    related = []
+    movie_parameters = {'language': language}
+
+    if endpoint == 'movie/{id}':
+        collection = result.get('belongs_to_collection')
+
+        if isinstance(collection, dict) and collection.get('id') is not None:
+            related.append(('collection/%s' % collection['id'], {'language': language}))
+
+        credits = result.get('casts') or result.get('credits') or {}
+        cast = credits.get('cast') if isinstance(credits, dict) else None
+        similar = result.get('similar_movies') or result.get('similar') or {}
+        similar = similar.get('results') if isinstance(similar, dict) else None
+
+        # The similar movies are likely to be requested like the movie was.
+        movie_parameters = parameters
+
+    elif endpoint == 'movie/{id}/casts':
+        cast = result.get('cast')
+        similar = None
+
+    elif endpoint == 'movie/{id}/similar_movies':
+        cast = None
+        similar = result.get('results')
+
+    elif endpoint == 'collection/{id}':
+        cast = None
+        similar = result.get('parts')
+
+    else:
+        return related
+
+    for _id in _get_ids(cast, max_people, key=lambda item: item.get('order') or 0):
+        related.append(('person/%s' % _id, {}))
+
+    for _id in _get_ids(similar, max_movies):
+        related.append(('movie/%s' % _id, movie_parameters))
+
+    return related
+
+class Prefetcher(object):
+    """
+    A background prefetcher of related entities.
+
+    The related requests are queued with the depth at which they were found:
+    those of the requests made by the application are at depth 1, those of
+    the prefetched responses at depth 2, and so on, up to `depth`. The
+    shallowest requests are prefetched first, when neither the shared rate
+    limiter, if any, nor the rate limits of the API keys of the client, nor
+    the connection pool would make them wait, so that the requests of the
+    application keep the priority. The queue is bounded,
+    and the number of prefetches is capped to `budget` times the number of
+    requests of the application.
+    """
+
+    def __init__(self, depth=1, budget=2.0, max_people=3, max_movies=3, workers=1, queue_size=100, max_keys=10000):
+        """
+        Create a prefetcher.
+
+        :param depth: The number of hops from the requests of the application, e.g. 2 to also prefetch the collections of the similar movies.
+        :param budget: The maximum number of prefetches per request of the application.
+        :param max_people: The maximum number of top-billed people prefetched per movie.
+        :param max_movies: The maximum number of similar movies, or collection parts, prefetched per movie or collection.
+        :param workers: The number of background threads.
+        :param queue_size: The maximum number of queued prefetches. Requests found when the queue is full are dropped.
+        :param max_keys: The number of prefetched cache keys remembered to measure the hit rate.
+        """
+
+        self.depth = depth
+        self.budget = budget
+        self.max_people = max_people
+        self.max_movies = max_movies
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_keys = max_keys
+        self.requests = 0
+        self.queued = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.prefetched = 0
+        self.cached = 0
+        self.errors = 0
+        self.hits = 0
+
+        self._queue = []
+        self._pending = set()
+        self._prefetched_keys = OrderedDict()
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._pid = None
+
+    def observe(self, action, parameters, query_string, result, measurements, client=None):
+        """
+        Look at the outcome of a request, to measure the hit rate and queue the related requests.
+
+        :param action: The action.
+        :param parameters: The parameters of the request.
+        :param query_string: The stringified parameters of the request.
+        :param result: The decoded response, or None if it was not decoded.
+        :param measurements: The dictionary of the RequestEvent measurements of the request. The 'prefetch' measurement is set on the requests of the prefetcher.
+        :param client: The Client the request was made with, also used for the related requests.
+        """
+
+        if get_cache() is None and get_store() is None:
+            return
+
+        depth = getattr(self._local, 'depth', 0)
+        key = make_cache_key(action, query_string)
+        hit = measurements.get('cache') == 'hit' or measurements.get('store') == 'hit'
+
+        with self._condition:
+            if depth:
+                measurements['prefetch'] = True
+
+                if hit:
+                    self.cached += 1
+                else:
+                    self.prefetched += 1
+                    self._prefetched_keys[key] = True
+
+                    while len(self._prefetched_keys) > self.max_keys:
+                        self._prefetched_keys.popitem(last=False)
+
+            else:
+                self.requests += 1
+
+                # A request that joined a prefetch in flight did not wait for all of it.
+                if (hit or measurements.get('coalesced')) and (self._prefetched_keys.pop(key, None) or key in self._pending):
+                    self.hits += 1
+
+            if depth >= self.depth or result is None:
+                return
+
+            for related_action, related_parameters in get_related(action, parameters, result, self.max_people, self.max_movies):
+                self._enqueue(depth + 1, related_action, related_parameters, client)
+
+    def _enqueue(self, depth, action, parameters, client):
+        """
+        Queue a prefetch, unless it is already queued or prefetched. The caller holds the lock.
+        """
+
+        key = make_cache_key(action, build_query_string(parameters))
+
+        if key in self._pending or key in self._prefetched_keys:
+            return
+
+        if len(self._queue) >= self.queue_size:
+            self.dropped += 1
+
+            return
+
+        # Threads do not survive a fork.
+        if self._pid != os.getpid():
+            self._queue = []
+            self._pending = set()
+            self._pid = os.getpid()
+
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._run)
+                thread.daemon = True
+                thread.start()
+
+        heapq.heappush(self._queue, (depth, next(self._counter), key, action, parameters, client))
+        self._pending.add(key)
+        self.queued += 1
+        self._condition.notify()
+
+    def _try_prefetch(self):
+        """
+        Take a prefetch from the budget. The caller holds the lock.
+        """
+
+        if self.prefetched + self.errors + 1 > self.budget * self.requests:
+            self.skipped += 1
+
+            return False
+
+        return True
+
+    def _wait_for_idle(self, client):
+        """
+        Wait until a request can be made without delaying those of the application.
+        """
+
+        rate_limiter = get_rate_limiter()
+        transport = get_transport(client.base_url) if client is not None else None
+
+        while True:
+            delay = rate_limiter.get_delay() if rate_limiter is not None else 0.0
+            keys = client.get_usable_keys() if client is not None else None
+
+            if delay <= 0 and keys:
+                # The client picks the key that waits the least.
+                delay = min(key.get_delay() for key in keys)
+
+            if delay <= 0 and transport is not None and transport.is_saturated():
+                delay = _SATURATED_WAIT
+
+            if delay <= 0:
+                return
+
+            time.sleep(delay)
+
+    def _run(self):
+        """
+        Prefetch the queued requests. Runs in a worker thread.
+        """
+
+        import pythemoviedb.api.methods as methods
+
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+
+                depth, _, key, action, parameters, client = heapq.heappop(self._queue)
+
+                if not self._try_prefetch():
+                    self._pending.discard(key)
+
+                    continue
+
+            try:
+                self._wait_for_idle(client)
+                self._local.depth = depth
+                methods.make_request(action, parameters, client=client)
+
+            except Exception as ex:
+                LOGGER.debug('Prefetching %s failed: %s', action, ex)
+
+                with self._condition:
+                    self.errors += 1
+
+            finally:
+                self._local.depth = 0
+
+                with self._condition:
+                    self._pending.discard(key)
+
+    def get_statistics(self):
+        """
+        Get the prefetching statistics.
+
+        :returns: A dictionary with the number of 'requests' of the application, of prefetches 'queued', 'dropped' because the queue was full, 'skipped' because of the budget, 'prefetched' from the server, already 'cached' and failed ('errors'), of prefetched responses that were requested ('hits'), the 'hit_rate' of the prefetched responses, and the number of 'pending' prefetches.
+        """
+
+        with self._condition:
+            return {
+                'requests': self.requests,
+                'queued': self.queued,
+                'dropped': self.dropped,
+                'skipped': self.skipped,
+                'prefetched': self.prefetched,
+                'cached': self.cached,
+                'errors': self.errors,
+                'hits': self.hits,
+                'hit_rate': float(self.hits) / self.prefetched if self.prefetched else 0.0,
+                'pending': len(self._pending),
+            }
+
+_PREFETCHER = Prefetcher(configuration.PREFETCH_DEPTH, configuration.PREFETCH_BUDGET) if configuration.PREFETCH_DEPTH else None
+
+def get_prefetcher():
+    """
+    Get the shared prefetcher.
+
+    :returns: The Prefetcher instance, or None if related entities are not prefetched.
+    """
+
+    return _PREFETCHER
+
+def set_prefetcher(prefetcher):
+    """
+    Set the shared prefetcher.
+
+    :param prefetcher: A Prefetcher instance, or None to disable prefetching.
+    """
+
+    global _PREFETCHER
+
+    _PREFETCHER = prefetcher
@@ -0,0 +1,252 @@
+"""
+The API rate limiting and retry classes.
+"""
+
+import pythemoviedb.configuration as configuration
+
+import calendar
+import random
+import threading
+import time
+
+from email.utils import parsedate
+
+class RateLimiter(object):
+    """
+    A token bucket rate limiter.
+
+    Each request takes a token from the bucket, which is refilled at `rate`
+    tokens per second up to `burst` tokens. Tokens are reserved rather than
+    waited for, so that the same limiter can be shared by threads, which
+    sleep, and asyncio tasks, which await.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Create a rate limiter.
+
+        :param rate: The number of requests allowed per second.
+        :param burst: The maximum number of requests that can be made at once. Defaults to `rate`.
+        """
+
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.requests = 0
+        self.delayed_requests = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+        self._tokens = self.burst
+        self._updated_at = time.time()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Reserve a token.
+
+        :returns: The delay, in seconds, to wait before making the request.
+        """
+
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+
+            delay = max(-self._tokens / self.rate, self._paused_until - now, 0.0)
+
+            self.requests += 1
+
+            if delay > 0:
+                self.delayed_requests += 1
+                self.total_delay += delay
+                self.max_delay = max(self.max_delay, delay)
+
+            return delay
+
+    def get_delay(self):
+        """
+        Get the delay a request would wait, without reserving a token.
+
+        :returns: The delay, in seconds.
+        """
+
+        with self._lock:
+            now = time.time()
+            tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate) - 1
+
+            return max(-tokens / self.rate, self._paused_until - now, 0.0)
+
+    def acquire(self):
+        """
+        Reserve a token and wait until it is available.
+
+        :returns: The time waited, in seconds.
+        """
+
+        delay = self.reserve()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+    def pause(self, delay):
+        """
+        Prevent any request from being made for some time.
+
+        :param delay: The delay, in seconds.
+        """
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + delay)
+
+    def get_statistics(self):
+        """
+        Get the queueing statistics.
+
+        :returns: A dictionary with the number of requests, the number of delayed requests, and the total, average and maximum delays.
+        """
+
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'delayed_requests': self.delayed_requests,
+                'total_delay': self.total_delay,
+                'average_delay': self.total_delay / self.requests if self.requests else 0.0,
+                'max_delay': self.max_delay,
+            }
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    :param value: The header value, either a number of seconds or a HTTP date.
+    :returns: The delay in seconds, or None if the value cannot be parsed.
+    """
+
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    date = parsedate(value)
+
+    if date is None:
+        return None
+
+    return max(calendar.timegm(date) - time.time(), 0.0)
+
+class RetryPolicy(object):
+    """
+    A retry policy for transient failures, with jittered exponential backoff.
+    """
+
+    def __init__(self, max_retries=configuration.MAX_RETRIES, backoff_base=0.5, backoff_max=30.0, retry_statuses=(429, 502, 503, 504)):
+        """
+        Create a retry policy.
+
+        :param max_retries: The maximum number of retries of a request.
+        :param backoff_base: The base backoff delay, in seconds, doubled at each retry.
+        :param backoff_max: The maximum backoff delay, in seconds.
+        :param retry_statuses: The HTTP status codes that are retried.
+        """
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retries = 0
+        self.failures = 0
+
+        self._lock = threading.Lock()
+
+    def get_delay(self, attempt, response=None):
+        """
+        Get the delay before retrying a request.
+
+        :param attempt: The number of retries already made for the request.
+        :param response: The failed Response, or None if the request failed at the connection level.
+        :returns: The delay in seconds, or None if the request must not be retried.
+        """
+
+        if response is not None and response.status not in self.retry_statuses:
+            return None
+
+        with self._lock:
+            if attempt >= self.max_retries:
+                self.failures += 1
+
+                return None
+
+            self.retries += 1
+
+        delay = None
+
+        if response is not None:
+            delay = parse_retry_after(response.headers.get('retry-after'))
+
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+        return delay
+
+    def get_statistics(self):
+        """
+        Get the retry statistics.
+
+        :returns: A dictionary with the number of retries, and the number of requests that failed after all their retries.
+        """
+
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'failures': self.failures,
+            }
+
+_RATE_LIMITER = RateLimiter(configuration.RATE_LIMIT, configuration.RATE_BURST) if configuration.RATE_LIMIT else None
+_RETRY_POLICY = RetryPolicy()
+
+def get_rate_limiter():
+    """
+    Get the shared rate limiter.
+
+    :returns: The RateLimiter instance, or None if requests are not rate limited.
+    """
+
+    return _RATE_LIMITER
+
+def set_rate_limiter(rate_limiter):
+    """
+    Set the shared rate limiter.
+
+    :param rate_limiter: A RateLimiter instance, or None to disable rate limiting.
+    """
+
+    global _RATE_LIMITER
+
+    _RATE_LIMITER = rate_limiter
+
+def get_retry_policy():
+    """
+    Get the shared retry policy.
+
+    :returns: The RetryPolicy instance, or None if requests are not retried.
+    """
+
+    return _RETRY_POLICY
+
+def set_retry_policy(retry_policy):
+    """
+    Set the shared retry policy.
+
+    :param retry_policy: A RetryPolicy instance, or None to disable retries.
+    """
+
+    global _RETRY_POLICY
+
+    _RETRY_POLICY = retry_policy
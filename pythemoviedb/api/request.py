@@ -0,0 +1,626 @@
+"""
+The API request functions and classes.
+
+A request goes through the cache and the entity store, then, unless it is
+coalesced with an identical request in flight, through the circuit breaker,
+the rate limiters, the API keys of the client, the hedging policy and the
+retries, before it is sent by the transport. `fetch_body` does all of this
+and returns the response body; the request functions of
+`pythemoviedb.api.methods` decode it. RequestAttempts and BodyFetch hold the
+logic without the I/O, so that the asyncio API shares it.
+"""
+
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.error import APIError
+from pythemoviedb.api.transport import ACCEPT_ENCODING, TRANSIENT_ERRORS, Response, get_transport
+from pythemoviedb.api.ratelimit import get_rate_limiter, get_retry_policy
+from pythemoviedb.api.cache import get_cache, make_cache_key
+from pythemoviedb.api.decoder import get_decoder
+from pythemoviedb.api.store import get_store
+from pythemoviedb.api.singleflight import get_single_flight
+from pythemoviedb.api.client import get_client
+from pythemoviedb.api.hedging import get_hedge_policy
+from pythemoviedb.api.circuit import get_circuit_breaker, is_failure
+from pythemoviedb.api.instrumentation import get_endpoint
+
+import time
+
+try:
+    from urllib import urlencode
+    from urllib2 import HTTPError
+    import urlparse
+except ImportError:
+    from urllib.parse import urlencode
+    from urllib.error import HTTPError
+    import urllib.parse as urlparse
+
+from io import BytesIO
+
+def stringify_value(value):
+    """
+    Convert a parameter value to its API representation.
+
+    :param value: The value.
+    :returns: The value, as a string.
+    """
+
+    if value is True:
+        return 'true'
+    elif value is False:
+        return 'false'
+
+    return str(value)
+
+def build_query_string(parameters):
+    """
+    Build the query string parameters of a request.
+
+    :param parameters: A dictionary of parameters. None values are ignored.
+    :returns: A dictionary of stringified parameters.
+    """
+
+    return dict((key, stringify_value(value)) for key, value in (parameters or {}).items() if value is not None)
+
+def build_url(action, query_string, base_url=None, api_version=None, api_key=None):
+    """
+    Build the URL of a request.
+
+    :param action: The action, relative to the API version.
+    :param query_string: A dictionary of stringified parameters, as returned by build_query_string.
+    :param base_url: The API base URL. Defaults to the one of the shared client.
+    :param api_version: The API version. Defaults to the one of the shared client.
+    :param api_key: The API key, or None to leave it out of the URL. See add_api_key.
+    :returns: The URL.
+    """
+
+    if not base_url or not api_version:
+        client = get_client()
+        base_url = base_url or client.base_url
+        api_version = api_version or client.api_version
+
+    if api_key:
+        query_string = dict(query_string, api_key=api_key)
+
+    url = urlparse.urljoin(base_url, '/'.join([api_version, action]))
+
+    if query_string:
+        url += '?' + urlencode(sorted(query_string.items()))
+
+    return url
+
+def add_api_key(url, api_key):
+    """
+    Add an API key to a URL built without one.
+
+    :param url: The URL, as returned by build_url.
+    :param api_key: The API key.
+    :returns: The URL.
+    """
+
+    return url + ('&' if '?' in url else '?') + urlencode([('api_key', api_key)])
+
+def check_response(url, response):
+    """
+    Check that a response is successful.
+
+    :param url: The requested URL.
+    :param response: The transport Response.
+    """
+
+    if response.status < 400:
+        return
+
+    if response.status in (401, 404, 429, 503):
+        try:
+            data = decode_body(response.body)
+        except ValueError:
+            pass
+        else:
+            raise APIError(**data)
+
+    raise HTTPError(url, response.status, response.reason, response.headers, BytesIO(response.body))
+
+def decode_body(body, fields=None):
+    """
+    Decode a response body with the shared decoder.
+
+    :param body: The body, as bytes.
+    :param fields: A list of the fields to keep, or None to keep them all. See `pythemoviedb.api.decoder`.
+    :returns: The decoded body.
+    """
+
+    return get_decoder().decode(body, fields)
+
+def get_validators(headers):
+    """
+    Get the validators of a response, to revalidate it later.
+
+    :param headers: The response headers, as a dictionary with lowercase keys.
+    :returns: A dictionary with the 'etag' and/or 'last-modified' headers, or None if there is none.
+    """
+
+    validators = dict((name, headers[name]) for name in ('etag', 'last-modified') if headers.get(name))
+
+    return validators or None
+
+def get_conditional_headers(validators):
+    """
+    Get the headers of a conditional request.
+
+    :param validators: The validators of the cached response, as returned by get_validators, or None.
+    :returns: A dictionary of headers, empty if there are no validators.
+    """
+
+    headers = {}
+
+    if validators:
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+
+        if 'last-modified' in validators:
+            headers['If-Modified-Since'] = validators['last-modified']
+
+    return headers
+
+class RequestAttempts(object):
+    """
+    The attempts of a request: rate limiting, API key rotation and retries.
+
+    This holds the logic of send_request without its I/O, so that it is
+    shared with the asyncio API: the caller sends the requests and waits for
+    the delays.
+    """
+
+    def __init__(self, action, url, measurements=None, headers=None, client=None):
+        """
+        Prepare the attempts of a request.
+
+        :param action: The action, for logging purposes.
+        :param url: The URL to request.
+        :param measurements: A dictionary where the RequestEvent measurements of the request are stored, if specified.
+        :param headers: A dictionary of additional headers, e.g. conditional request headers.
+        :param client: The Client whose keys are added to the URL, or None if the URL already has a key.
+        """
+
+        self.action = action
+        self.url = url
+        self.measurements = measurements
+        self.client = client
+        self.rate_limiter = get_rate_limiter()
+        self.retry_policy = get_retry_policy()
+        self.attempt = 0
+        self.rotations = 0
+        self.key = None
+        self.headers = dict({
+            'Accept': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING,
+        }, **(headers or {}))
+
+    def start(self):
+        """
+        Reserve the rate limits of an attempt and choose its API key.
+
+        :returns: A (request_url, delay) tuple. The request must wait for the delay, in seconds, before being sent.
+        """
+
+        delay = self.rate_limiter.reserve() if self.rate_limiter is not None else 0.0
+        request_url = self.url
+
+        if self.client is not None:
+            self.key, key_delay = self.client.reserve()
+            request_url = add_api_key(self.url, self.key.key)
+            delay = max(delay, key_delay)
+
+        return request_url, delay
+
+    def fail(self, error):
+        """
+        Handle an attempt that failed at the connection level.
+
+        :param error: The exception raised by the transport.
+        :returns: The delay, in seconds, before the next attempt, or None if the error must be raised.
+        """
+
+        if self.key is not None:
+            self.client.report(self.key, error=error)
+
+        delay = self.retry_policy and self.retry_policy.get_delay(self.attempt)
+
+        if delay is not None:
+            LOGGER.debug('Request to %s failed (%s): retrying in %.2fs', self.action, error, delay)
+            self.attempt += 1
+
+        return delay
+
+    def complete(self, response):
+        """
+        Handle the response of an attempt.
+
+        :param response: The transport Response.
+        :returns: The delay, in seconds, before the next attempt, or None if the response is the final one.
+        """
+
+        if self.key is not None and self.client.report(self.key, response) and self.rotations < len(self.client.keys):
+            LOGGER.debug('Request to %s failed with key %s (HTTP %s): retrying with another key', self.action, self.key.get_name(), response.status)
+            self.rotations += 1
+
+            return 0.0
+
+        delay = self.retry_policy and self.retry_policy.get_delay(self.attempt, response)
+
+        if delay is None:
+            return None
+
+        if response.status == 429 and self.rate_limiter is not None:
+            self.rate_limiter.pause(delay)
+
+        LOGGER.debug('Request to %s failed (HTTP %s): retrying in %.2fs', self.action, response.status, delay)
+        self.attempt += 1
+
+        return delay
+
+    def finish(self, response):
+        """
+        Measure and check the final response.
+
+        :param response: The final transport Response.
+        :returns: The response, if it is successful.
+        """
+
+        if self.measurements is not None:
+            measure_response(response, self.attempt, self.measurements)
+
+            if self.key is not None:
+                self.measurements['api_key'] = self.key.get_name()
+
+        check_response(self.url, response)
+
+        return response
+
+def send_request(action, url, transport, measurements=None, stream=False, headers=None, client=None):
+    """
+    Send a request, with rate limiting and retries, and check its response.
+
+    Compressed responses are requested, and decompressed by the transport.
+    With a client, each attempt is made with the key chosen by the client,
+    and a request rejected because of its key is retried at once with
+    another key. Read-only requests are hedged when a HedgePolicy is set.
+
+    :param action: The action, for logging purposes.
+    :param url: The URL to request.
+    :param transport: The Transport to use.
+    :param measurements: A dictionary where the RequestEvent measurements of the request are stored, if specified.
+    :param stream: True to return a StreamingResponse, whose body is not read yet. Error responses are read completely.
+    :param headers: A dictionary of additional headers, e.g. conditional request headers.
+    :param client: The Client whose keys are added to the URL, or None if the URL already has a key.
+    :returns: The successful transport Response.
+    """
+
+    attempts = RequestAttempts(action, url, measurements, headers, client)
+    hedge_policy = get_hedge_policy()
+
+    if hedge_policy is not None and (stream or not hedge_policy.accepts(action)):
+        hedge_policy = None
+
+    while True:
+        request_url, delay = attempts.start()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        try:
+            if stream:
+                response = open_stream(transport, request_url, headers=attempts.headers)
+            elif hedge_policy is not None:
+                response = hedge_policy.request(transport, get_endpoint(action), request_url, headers=attempts.headers, measurements=measurements, key=attempts.key)
+            else:
+                response = transport.request(request_url, headers=attempts.headers)
+
+        except TRANSIENT_ERRORS as ex:
+            delay = attempts.fail(ex)
+
+            if delay is None:
+                raise
+
+        else:
+            delay = attempts.complete(response)
+
+            if delay is None:
+                break
+
+        if delay > 0:
+            time.sleep(delay)
+
+    return attempts.finish(response)
+
+def open_stream(transport, url, headers):
+    """
+    Send a request and get a StreamingResponse, unless it failed.
+
+    :param transport: The Transport to use.
+    :param url: The URL to request.
+    :param headers: A dictionary of headers to send.
+    :returns: A StreamingResponse if the request succeeded, a Response otherwise.
+    """
+
+    response = transport.stream(url, headers=headers)
+
+    if response.status < 400:
+        return response
+
+    # Error bodies are small and must be read for the retries and the error checks.
+    with response:
+        body = response.read()
+
+    return Response(response.status, response.reason, response.headers, body, response.timings, wire_bytes=response.bytes_read)
+
+def measure_response(response, retries, measurements):
+    """
+    Store the measurements of a response.
+
+    :param response: The transport Response.
+    :param retries: The number of retries made.
+    :param measurements: The dictionary where the RequestEvent measurements are stored.
+    """
+
+    measurements.update(
+        status=response.status,
+        retries=retries,
+        response_bytes=len(response.body) if response.body is not None else None,
+        wire_bytes=response.wire_bytes if response.body is not None else None,
+        pool_wait_time=response.timings.get('pool_wait'),
+        dns_time=response.timings.get('dns'),
+        connect_time=response.timings.get('connect'),
+        ttfb=response.timings.get('ttfb'),
+        transfer_time=response.timings.get('transfer'),
+    )
+
+class BodyFetch(object):
+    """
+    The fetch of a response body: the cache and entity store lookups, the
+    conditional requests, the circuit breaker and the stale responses.
+
+    This holds the logic of fetch_body without its I/O, so that it is shared
+    with the asyncio API: the caller sends the request.
+    """
+
+    def __init__(self, action, query_string, base_url, api_version, api_key, cache, measurements, transient_errors=TRANSIENT_ERRORS):
+        """
+        Prepare the fetch of a body.
+
+        :param api_key: The API key, or None to use the keys of the client.
+        :param cache: The Cache to use. If not specified, the shared cache is used, if any.
+        :param measurements: The dictionary where the RequestEvent measurements are stored.
+        :param transient_errors: The connection level exceptions of the transport, which are failures of the API.
+        """
+
+        if cache is None:
+            cache = get_cache()
+
+        if cache is not None and cache.get_ttl(action) <= 0:
+            cache = None
+
+        store = get_store()
+
+        if store is not None and not store.accepts(action):
+            store = None
+
+        self.action = action
+        self.cache = cache
+        self.store = store
+        self.measurements = measurements
+        self.transient_errors = transient_errors
+        self.cache_key = make_cache_key(action, query_string) if cache is not None or store is not None else None
+        self.stale = None
+        self.url = build_url(action, query_string, base_url=base_url, api_version=api_version, api_key=api_key)
+        self.endpoint = get_endpoint(action)
+        self.circuit_breaker = get_circuit_breaker()
+
+    def lookup(self):
+        """
+        Get the body from the cache or from the entity store.
+
+        :returns: The body, or None if it must be requested.
+        """
+
+        if self.cache is not None:
+            body = self.cache.get(self.cache_key)
+
+            if body is not None:
+                self.measurements.update(cache='hit', response_bytes=len(body))
+
+                return body
+
+            self.measurements['cache'] = 'miss'
+
+            # An expired entry is revalidated rather than fetched again.
+            self.stale = self.cache.get_stale(self.cache_key)
+
+        if self.store is not None:
+            body = self.store.get(self.cache_key)
+
+            if body is not None:
+                self.measurements.update(store='hit', response_bytes=len(body))
+
+                return body
+
+            self.measurements['store'] = 'miss'
+
+        return None
+
+    def start(self):
+        """
+        Prepare the request, when it is actually sent rather than coalesced.
+
+        Every started request must be completed with `complete`, failed with
+        `fail`, or interrupted with `interrupt`.
+
+        :returns: The conditional request headers.
+        :raises CircuitOpenError: if the circuit of the endpoint is open.
+        """
+
+        self.measurements['coalesced'] = False
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.acquire(self.endpoint)
+
+        return get_conditional_headers(self.stale and self.stale[1])
+
+    def fail(self, error):
+        """
+        Record a failed request.
+
+        :param error: The exception raised by send_request.
+        """
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(self.endpoint, is_failure(error, self.transient_errors))
+
+    def interrupt(self):
+        """
+        Record a request interrupted by a BaseException, e.g. cancelled, whose outcome is unknown.
+        """
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.release(self.endpoint)
+
+    def complete(self, response):
+        """
+        Record a successful request, and store its body.
+
+        :param response: The successful transport Response.
+        :returns: The body.
+        """
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record(self.endpoint, False)
+
+        if response.status == 304 and self.stale is not None:
+            body, validators = self.stale
+            self.measurements.update(revalidated=True, response_bytes=len(body))
+            self.cache.renew(self.cache_key, body, self.cache.get_ttl(self.action), get_validators(response.headers) or validators)
+        else:
+            body = response.body
+
+            if self.cache is not None:
+                self.cache.set(self.cache_key, body, self.cache.get_ttl(self.action), get_validators(response.headers))
+
+        if self.store is not None:
+            self.store.put(self.cache_key, body)
+
+        return body
+
+    def get_in_flight_stale(self, single_flight):
+        """
+        Get the stale body to serve while the same request is already being refreshed.
+
+        :param single_flight: The single-flight group the request would be coalesced in.
+        :returns: The stale body, or None if the request must be coalesced.
+        """
+
+        if self.circuit_breaker is None or self.cache is None and self.store is None or not single_flight.is_in_flight(self.url):
+            return None
+
+        return self._serve_stale()
+
+    def get_fallback(self, error):
+        """
+        Get the stale body to serve instead of raising an error.
+
+        :param error: The exception raised by the request.
+        :returns: The stale body, or None if the error must be raised.
+        """
+
+        if self.circuit_breaker is None or self.cache is None and self.store is None or not is_failure(error, self.transient_errors):
+            return None
+
+        body = self._serve_stale()
+
+        if body is not None:
+            LOGGER.debug('Request to %s failed (%s): serving stale data', self.action, error)
+
+        return body
+
+    def _serve_stale(self):
+        """
+        Get the last known good body, from the cache or from the entity store, and count it.
+        """
+
+        if self.stale is not None:
+            body = self.stale[0]
+        elif self.store is not None:
+            entry = self.store.get_entry(self.cache_key)
+            body = entry and entry[0]
+        else:
+            body = None
+
+        if body is not None:
+            self.measurements.update(stale=True, response_bytes=len(body))
+            self.circuit_breaker.record_stale(self.endpoint)
+
+        return body
+
+def fetch_body(action, query_string, base_url, api_version, api_key, transport, cache, measurements, client=None):
+    """
+    Get the body of a request, from the cache, from the entity store or from the server.
+
+    With a circuit breaker, the last known good body, from the cache or from
+    the entity store, is served as stale data while the circuit of the
+    endpoint is open, when the API fails, and while the same request is
+    already being refreshed.
+
+    :param api_key: The API key, or None to use the keys of the client.
+    :param measurements: The dictionary where the RequestEvent measurements are stored.
+    :param client: The Client whose keys are used when no API key is specified.
+    :returns: The body, as bytes, or as a memoryview when it comes from the entity store.
+    """
+
+    body_fetch = BodyFetch(action, query_string, base_url, api_version, api_key, cache, measurements)
+    body = body_fetch.lookup()
+
+    if body is not None:
+        return body
+
+    if transport is None:
+        transport = get_transport(body_fetch.url)
+
+    def fetch():
+        headers = body_fetch.start()
+
+        try:
+            response = send_request(action, body_fetch.url, transport, measurements, headers=headers, client=None if api_key else client)
+
+        except Exception as ex:
+            body_fetch.fail(ex)
+
+            raise
+
+        except BaseException:
+            body_fetch.interrupt()
+
+            raise
+
+        return body_fetch.complete(response)
+
+    single_flight = get_single_flight()
+
+    try:
+        if single_flight is not None:
+            body = body_fetch.get_in_flight_stale(single_flight)
+
+            if body is not None:
+                return body
+
+            measurements['coalesced'] = True
+
+            return single_flight.do(body_fetch.url, fetch)
+
+        return fetch()
+
+    except Exception as ex:
+        body = body_fetch.get_fallback(ex)
+
+        if body is None:
+            raise
+
+        return body
@@ -0,0 +1,137 @@
+"""
+The API request coalescing classes.
+"""
+
+import threading
+
+class _Call(object):
+    """
+    An in-flight call.
+    """
+
+    def __init__(self):
+        """
+        Create an in-flight call.
+        """
+
+        self.event = threading.Event()
+        self.result = None
+        self.exception = None
+        self.completed = False
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent identical calls into a single one.
+
+    While a call for a key is in flight, the threads that make a call for the
+    same key wait for it and get its result, or its exception, instead of
+    making their own call. If the call is interrupted, e.g. by a
+    KeyboardInterrupt in its thread, a waiting thread makes it again.
+    """
+
+    def __init__(self):
+        """
+        Create a single-flight group.
+        """
+
+        self.calls = 0
+        self.coalesced = 0
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function):
+        """
+        Call a function, unless a call with the same key is already in flight.
+
+        :param key: The key of the call.
+        :param function: The function to call, without arguments.
+        :returns: The result of the call.
+        """
+
+        with self._lock:
+            self.calls += 1
+
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    break
+
+            call.event.wait()
+
+            if call.completed or call.exception is not None:
+                with self._lock:
+                    self.coalesced += 1
+
+                if call.exception is not None:
+                    raise call.exception
+
+                return call.result
+
+            # The call was interrupted, e.g. by a KeyboardInterrupt in its thread: it is made again.
+
+        try:
+            call.result = function()
+            call.completed = True
+
+        except Exception as ex:
+            call.exception = ex
+
+            raise
+
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
+
+        return call.result
+
+    def is_in_flight(self, key):
+        """
+        Check whether a call is in flight.
+
+        :param key: The key of the call.
+        :returns: True if a call with the key is in flight.
+        """
+
+        with self._lock:
+            return key in self._calls
+
+    def get_statistics(self):
+        """
+        Get the coalescing statistics.
+
+        :returns: A dictionary with the number of calls and the number of calls that were coalesced.
+        """
+
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'coalesced': self.coalesced,
+            }
+
+_SINGLE_FLIGHT = SingleFlight()
+
+def get_single_flight():
+    """
+    Get the shared single-flight group.
+
+    :returns: The SingleFlight instance, or None if requests are not coalesced.
+    """
+
+    return _SINGLE_FLIGHT
+
+def set_single_flight(single_flight):
+    """
+    Set the shared single-flight group.
+
+    :param single_flight: A SingleFlight instance, or None to disable request coalescing.
+    """
+
+    global _SINGLE_FLIGHT
+
+    _SINGLE_FLIGHT = single_flight
@@ -0,0 +1,660 @@
+"""
+The API entity store classes.
+
+An EntityStore persists the response bodies of the movie, person and
+collection requests on the disk, keyed by their action and parameters, i.e.
+the entity type, identifier and language. When a store is configured with
+PYTHEMOVIEDB_STORE_PATH or `set_store`, `get_movie`, `get_person` and
+`get_collection` are answered from it while their entry is fresh, without
+any request, including after a restart:
+
+    set_store(EntityStore('/var/lib/tmdb'))
+    methods.get_movie(550)
+
+The store is made of two files:
+
+- an append-only data file of records: a header with the lengths and the
+  fetch time, the key, then the body. Updates and deletions append a new
+  record, the old ones are reclaimed by `compact`.
+- an index file: a header, then fixed-size entries (key hash, record offset,
+  fetch time, key and body lengths) sorted by key hash. It is memory-mapped
+  and searched by bisection, so that opening a store with millions of
+  entities reads nothing but the records appended since the index was last
+  written, and a lookup reads nothing but one entry and one record.
+
+The bodies are returned as memoryviews of the memory-mapped data file, on
+Python 3, so that they are not copied before they are decoded.
+"""
+
+import pythemoviedb.configuration as configuration
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.cache import make_cache_key
+from pythemoviedb.api.decoder import get_decoder
+
+import atexit
+import bisect
+import hashlib
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+ENTITY_ACTION_REGEX = re.compile(r'^(movie|person|collection)/\d+$')
+
+DATA_MAGIC = b'PTMDDAT1'
+INDEX_MAGIC = b'PTMDIDX1'
+
+# Magic, generation: the generation pairs an index with its data file.
+_DATA_HEADER = struct.Struct('<8sQ')
+# Magic, generation, size of the data file covered by the index, number of entries.
+_INDEX_HEADER = struct.Struct('<8sQQQ')
+# Key length, body length, fetch time.
+_RECORD_HEADER = struct.Struct('<IId')
+# Key hash, record offset, fetch time, key length, body length.
+_INDEX_ENTRY = struct.Struct('<QQdII')
+
+_DELETED = 0xFFFFFFFF
+
+def make_key(kind, _id, language=None):
+    """
+    Get the store key of an entity.
+
+    :param kind: 'movie', 'person' or 'collection'.
+    :param _id: The entity identifier.
+    :param language: The language as a ISO 639-1 code.
+    :returns: The key, which is the cache key of the request of the entity.
+    """
+
+    return make_cache_key('%s/%s' % (kind, _id), {'language': language} if language else {})
+
+def hash_key(key):
+    """
+    Get the 64 bits hash of a key.
+
+    :param key: The key, as bytes.
+    :returns: The hash, as an integer.
+    """
+
+    return struct.unpack('<Q', hashlib.md5(key).digest()[:8])[0]
+
+class _Entries(object):
+    """
+    A read-only sequence of the hashes of a memory-mapped index, for bisect.
+    """
+
+    def __init__(self, index_map, count):
+        """
+        Create the sequence.
+        """
+
+        self.index_map = index_map
+        self.count = count
+
+    def __len__(self):
+        """
+        Get the number of entries.
+        """
+
+        return self.count
+
+    def __getitem__(self, position):
+        """
+        Get the hash of an entry.
+        """
+
+        return struct.unpack_from('<Q', self.index_map, _INDEX_HEADER.size + position * _INDEX_ENTRY.size)[0]
+
+    def get(self, position):
+        """
+        Get an entry.
+
+        :returns: A (hash, offset, fetched_at, key_length, body_length) tuple.
+        """
+
+        return _INDEX_ENTRY.unpack_from(self.index_map, _INDEX_HEADER.size + position * _INDEX_ENTRY.size)
+
+class EntityStore(object):
+    """
+    A persistent store of entity response bodies.
+
+    The entries written since the index file was last written are indexed in
+    memory; the index file is rewritten when there are `index_interval` of
+    them, on `flush` and on `close`.
+    """
+
+    def __init__(self, directory, max_age=configuration.STORE_MAX_AGE, index_interval=65536):
+        """
+        Open a store, creating it if it does not exist.
+
+        :param directory: The store directory. It is created if it does not exist.
+        :param max_age: The age, in seconds, after which an entry is not fresh anymore and is fetched again.
+        :param index_interval: The number of entries written between two index file updates.
+        """
+
+        self.directory = directory
+        self.max_age = max_age
+        self.index_interval = index_interval
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+        self.data_path = os.path.join(directory, 'entities.dat')
+        self.index_path = os.path.join(directory, 'entities.idx')
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._data_file = None
+        self._data_map = None
+        self._data_view = None
+        self._index_map = None
+        self._entries = _Entries(b'', 0)
+        self._recent = {}
+        self._count = 0
+        self._lock = threading.RLock()
+
+        self._open()
+
+    def __len__(self):
+        """
+        Get the number of entries.
+        """
+
+        return self._count
+
+    def _open(self):
+        """
+        Open the data file, map the index, and index the records appended after it.
+        """
+
+        if not os.path.exists(self.data_path):
+            self._write_data_header(self.data_path, self._new_generation())
+
+        self._data_file = open(self.data_path, 'r+b')
+        magic, self.generation = _DATA_HEADER.unpack(self._data_file.read(_DATA_HEADER.size))
+
+        if magic != DATA_MAGIC:
+            raise ValueError('%s is not an entity store data file' % self.data_path)
+
+        self._data_file.seek(0, os.SEEK_END)
+        data_size = self._data_file.tell()
+
+        indexed_size = self._map_index(data_size)
+        self._map_data()
+
+        if indexed_size < data_size:
+            self._scan(indexed_size, data_size)
+
+    def _new_generation(self):
+        """
+        Get a random generation number.
+        """
+
+        return struct.unpack('<Q', os.urandom(8))[0]
+
+    def _write_data_header(self, path, generation):
+        """
+        Write an empty data file.
+        """
+
+        with open(path, 'wb') as data_file:
+            data_file.write(_DATA_HEADER.pack(DATA_MAGIC, generation))
+
+    def _map_index(self, data_size):
+        """
+        Map the index file, if it matches the data file.
+
+        :param data_size: The size of the data file.
+        :returns: The size of the data file covered by the index.
+        """
+
+        if self._index_map is not None:
+            self._index_map.close()
+
+        self._index_map = None
+        self._entries = _Entries(b'', 0)
+        self._count = 0
+
+        try:
+            with open(self.index_path, 'rb') as index_file:
+                index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        except (IOError, OSError, ValueError):
+            return _DATA_HEADER.size
+
+        if len(index_map) >= _INDEX_HEADER.size:
+            magic, generation, indexed_size, count = _INDEX_HEADER.unpack_from(index_map, 0)
+        else:
+            magic = None
+
+        if magic != INDEX_MAGIC or generation != self.generation or indexed_size > data_size or len(index_map) != _INDEX_HEADER.size + count * _INDEX_ENTRY.size:
+            LOGGER.warning('Ignoring the entity store index %s, that does not match its data file', self.index_path)
+            index_map.close()
+
+            return _DATA_HEADER.size
+
+        self._index_map = index_map
+        self._entries = _Entries(index_map, count)
+        self._count = count
+
+        return indexed_size
+
+    def _map_data(self):
+        """
+        Map the whole data file.
+        """
+
+        # The previous map is not closed: the bodies returned by get may still reference it.
+        self._data_map = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._data_view = memoryview(self._data_map)
+        except TypeError:
+            # Python 2 mmaps do not support memoryviews: bodies are copied.
+            self._data_view = self._data_map
+
+    def _scan(self, start, end):
+        """
+        Index the records of a part of the data file in memory.
+
+        A record truncated by a crash at the end of the file is removed.
+        """
+
+        offset = start
+
+        while offset + _RECORD_HEADER.size <= end:
+            key_length, body_length, fetched_at = _RECORD_HEADER.unpack_from(self._data_map, offset)
+            record_end = offset + _RECORD_HEADER.size + key_length + (0 if body_length == _DELETED else body_length)
+
+            if record_end > end:
+                break
+
+            key = self._data_map[offset + _RECORD_HEADER.size:offset + _RECORD_HEADER.size + key_length]
+            self._index_recent(key, (offset, fetched_at, key_length, body_length))
+            offset = record_end
+
+        if offset < end:
+            LOGGER.warning('Truncating the incomplete record at offset %s of %s', offset, self.data_path)
+            self._data_file.truncate(offset)
+            self._map_data()
+
+    def _find_indexed(self, key, key_hash=None):
+        """
+        Find a key in the index file.
+
+        :param key: The key, as bytes.
+        :returns: A (hash, offset, fetched_at, key_length, body_length) tuple, or None.
+        """
+
+        if key_hash is None:
+            key_hash = hash_key(key)
+
+        entries = self._entries
+        position = bisect.bisect_left(entries, key_hash)
+
+        # Hash collisions are told apart by the keys of the records.
+        while position < len(entries) and entries[position] == key_hash:
+            entry = entries.get(position)
+            start = entry[1] + _RECORD_HEADER.size
+
+            if self._data_map[start:start + entry[3]] == key:
+                return entry
+
+            position += 1
+
+        return None
+
+    def _find(self, key):
+        """
+        Find the last record of a key.
+
+        :param key: The key, as bytes.
+        :returns: An (offset, fetched_at, key_length, body_length) tuple, or None if the key was never stored.
+        """
+
+        entry = self._recent.get(key)
+
+        if entry is None:
+            entry = self._find_indexed(key)
+
+            if entry is not None:
+                entry = entry[1:]
+
+        return entry
+
+    def _index_recent(self, key, entry):
+        """
+        Index a record in memory and update the number of entries.
+        """
+
+        previous = self._find(key)
+        existed = previous is not None and previous[3] != _DELETED
+        deleted = entry[3] == _DELETED
+
+        self._count += (0 if existed else 1) - (1 if deleted else 0)
+        self._recent[key] = entry
+
+    def get_entry(self, key):
+        """
+        Get an entry, fresh or not.
+
+        :param key: The key, as returned by make_key or make_cache_key.
+        :returns: A (body, fetched_at) tuple, or None if there is no entry. The body is a memoryview on Python 3 and bytes on Python 2.
+        """
+
+        key = key.encode('utf-8')
+
+        with self._lock:
+            entry = self._find(key)
+
+            if entry is None or entry[3] == _DELETED:
+                return None
+
+            offset, fetched_at, key_length, body_length = entry
+            start = offset + _RECORD_HEADER.size + key_length
+
+            if start + body_length > len(self._data_map):
+                # The record was appended after the data file was mapped.
+                self._map_data()
+
+            return self._data_view[start:start + body_length], fetched_at
+
+    def get(self, key, max_age=None):
+        """
+        Get a fresh entry.
+
+        :param key: The key, as returned by make_key or make_cache_key.
+        :param max_age: The maximum age of the entry, in seconds. Defaults to the store max_age.
+        :returns: The body, or None if there is no fresh entry.
+        """
+
+        entry = self.get_entry(key)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+
+                return None
+
+            body, fetched_at = entry
+
+            if fetched_at + (self.max_age if max_age is None else max_age) <= time.time():
+                self.stale += 1
+                self.misses += 1
+
+                return None
+
+            self.hits += 1
+
+            return body
+
+    def get_entity(self, kind, _id, language=None, max_age=None, fields=None):
+        """
+        Get a fresh entity, decoded.
+
+        :param kind: 'movie', 'person' or 'collection'.
+        :param _id: The entity identifier.
+        :param language: The language as a ISO 639-1 code.
+        :param max_age: The maximum age of the entry, in seconds. Defaults to the store max_age.
+        :param fields: A list of the fields to keep, or None to keep them all.
+        :returns: The entity, or None if there is no fresh entry.
+        """
+
+        body = self.get(make_key(kind, _id, language), max_age=max_age)
+
+        if body is not None:
+            return get_decoder().decode(body, fields)
+
+    def accepts(self, action):
+        """
+        Check whether the responses of an action are stored.
+
+        :param action: The action.
+        :returns: True for the movie, person and collection actions.
+        """
+
+        return ENTITY_ACTION_REGEX.match(action) is not None
+
+    def _append(self, key, body, fetched_at):
+        """
+        Append a record. The caller holds the lock.
+        """
+
+        body_length = _DELETED if body is None else len(body)
+
+        self._data_file.seek(0, os.SEEK_END)
+        offset = self._data_file.tell()
+        self._data_file.write(_RECORD_HEADER.pack(len(key), body_length, fetched_at) + key)
+
+        if body is not None:
+            self._data_file.write(body)
+
+        self._data_file.flush()
+
+        self._index_recent(key, (offset, fetched_at, len(key), body_length))
+
+        if len(self._recent) >= self.index_interval:
+            self._write_index()
+
+    def put(self, key, body, fetched_at=None):
+        """
+        Store an entry.
+
+        :param key: The key, as returned by make_key or make_cache_key.
+        :param body: The body, as bytes.
+        :param fetched_at: The time the body was fetched at, as a timestamp. Defaults to now.
+        """
+
+        with self._lock:
+            self._append(key.encode('utf-8'), body, time.time() if fetched_at is None else fetched_at)
+
+    def delete(self, key):
+        """
+        Delete an entry, if it exists.
+
+        :param key: The key, as returned by make_key or make_cache_key.
+        """
+
+        key = key.encode('utf-8')
+
+        with self._lock:
+            entry = self._find(key)
+
+            if entry is not None and entry[3] != _DELETED:
+                self._append(key, None, time.time())
+
+    def _iter_live(self):
+        """
+        Iterate over the live entries, indexed or recent. The caller holds the lock.
+
+        :returns: A generator of (hash, offset, fetched_at, key_length, body_length) tuples.
+        """
+
+        recent_hashes = {}
+
+        for key in self._recent:
+            recent_hashes.setdefault(hash_key(key), []).append(key)
+
+        for position in range(len(self._entries)):
+            entry = self._entries.get(position)
+            keys = recent_hashes.get(entry[0])
+
+            if keys is not None:
+                start = entry[1] + _RECORD_HEADER.size
+
+                if self._data_map[start:start + entry[3]] in keys:
+                    continue
+
+            yield entry
+
+        for key_hash, keys in recent_hashes.items():
+            for key in keys:
+                entry = self._recent[key]
+
+                if entry[3] != _DELETED:
+                    yield (key_hash,) + entry
+
+    def _write_file(self, path, chunks):
+        """
+        Write a file atomically.
+        """
+
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        with os.fdopen(fd, 'wb') as output_file:
+            for chunk in chunks:
+                output_file.write(chunk)
+
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+
+        os.rename(temporary_path, path)
+
+    def _build_index(self, entries, generation, data_size):
+        """
+        Get the chunks of an index file.
+        """
+
+        entries.sort()
+        yield _INDEX_HEADER.pack(INDEX_MAGIC, generation, data_size, len(entries))
+
+        for start in range(0, len(entries), 4096):
+            yield b''.join(_INDEX_ENTRY.pack(*entry) for entry in entries[start:start + 4096])
+
+    def _write_index(self):
+        """
+        Rewrite the index file with the recent entries. The caller holds the lock.
+        """
+
+        entries = list(self._iter_live())
+        self._data_file.seek(0, os.SEEK_END)
+        data_size = self._data_file.tell()
+
+        self._write_file(self.index_path, self._build_index(entries, self.generation, data_size))
+
+        self._recent = {}
+        self._map_index(data_size)
+        self._map_data()
+
+    def flush(self):
+        """
+        Write the entries indexed in memory to the index file and the data file to the disk.
+        """
+
+        with self._lock:
+            if self._recent:
+                self._write_index()
+
+            os.fsync(self._data_file.fileno())
+
+    def compact(self, max_age=None):
+        """
+        Rewrite the data file without the replaced and deleted records.
+
+        :param max_age: If specified, the entries older than this age, in seconds, are dropped too.
+        :returns: The number of bytes reclaimed.
+        """
+
+        with self._lock:
+            now = time.time()
+            self._map_data()
+            entries = sorted(self._iter_live(), key=lambda entry: entry[1])
+            generation = self._new_generation()
+            compacted = []
+
+            def chunks():
+                offset = _DATA_HEADER.size
+                yield _DATA_HEADER.pack(DATA_MAGIC, generation)
+
+                for key_hash, start, fetched_at, key_length, body_length in entries:
+                    if max_age is not None and fetched_at + max_age <= now:
+                        continue
+
+                    length = _RECORD_HEADER.size + key_length + body_length
+                    yield self._data_map[start:start + length]
+
+                    compacted.append((key_hash, offset, fetched_at, key_length, body_length))
+                    offset += length
+
+            self._data_file.seek(0, os.SEEK_END)
+            previous_size = self._data_file.tell()
+
+            # The data file is replaced first: if the index was not replaced, its generation would not match and it would be rebuilt.
+            self._write_file(self.data_path, chunks())
+            data_size = os.path.getsize(self.data_path)
+            self._write_file(self.index_path, self._build_index(compacted, generation, data_size))
+
+            self._data_file.close()
+            self._recent = {}
+            self._open()
+
+            LOGGER.info('Compacted the entity store %s from %s to %s bytes', self.directory, previous_size, data_size)
+
+            return previous_size - data_size
+
+    def close(self):
+        """
+        Flush and close the store.
+        """
+
+        with self._lock:
+            if self._data_file is None or self._data_file.closed:
+                return
+
+            self.flush()
+            self._data_file.close()
+
+    def get_statistics(self):
+        """
+        Get the store statistics.
+
+        :returns: A dictionary with the hits, misses and stale counters, the number of entries and the size of the data file.
+        """
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'entries': self._count,
+                'size': len(self._data_map),
+            }
+
+_STORE = None
+_STORE_LOADED = False
+_STORE_LOCK = threading.Lock()
+
+def get_store():
+    """
+    Get the shared entity store.
+
+    :returns: The EntityStore set with set_store, or the one in PYTHEMOVIEDB_STORE_PATH, created on first use, or None if there is none.
+    """
+
+    global _STORE, _STORE_LOADED
+
+    if not _STORE_LOADED:
+        with _STORE_LOCK:
+            if not _STORE_LOADED:
+                if configuration.STORE_PATH:
+                    _STORE = EntityStore(configuration.STORE_PATH)
+                    atexit.register(_STORE.close)
+
+                _STORE_LOADED = True
+
+    return _STORE
+
+def set_store(store):
+    """
+    Set the shared entity store.
+
+    :param store: An EntityStore instance, or None to disable the store.
+    """
+
+    global _STORE, _STORE_LOADED
+
+    _STORE = store
+    _STORE_LOADED = True
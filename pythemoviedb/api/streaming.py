@@ -0,0 +1,441 @@
+"""
+The API streaming functions.
+
+`stream` makes a request with any request function of
+`pythemoviedb.api.methods` and parses the response as its bytes arrive. The
+items of the large arrays (`results`, `cast`, `crew`, `posters`, ...) are
+yielded one at a time, so that the memory used grows with the largest item
+rather than with the whole response:
+
+    for path, value in stream(methods.get_person_credits, 287):
+        if path == 'cast':
+            print(value['title'])
+
+Streamed responses are never stored in the cache nor coalesced, but a cached
+body is streamed from the cache if there is one.
+"""
+
+import pythemoviedb.api.methods as methods
+from pythemoviedb.api.request import build_query_string, build_url, send_request
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.cache import get_cache, make_cache_key
+from pythemoviedb.api.decoder import get_decoder
+from pythemoviedb.api.instrumentation import RequestEvent, emit, has_hooks
+from pythemoviedb.api.transport import get_transport
+from pythemoviedb.api.client import get_client
+
+import json
+import re
+import time
+
+from io import BytesIO
+
+STREAMED_ARRAYS = (
+    'results',
+    'cast',
+    'crew',
+    'posters',
+    'backdrops',
+    'profiles',
+    'items',
+    'translations',
+)
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE_REGEX = re.compile(br'[ \t\r\n]*')
+_STRING_REGEX = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR_REGEX = re.compile(br'[^ \t\r\n,:\]}]+')
+
+# Everything but the brackets, with the strings as a whole: used to find the
+# end of an object or an array without looking at its tokens one by one.
+_FILL_REGEX = re.compile(br'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+
+_OPENING_BRACKETS = frozenset(b'{['[i:i + 1] for i in range(2))
+
+class StreamParser(object):
+    """
+    An incremental JSON parser that yields the items of some arrays one at a time.
+
+    The parser yields (path, value) tuples, where path is the dotted path of a
+    field, e.g. 'casts.cast':
+
+    - each item of a streamed array is yielded with the path of the array,
+    - any other value is yielded whole with its own path, except objects that
+      contain streamed arrays, whose fields are yielded one at a time instead.
+    """
+
+    def __init__(self, stream, arrays=STREAMED_ARRAYS, chunk_size=CHUNK_SIZE, decoder=None):
+        """
+        Create a stream parser.
+
+        :param stream: A file-like object whose `read(size)` method returns bytes.
+        :param arrays: The names of the streamed arrays. A name matches any field with that name, at any depth, or a dotted path suffix, e.g. 'casts.cast'.
+        :param chunk_size: The number of bytes read at once.
+        :param decoder: The Decoder used for the values. Defaults to the shared decoder.
+        """
+
+        self.stream = stream
+        self.arrays = tuple(arrays)
+        self.chunk_size = chunk_size
+        self.decoder = decoder or get_decoder()
+
+        self._buffer = b''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self):
+        """
+        Parse the stream.
+
+        :returns: A generator of (path, value) tuples.
+        """
+
+        if self._peek() == b'{':
+            self._pos += 1
+
+            for path, value, _ in self._parse_object('', True):
+                yield path, value
+
+        elif self._peek() == b'[' and self._is_streamed(''):
+            for item in self._parse_array():
+                yield '', item
+
+        else:
+            yield '', self._read_value()
+
+        if self._peek(required=False):
+            raise ValueError('Extra data after the JSON document at offset %s' % self._pos)
+
+    def _is_streamed(self, path):
+        """
+        Check whether an array is streamed.
+
+        :param path: The dotted path of the array.
+        :returns: True if the array items must be yielded one at a time.
+        """
+
+        return any(path == name or path.endswith('.' + name) for name in self.arrays)
+
+    def _fill(self):
+        """
+        Read a chunk from the stream.
+
+        :returns: False at the end of the stream.
+        """
+
+        if self._eof:
+            return False
+
+        # Drop the bytes already parsed, unless they are few: copying the buffer for each token would be quadratic.
+        if self._pos >= self.chunk_size:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        data = self.stream.read(self.chunk_size)
+
+        if not data:
+            self._eof = True
+
+            return False
+
+        self._buffer += data
+
+        return True
+
+    def _error(self, message):
+        """
+        Get a parse error.
+        """
+
+        return ValueError('%s at offset %s' % (message, self._pos))
+
+    def _peek(self, required=True):
+        """
+        Skip the whitespace and get the next character, without consuming it.
+
+        :param required: True to raise an error at the end of the stream.
+        :returns: The next character, or an empty bytes string at the end of the stream.
+        """
+
+        while True:
+            self._pos = _WHITESPACE_REGEX.match(self._buffer, self._pos).end()
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos:self._pos + 1]
+
+            if not self._fill():
+                if required:
+                    raise self._error('Unexpected end of stream')
+
+                return b''
+
+    def _expect(self, characters):
+        """
+        Consume the next character, that must be one of the specified ones.
+
+        :returns: The character.
+        """
+
+        character = self._peek()
+
+        if character not in characters:
+            raise self._error('Expected one of %r, got %r' % (characters, character))
+
+        self._pos += 1
+
+        return character
+
+    def _match(self, regex):
+        """
+        Consume a token that matches a regex, reading more of the stream if the token may continue.
+
+        :returns: The token bytes.
+        """
+
+        while True:
+            match = regex.match(self._buffer, self._pos)
+
+            if match is not None and (match.end() < len(self._buffer) or self._eof):
+                self._pos = match.end()
+
+                return match.group()
+
+            if not self._fill():
+                if match is None:
+                    raise self._error('Invalid token')
+
+    def _read_value_bytes(self):
+        """
+        Consume a whole value.
+
+        :returns: The bytes of the value.
+        """
+
+        character = self._peek()
+
+        if character == b'"':
+            return self._match(_STRING_REGEX)
+        elif character not in _OPENING_BRACKETS:
+            return self._match(_SCALAR_REGEX)
+
+        start = self._pos
+        depth = 0
+
+        while True:
+            pos = _FILL_REGEX.match(self._buffer, self._pos).end()
+
+            # The match stops at a bracket, at the end of the buffer or at an incomplete string.
+            if pos == len(self._buffer) or self._buffer[pos:pos + 1] == b'"':
+                # Keep the value in the buffer while reading more, then resume the scan where it stopped.
+                self._pos = start
+
+                if not self._fill():
+                    raise self._error('Unexpected end of stream')
+
+                shift = start - self._pos
+                start = self._pos
+                self._pos = pos - shift
+                continue
+
+            self._pos = pos + 1
+
+            if self._buffer[pos:pos + 1] in _OPENING_BRACKETS:
+                depth += 1
+            else:
+                depth -= 1
+
+                if depth == 0:
+                    return self._buffer[start:self._pos]
+
+    def _read_value(self):
+        """
+        Consume and decode a whole value.
+        """
+
+        return self.decoder.decode(self._read_value_bytes())
+
+    def _read_key(self):
+        """
+        Consume an object key and the colon that follows it.
+        """
+
+        if self._peek() != b'"':
+            raise self._error('Expected an object key')
+
+        key = json.loads(self._match(_STRING_REGEX).decode('utf-8'))
+        self._expect(b':')
+
+        return key
+
+    def _parse_array(self):
+        """
+        Parse the items of a streamed array. The opening bracket is the next character.
+
+        :returns: A generator of the decoded items.
+        """
+
+        self._expect(b'[')
+
+        if self._peek() == b']':
+            self._pos += 1
+
+            return
+
+        while True:
+            yield self._read_value()
+
+            if self._expect(b',]') == b']':
+                return
+
+    def _parse_object(self, path, streaming):
+        """
+        Parse the fields of an object. The opening brace was consumed.
+
+        The fields are collected until a streamed array is found: if there is
+        none, the whole object is yielded at the end with `whole` set to True.
+
+        :param path: The dotted path of the object.
+        :param streaming: True to yield the fields one at a time from the start.
+        :returns: A generator of (path, value, whole) tuples.
+        """
+
+        fields = {}
+
+        if self._peek() == b'}':
+            self._pos += 1
+        else:
+            while True:
+                key = self._read_key()
+                field_path = path + '.' + key if path else key
+                character = self._peek()
+
+                if character == b'{':
+                    self._pos += 1
+                    events = self._parse_object(field_path, False)
+                elif character == b'[' and self._is_streamed(field_path):
+                    events = ((field_path, item, False) for item in self._parse_array())
+                else:
+                    events = [(field_path, self._read_value(), True)]
+
+                for event_path, value, whole in events:
+                    if whole and not streaming:
+                        fields[key] = value
+                        continue
+
+                    if not streaming:
+                        # A streamed array was found: flush the fields collected so far.
+                        streaming = True
+
+                        for name, collected in fields.items():
+                            yield path + '.' + name if path else name, collected, False
+
+                        fields = None
+
+                    yield event_path, value, False
+
+                if self._expect(b',}') == b'}':
+                    break
+
+        if not streaming:
+            yield path, fields, True
+
+def parse(stream, arrays=STREAMED_ARRAYS, chunk_size=CHUNK_SIZE):
+    """
+    Parse a JSON stream incrementally.
+
+    :param stream: A file-like object whose `read(size)` method returns bytes.
+    :param arrays: The names of the streamed arrays.
+    :param chunk_size: The number of bytes read at once.
+    :returns: A generator of (path, value) tuples. See StreamParser.
+    """
+
+    return iter(StreamParser(stream, arrays=arrays, chunk_size=chunk_size))
+
+def stream_request(action, parameters=None, arrays=STREAMED_ARRAYS, base_url=None, api_version=None, api_key=None, transport=None, cache=None, client=None):
+    """
+    Make a request to the server and parse its response as it arrives.
+
+    The request is rate limited and retried like `make_request` until the
+    response headers are received. A RequestEvent is passed to the
+    instrumentation hooks, if any, once the response was parsed.
+
+    :param arrays: The names of the streamed arrays.
+    :param base_url: The API base URL. Defaults to the one of the client.
+    :param api_version: The API version. Defaults to the one of the client.
+    :param api_key: The API key. Defaults to the keys of the client.
+    :param transport: The Transport to use. If not specified, the shared transport for base_url is used.
+    :param cache: The Cache to read from. If not specified, the shared cache is used, if any.
+    :param client: The Client to use. If not specified, the shared client is used.
+    :returns: A generator of (path, value) tuples. See StreamParser.
+    """
+
+    if client is None:
+        client = get_client()
+
+    if not api_key and not client.keys:
+        raise RuntimeError('No API key defined. Request would fail.')
+
+    base_url = base_url or client.base_url
+    api_version = api_version or client.api_version
+
+    start = time.time()
+    query_string = build_query_string(parameters)
+    measurements = {}
+    response = None
+
+    LOGGER.debug('Streaming request to %s with %s', action, query_string)
+
+    try:
+        if cache is None:
+            cache = get_cache()
+
+        body = None
+
+        if cache is not None and cache.get_ttl(action) > 0:
+            body = cache.get(make_cache_key(action, query_string))
+            measurements['cache'] = 'miss' if body is None else 'hit'
+
+        if body is None:
+            url = build_url(action, query_string, base_url=base_url, api_version=api_version, api_key=api_key)
+
+            if transport is None:
+                transport = get_transport(url)
+
+            response = send_request(action, url, transport, measurements, stream=True, client=None if api_key else client)
+            source = response
+        else:
+            source = BytesIO(body)
+            measurements['response_bytes'] = len(body)
+
+        for event in parse(source, arrays=arrays):
+            yield event
+
+    except Exception as ex:
+        measurements['error'] = ex
+
+        raise
+
+    finally:
+        if response is not None:
+            response.close()
+            measurements.update(response_bytes=response.bytes_decoded, wire_bytes=response.bytes_read, transfer_time=response.timings.get('transfer'))
+
+        if has_hooks():
+            measurements['total_time'] = time.time() - start
+            emit(RequestEvent(action, **measurements))
+
+def stream(function, *args, **kwargs):
+    """
+    Call a request function of `pythemoviedb.api.methods` and parse its response as it arrives.
+
+    :param function: The request function, e.g. methods.get_movie_images.
+    :param args: The positional arguments of the function.
+    :param kwargs: The keyword arguments of the function. The `arrays` keyword argument, if specified, is passed to `stream_request`.
+    :returns: A generator of (path, value) tuples. See StreamParser.
+    """
+
+    arrays = kwargs.pop('arrays', STREAMED_ARRAYS)
+    action, parameters, _ = methods.capture_request(function, *args, **kwargs)
+
+    return stream_request(action, parameters, arrays=arrays)
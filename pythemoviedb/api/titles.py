@@ -0,0 +1,411 @@
+"""
+The API title index functions and classes.
+
+A TitleIndex is an in-memory mirror of movie titles, including the
+alternative titles and translations, that matches queries such as file
+names without a request. `search_movie` answers from the index and only
+falls back to the API when no indexed title matches well enough, feeding
+the API results back into the index:
+
+    index = TitleIndex()
+    index.add_movie(methods.get_movie(550, append_to_response=['alternative_titles']))
+    search_movie(*parse_file_name('Fight.Club.1999.1080p.mkv'), index=index)
+"""
+
+import pythemoviedb.api.methods as methods
+
+import collections
+import math
+import re
+import threading
+import unicodedata
+
+DEFAULT_MIN_SCORE = 0.8
+
+_NON_ALPHANUMERIC_REGEX = re.compile(r'[\W_]+', re.UNICODE)
+_FILE_NAME_YEAR_REGEX = re.compile(r'^(.+)[\W_]+[\(\[]?((?:19|20)\d\d)(?:[\)\]]|[\W_]|$)')
+_FILE_NAME_TAG_REGEX = re.compile(r'[\W_](?:480p|576p|720p|1080[pi]|2160p|4k|bluray|brrip|bdrip|dvdrip|dvdscr|webrip|web[\W_]?dl|hdtv|hdrip|x264|x265|h264|hevc|xvid|divx|proper|repack|extended|unrated|remastered)(?:[\W_]|$)', re.IGNORECASE)
+
+def normalize_title(title):
+    """
+    Normalize a title for matching: lowercase, without accents nor punctuation.
+
+    :param title: The title.
+    :returns: The normalized title, e.g. 'se7en and co' for 'Se7en & Co.'.
+    """
+
+    if isinstance(title, bytes):
+        title = title.decode('utf-8', 'replace')
+
+    title = unicodedata.normalize('NFKD', title.replace('&', ' and '))
+    title = u''.join(character for character in title if not unicodedata.combining(character))
+
+    return _NON_ALPHANUMERIC_REGEX.sub(u' ', title.lower()).strip()
+
+def parse_file_name(file_name):
+    """
+    Guess the title and the year of a movie from a file name.
+
+    :param file_name: The file name, e.g. 'Fight.Club.1999.1080p.BluRay.x264.mkv'.
+    :returns: A (title, year) tuple, e.g. ('Fight Club', 1999). The year is None if it was not found.
+    """
+
+    name = re.sub(r'\.[A-Za-z0-9]{2,4}$', '', file_name)
+    match = _FILE_NAME_TAG_REGEX.search(name)
+
+    if match:
+        name = name[:match.start()]
+
+    match = _FILE_NAME_YEAR_REGEX.match(name)
+    year = None
+
+    if match:
+        name, year = match.group(1), int(match.group(2))
+
+    return _NON_ALPHANUMERIC_REGEX.sub(' ', name).strip(), year
+
+def get_trigrams(normalized_title):
+    """
+    Get the trigrams of a normalized title.
+
+    :param normalized_title: The normalized title.
+    :returns: The set of trigrams, including the word boundaries.
+    """
+
+    padded = u' %s ' % normalized_title
+
+    return set(padded[index:index + 3] for index in range(len(padded) - 2))
+
+def get_year(date):
+    """
+    Get the year of an API date.
+
+    :param date: The date, e.g. '1999-10-15', or None.
+    :returns: The year, or None.
+    """
+
+    if date and date[:4].isdigit():
+        return int(date[:4])
+
+def get_titles(movie):
+    """
+    Get all the titles of a movie.
+
+    :param movie: The movie, as returned by get_movie or by a search, optionally with the alternative_titles and translations sub-resources appended.
+    :returns: The set of titles.
+    """
+
+    titles = set([movie.get('title'), movie.get('original_title')])
+
+    for alternative_title in (movie.get('alternative_titles') or {}).get('titles', ()):
+        titles.add(alternative_title.get('title'))
+
+    for translation in (movie.get('translations') or {}).get('translations', ()):
+        titles.add((translation.get('data') or {}).get('title') or translation.get('title'))
+
+    titles.discard(None)
+    titles.discard(u'')
+
+    return titles
+
+def get_similarity(trigrams, title):
+    """
+    Get the trigram similarity of a query and a title.
+
+    :param trigrams: The trigrams of the normalized query.
+    :param title: The title, or None.
+    :returns: The Dice coefficient of the trigram sets, between 0 and 1.
+    """
+
+    normalized_title = normalize_title(title or u'')
+
+    if not normalized_title:
+        return 0.0
+
+    title_trigrams = get_trigrams(normalized_title)
+
+    return 2.0 * len(trigrams.intersection(title_trigrams)) / (len(trigrams) + len(title_trigrams))
+
+class TitleIndex(object):
+    """
+    An in-memory fuzzy index of movie titles.
+
+    Queries are matched on their normalized title first, then by trigram
+    similarity (the Dice coefficient of the trigram sets). The movies the API
+    found for the queries that matched nothing well enough are remembered as
+    aliases of these queries.
+    """
+
+    def __init__(self):
+        """
+        Create an empty title index.
+        """
+
+        self.hits = 0
+        self.misses = 0
+
+        self._movies = {}
+        self._exact = collections.defaultdict(set)
+        self._trigrams = collections.defaultdict(set)
+        self._trigram_counts = {}
+        self._aliases = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Get the number of indexed movies.
+        """
+
+        return len(self._movies)
+
+    def add_movie(self, movie):
+        """
+        Index a movie.
+
+        :param movie: The movie, as returned by get_movie or by a search.
+        """
+
+        with self._lock:
+            self._movies[movie['id']] = (movie.get('title'), movie.get('original_title'), get_year(movie.get('release_date')))
+
+            for title in get_titles(movie):
+                normalized_title = normalize_title(title)
+
+                if not normalized_title:
+                    continue
+
+                self._exact[normalized_title].add(movie['id'])
+
+                if normalized_title not in self._trigram_counts:
+                    trigrams = get_trigrams(normalized_title)
+                    self._trigram_counts[normalized_title] = len(trigrams)
+
+                    for trigram in trigrams:
+                        self._trigrams[trigram].add(normalized_title)
+
+    def add_movies(self, movies):
+        """
+        Index movies.
+
+        :param movies: An iterable of movies.
+        """
+
+        for movie in movies:
+            self.add_movie(movie)
+
+    def add_alias(self, query, year, ids):
+        """
+        Remember the movies the API found for a query.
+
+        :param query: The query.
+        :param year: The release year of the query, or None.
+        :param ids: The identifiers of the indexed movies found, best first.
+        """
+
+        with self._lock:
+            self._aliases[(normalize_title(query), year)] = list(ids)
+
+    def search_alias(self, query, year=None, limit=10):
+        """
+        Get the movies remembered for a query with add_alias.
+
+        :param query: The query.
+        :param year: The release year of the query, or None.
+        :param limit: The maximum number of results.
+        :returns: A list of results, as returned by search but in the order of add_alias, or None if the query has no alias.
+        """
+
+        normalized_query = normalize_title(query)
+
+        with self._lock:
+            ids = self._aliases.get((normalized_query, year))
+
+            if ids is None:
+                return None
+
+            trigrams = get_trigrams(normalized_query)
+            results = []
+
+            for _id in ids[:limit]:
+                title, original_title, movie_year = self._movies[_id]
+
+                results.append({
+                    'id': _id,
+                    'title': title,
+                    'original_title': original_title,
+                    'year': movie_year,
+                    'score': max(get_similarity(trigrams, title), get_similarity(trigrams, original_title)),
+                })
+
+            return results
+
+    def search(self, query, year=None, limit=10, min_score=0.0):
+        """
+        Search the index.
+
+        A minimum score makes fuzzy searches much faster: only the titles that
+        share one of the rarest trigrams of the query can reach it, so the
+        others are never looked at.
+
+        :param query: The title to look for, e.g. a file name.
+        :param year: The release year, if known. Movies released another year are excluded, except the year before and after, which score lower.
+        :param limit: The maximum number of results.
+        :param min_score: The minimum trigram similarity of the results, between 0 and 1.
+        :returns: A list of dictionaries with the 'id', 'title', 'original_title', 'year' and 'score' keys, best first. The score is between 0 and 1.
+        """
+
+        normalized_query = normalize_title(query)
+
+        if not normalized_query:
+            return []
+
+        scores = {}
+
+        with self._lock:
+            for _id in self._exact.get(normalized_query, ()):
+                scores[_id] = 1.0
+
+            if not scores:
+                trigrams = get_trigrams(normalized_query)
+
+                shared = collections.Counter()
+
+                if min_score > 0:
+                    # A title with a Dice coefficient of at least min_score shares
+                    # at least `required` trigrams with the query, hence at least
+                    # one of its len(trigrams) - required + 1 rarest trigrams.
+                    required = int(math.ceil(min_score * len(trigrams) / (2 - min_score)))
+                    rarest = sorted(trigrams, key=lambda trigram: len(self._trigrams.get(trigram, ())))
+                    candidates = set()
+
+                    for trigram in rarest[:len(trigrams) - required + 1]:
+                        candidates.update(self._trigrams.get(trigram, ()))
+
+                    for normalized_title in candidates:
+                        shared[normalized_title] = len(trigrams.intersection(get_trigrams(normalized_title)))
+
+                else:
+                    for trigram in trigrams:
+                        shared.update(self._trigrams.get(trigram, ()))
+
+                for normalized_title, count in shared.items():
+                    score = 2.0 * count / (len(trigrams) + self._trigram_counts[normalized_title])
+
+                    if score < min_score:
+                        continue
+
+                    for _id in self._exact[normalized_title]:
+                        if score > scores.get(_id, 0):
+                            scores[_id] = score
+
+            results = []
+
+            for _id, score in scores.items():
+                title, original_title, movie_year = self._movies[_id]
+
+                if year is not None:
+                    if movie_year is None:
+                        score *= 0.9
+                    elif abs(movie_year - year) == 1:
+                        score *= 0.95
+                    elif movie_year != year:
+                        continue
+
+                results.append({
+                    'id': _id,
+                    'title': title,
+                    'original_title': original_title,
+                    'year': movie_year,
+                    'score': score,
+                })
+
+        results.sort(key=lambda result: (-result['score'], result['id']))
+
+        return results[:limit]
+
+    def lookup_or_remember(self, query, fetch, year=None, limit=10, min_score=DEFAULT_MIN_SCORE):
+        """
+        Search the index, falling back to the aliases, then to fetching the movies of a query and remembering them.
+
+        :param query: The title to look for, e.g. a file name.
+        :param fetch: A function that takes no arguments and returns the movies found for the query, best first. It is called without the lock held.
+        :param year: The release year, if known.
+        :param limit: The maximum number of results.
+        :param min_score: The score of the best indexed match under which the aliases are looked at, then the movies fetched.
+        :returns: A list of results, as returned by search. When the movies were fetched, the results are these movies, in their order, even if they score lower than min_score.
+        """
+
+        results = self.search(query, year=year, limit=limit, min_score=min_score)
+
+        if not results or results[0]['score'] < min_score:
+            results = self.search_alias(query, year=year, limit=limit)
+
+        if results is not None:
+            with self._lock:
+                self.hits += 1
+
+            return results
+
+        with self._lock:
+            self.misses += 1
+
+        movies = fetch()
+        self.add_movies(movies)
+        self.add_alias(query, year, [movie['id'] for movie in movies])
+
+        return self.search_alias(query, year=year, limit=limit)
+
+    def get_statistics(self):
+        """
+        Get the index statistics.
+
+        :returns: A dictionary with the 'movies', 'titles', 'aliases', 'hits' and 'misses' keys. Hits and misses count the lookup_or_remember calls answered from the index or by fetching the movies.
+        """
+
+        return {
+            'movies': len(self._movies),
+            'titles': len(self._trigram_counts),
+            'aliases': len(self._aliases),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+_TITLE_INDEX = TitleIndex()
+
+def get_title_index():
+    """
+    Get the shared title index.
+
+    :returns: The shared TitleIndex.
+    """
+
+    return _TITLE_INDEX
+
+def set_title_index(index):
+    """
+    Set the shared title index.
+
+    :param index: The TitleIndex to use from now on.
+    """
+
+    global _TITLE_INDEX
+
+    _TITLE_INDEX = index
+
+def search_movie(query, year=None, language=None, index=None, min_score=DEFAULT_MIN_SCORE, limit=10):
+    """
+    Search for a movie in the title index, falling back to the API.
+
+    :param query: The title to look for, e.g. a file name.
+    :param year: The release year, if known.
+    :param language: The language as a ISO 639-1 code, for the API search.
+    :param index: The TitleIndex to use. Defaults to the shared one.
+    :param min_score: The score of the best indexed match under which the API is searched.
+    :param limit: The maximum number of results.
+    :returns: A list of results, as returned by TitleIndex.search. When the API was searched, the results are the movies it found, in its order, even if they score lower than min_score.
+    """
+
+    if index is None:
+        index = get_title_index()
+
+    return index.lookup_or_remember(query, lambda: methods.search_movie(query, language=language, year=year)['results'], year=year, limit=limit, min_score=min_score)
@@ -0,0 +1,541 @@
+"""
+The API transport classes.
+"""
+
+import pythemoviedb.configuration as configuration
+
+import functools
+import socket
+import threading
+import time
+import zlib
+
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+
+try:
+    import urlparse
+except ImportError:
+    import urllib.parse as urlparse
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+TRANSIENT_ERRORS = (socket.error, httplib.HTTPException)
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+class RequestCancelled(Exception):
+    """
+    Raised by a request that was cancelled through its Cancellation.
+    """
+
+class Cancellation(object):
+    """
+    A handle to cancel a request from another thread.
+
+    Cancelling shuts the socket of the request connection down, so that the
+    request fails at once instead of waiting for its response. The
+    connection is then discarded rather than put back in the pool.
+    """
+
+    def __init__(self):
+        """
+        Create a cancellation handle.
+        """
+
+        self.cancelled = False
+
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def attach(self, connection):
+        """
+        Attach the connection a request is sent on.
+
+        :param connection: The connection.
+        """
+
+        with self._lock:
+            if self.cancelled:
+                raise RequestCancelled()
+
+            self._connection = connection
+
+    def detach(self):
+        """
+        Detach the connection of a request once it is done.
+
+        :returns: True if the request was cancelled meanwhile.
+        """
+
+        with self._lock:
+            self._connection = None
+
+            return self.cancelled
+
+    def cancel(self):
+        """
+        Cancel the request.
+        """
+
+        with self._lock:
+            self.cancelled = True
+            connection, self._connection = self._connection, None
+
+        if connection is not None and connection.sock is not None:
+            try:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+def create_decompressor(encoding, data):
+    """
+    Create a decompressor for a response body.
+
+    :param encoding: The Content-Encoding header of the response, or None.
+    :param data: The first bytes of the body, to tell zlib from raw deflate data.
+    :returns: A zlib decompression object, or None if the body is not compressed.
+    """
+
+    encoding = (encoding or '').strip().lower()
+
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    if encoding == 'deflate':
+        # Some servers send raw deflate data instead of zlib data: the zlib
+        # header is a deflate method byte and a checksum multiple of 31.
+        header = bytearray(data[:2])
+        is_zlib = len(header) == 2 and header[0] & 0x0F == 8 and (header[0] << 8 | header[1]) % 31 == 0
+
+        return zlib.decompressobj(zlib.MAX_WBITS if is_zlib else -zlib.MAX_WBITS)
+
+    return None
+
+def decode_content(encoding, body):
+    """
+    Decompress a response body.
+
+    :param encoding: The Content-Encoding header of the response, or None.
+    :param body: The body, as received.
+    :returns: The decompressed body. Bodies with no or an unknown encoding are returned as they are.
+    """
+
+    decompressor = create_decompressor(encoding, body)
+
+    if decompressor is None or not body:
+        return body
+
+    return decompressor.decompress(body) + decompressor.flush()
+
+class Response(object):
+    """
+    A HTTP response, fully read.
+    """
+
+    def __init__(self, status, reason, headers, body, timings=None, wire_bytes=None):
+        """
+        Create a response.
+
+        :param status: The HTTP status code.
+        :param reason: The HTTP reason phrase.
+        :param headers: The response headers, as a dictionary with lowercase keys.
+        :param body: The response body, as bytes, decompressed.
+        :param timings: A dictionary of durations, in seconds: 'pool_wait', 'dns' and 'connect' (only for new connections, including the TLS handshake), 'ttfb' (from sending the request to receiving the headers) and 'transfer' (reading the body).
+        :param wire_bytes: The size of the body as received, before decompression. Defaults to the size of the body.
+        """
+
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.timings = timings or {}
+        self.wire_bytes = len(body) if wire_bytes is None and body is not None else wire_bytes
+
+class StreamingResponse(object):
+    """
+    A HTTP response whose body is read on demand, and decompressed as it is read.
+
+    Its connection goes back to the pool when it is closed, provided the body
+    was read completely; otherwise the connection is discarded.
+    """
+
+    def __init__(self, transport, connection, response, timings):
+        """
+        Create a streaming response.
+
+        :param transport: The Transport the connection belongs to.
+        :param connection: The connection.
+        :param response: The httplib response, whose headers were read.
+        :param timings: The timings of the request. 'transfer' is set when the response is closed.
+        """
+
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = dict((key.lower(), value) for key, value in response.getheaders())
+        self.body = None
+        self.timings = timings
+        self.bytes_read = 0
+        self.bytes_decoded = 0
+
+        self._transport = transport
+        self._connection = connection
+        self._response = response
+        self._decompressor = None
+        self._start = time.time()
+
+    def read(self, size=-1):
+        """
+        Read some of the body.
+
+        :param size: The maximum number of bytes to read from the connection, or -1 to read all the remaining body.
+        :returns: The decompressed bytes read, or an empty bytes string at the end of the body.
+        """
+
+        encoding = self.headers.get('content-encoding')
+
+        while True:
+            data = self._response.read() if size < 0 else self._response.read(size)
+            self.bytes_read += len(data)
+
+            if encoding is not None:
+                if self._decompressor is None and data:
+                    self._decompressor = create_decompressor(encoding, data)
+
+                if self._decompressor is not None:
+                    if data:
+                        data = self._decompressor.decompress(data)
+                    else:
+                        data = self._decompressor.flush()
+                        self._decompressor = None
+
+                    # A compressed chunk may decompress to nothing: read on until there is some data.
+                    if not data and not self._response.isclosed():
+                        continue
+
+            self.bytes_decoded += len(data)
+
+            return data
+
+    def close(self):
+        """
+        Give the connection back to the pool, or discard it if the body was not read completely.
+        """
+
+        if self._transport is None:
+            return
+
+        complete = self._response.isclosed()
+        self.timings['transfer'] = time.time() - self._start
+        self._transport._release(self._connection, self._response if complete else None)
+        self._transport = self._connection = None
+
+    def __enter__(self):
+        """
+        Enter the context: nothing to do.
+        """
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Close the response.
+        """
+
+        self.close()
+
+def _create_connection(timings, address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """
+    Open a socket like socket.create_connection, measuring the name resolution time.
+    """
+
+    host, port = address
+    start = time.time()
+    addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    timings['dns'] = time.time() - start
+    error = None
+
+    for _, _, _, _, sockaddr in addresses:
+        try:
+            return socket.create_connection(sockaddr[:2], timeout, source_address)
+        except socket.error as ex:
+            error = ex
+
+    raise error or socket.error('getaddrinfo returned an empty list')
+
+class Transport(object):
+    """
+    A thread-safe pool of persistent HTTP/1.1 connections to a single host.
+
+    Connections are created lazily, handed out to one thread at a time and put
+    back in the pool once the response body was read so that the next request
+    can reuse them. When all the connections are in use, callers wait for one
+    to be released.
+    """
+
+    def __init__(self, base_url=configuration.API_URL, pool_size=configuration.POOL_SIZE, timeout=configuration.TIMEOUT):
+        """
+        Create a transport.
+
+        :param base_url: The URL of the host to connect to. Only the scheme and the network location are used.
+        :param pool_size: The maximum number of simultaneous connections.
+        :param timeout: The socket timeout, in seconds.
+        """
+
+        parsed_url = urlparse.urlsplit(base_url)
+
+        if parsed_url.scheme == 'https':
+            self.connection_class = httplib.HTTPSConnection
+        elif parsed_url.scheme == 'http':
+            self.connection_class = httplib.HTTPConnection
+        else:
+            raise ValueError('Unsupported URL scheme: %r' % parsed_url.scheme)
+
+        self.scheme = parsed_url.scheme
+        self.netloc = parsed_url.netloc
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._pool = queue.LifoQueue(pool_size)
+        self._connections = set()
+        self._lock = threading.Lock()
+
+        for _ in range(pool_size):
+            self._pool.put(None)
+
+    def __repr__(self):
+        """
+        Get a Python representation of the Transport.
+        """
+
+        return '%s(%s://%s, pool_size=%s)' % (
+            self.__class__.__name__,
+            self.scheme,
+            self.netloc,
+            self.pool_size,
+        )
+
+    def _connect(self, timings):
+        """
+        Create a new connection and connect it.
+
+        :param timings: A dictionary where the 'dns' and 'connect' times are stored.
+        """
+
+        connection = self.connection_class(self.netloc, timeout=self.timeout)
+        connection._create_connection = functools.partial(_create_connection, timings)
+
+        with self._lock:
+            self._connections.add(connection)
+
+        start = time.time()
+        connection.connect()
+        timings['connect'] = time.time() - start - timings.get('dns', 0)
+
+        return connection
+
+    def _discard(self, connection):
+        """
+        Close a connection and forget about it.
+        """
+
+        connection.close()
+
+        with self._lock:
+            self._connections.discard(connection)
+
+    def _open(self, url, headers, method, cancellation=None):
+        """
+        Send a request and wait for the response headers.
+
+        :param url: The URL to request. Its scheme and network location must match those of the transport.
+        :param headers: A dictionary of headers to send.
+        :param method: The HTTP method.
+        :param cancellation: The Cancellation of the request, if it can be cancelled.
+        :returns: A (connection, response, timings) tuple. The connection must be given back with `_release` once the response body was read.
+        """
+
+        parsed_url = urlparse.urlsplit(url)
+
+        if (parsed_url.scheme, parsed_url.netloc) != (self.scheme, self.netloc):
+            raise ValueError('%r cannot be requested through %r' % (url, self))
+
+        path = urlparse.urlunsplit(('', '', parsed_url.path or '/', parsed_url.query, ''))
+        start = time.time()
+        connection = self._pool.get()
+        timings = {
+            'pool_wait': time.time() - start,
+        }
+
+        # A reused connection may have been closed by the server while it
+        # was idle: in that case we retry once on a fresh connection.
+        reused = connection is not None
+
+        while True:
+            try:
+                if connection is None:
+                    connection = self._connect(timings)
+
+                if cancellation is not None:
+                    cancellation.attach(connection)
+
+                start = time.time()
+                connection.request(method, path, headers=headers or {})
+                response = connection.getresponse()
+                timings['ttfb'] = time.time() - start
+
+                return connection, response, timings
+
+            except TRANSIENT_ERRORS:
+                if connection is not None:
+                    self._discard(connection)
+                    connection = None
+
+                if cancellation is not None and cancellation.detach():
+                    self._pool.put(None)
+                    raise RequestCancelled()
+
+                if not reused:
+                    self._pool.put(None)
+                    raise
+
+                reused = False
+
+            except BaseException:
+                if connection is not None:
+                    self._discard(connection)
+
+                self._pool.put(None)
+                raise
+
+    def _release(self, connection, response):
+        """
+        Put a connection back in the pool.
+
+        :param connection: The connection, or None if it was discarded.
+        :param response: The response last read from the connection, or None if it was not read completely.
+        """
+
+        if connection is not None and (response is None or response.will_close):
+            self._discard(connection)
+            connection = None
+
+        self._pool.put(connection)
+
+    def is_saturated(self):
+        """
+        Check whether all the connections are in use.
+
+        :returns: True if a new request would wait for a connection.
+        """
+
+        return self._pool.empty()
+
+    def request(self, url, headers=None, method='GET', cancellation=None):
+        """
+        Send a request and read its response.
+
+        :param url: The URL to request. Its scheme and network location must match those of the transport.
+        :param headers: A dictionary of headers to send.
+        :param method: The HTTP method.
+        :param cancellation: A Cancellation to cancel the request from another thread. A cancelled request raises RequestCancelled.
+        :returns: A Response instance.
+        """
+
+        connection, response, timings = self._open(url, headers, method, cancellation)
+
+        try:
+            start = time.time()
+            body = response.read()
+            timings['transfer'] = time.time() - start
+
+        except BaseException:
+            self._release(connection, None)
+
+            if cancellation is not None and cancellation.detach():
+                raise RequestCancelled()
+
+            raise
+
+        # The socket may have been shut down after the body was read.
+        if cancellation is not None and cancellation.detach():
+            self._release(connection, None)
+
+            raise RequestCancelled()
+
+        self._release(connection, response)
+        headers = dict((key.lower(), value) for key, value in response.getheaders())
+
+        return Response(
+            status=response.status,
+            reason=response.reason,
+            headers=headers,
+            body=decode_content(headers.get('content-encoding'), body),
+            timings=timings,
+            wire_bytes=len(body),
+        )
+
+    def stream(self, url, headers=None, method='GET'):
+        """
+        Send a request and get its response without reading the body.
+
+        :param url: The URL to request. Its scheme and network location must match those of the transport.
+        :param headers: A dictionary of headers to send.
+        :param method: The HTTP method.
+        :returns: A StreamingResponse instance. It must be closed, to give its connection back to the pool.
+        """
+
+        connection, response, timings = self._open(url, headers, method)
+
+        return StreamingResponse(self, connection, response, timings)
+
+    def close(self):
+        """
+        Close all the open connections.
+
+        The transport can still be used afterwards: new connections are created on demand.
+        """
+
+        with self._lock:
+            connections = list(self._connections)
+            self._connections.clear()
+
+        for connection in connections:
+            connection.close()
+
+_TRANSPORTS = {}
+_TRANSPORTS_LOCK = threading.Lock()
+
+def get_transport(url):
+    """
+    Get the shared transport for the host of the specified URL.
+
+    :param url: An URL.
+    :returns: A Transport instance, created on first use.
+    """
+
+    parsed_url = urlparse.urlsplit(url)
+    key = (parsed_url.scheme, parsed_url.netloc)
+
+    with _TRANSPORTS_LOCK:
+        transport = _TRANSPORTS.get(key)
+
+        if transport is None:
+            transport = _TRANSPORTS[key] = Transport('%s://%s' % key)
+
+        return transport
+
+def set_transport(transport):
+    """
+    Register a transport as the shared transport for its host.
+
+    :param transport: The Transport instance to use from now on.
+    """
+
+    with _TRANSPORTS_LOCK:
+        _TRANSPORTS[(transport.scheme, transport.netloc)] = transport
@@ -0,0 +1,353 @@
+"""
+The command-line interface.
+
+The `pythemoviedb` command has a subcommand per task:
+
+    pythemoviedb fetch --kind movie --output movies.jsonl 550 551
+    pythemoviedb fetch --kind movie --ids-file movie_ids.json --output movies.jsonl
+    pythemoviedb changes --start-date 2024-01-01 --output changes.jsonl
+    pythemoviedb scan ~/Movies --output matches.jsonl
+    pythemoviedb rename ~/Movies
+    pythemoviedb rename ~/Movies --apply
+
+All of them accept `--concurrency`, the number of simultaneous requests,
+`--cache-dir`, a directory where the responses are cached between runs, and
+`--rate`, the maximum number of requests per second. The API keys are read
+from PYTHEMOVIEDB_API_KEY, separated by commas to spread the requests across
+several keys.
+"""
+
+import pythemoviedb.configuration as configuration
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.bulk import fetch_all
+from pythemoviedb.api.cache import DiskCache, set_cache
+from pythemoviedb.api.client import get_client
+from pythemoviedb.api.ratelimit import RateLimiter, set_rate_limiter
+from pythemoviedb.api.titles import normalize_title, parse_file_name, search_movie, DEFAULT_MIN_SCORE
+from pythemoviedb.api.transport import Transport, set_transport
+from pythemoviedb.pipeline import FETCH_FUNCTIONS, JSONLinesSink, Pipeline, read_ids
+from pythemoviedb.sync import get_changed_ids, parse_date
+
+import argparse
+import collections
+import datetime
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+
+MEDIA_EXTENSIONS = ('.avi', '.divx', '.m2ts', '.m4v', '.mkv', '.mov', '.mp4', '.mpeg', '.mpg', '.ogm', '.ts', '.webm', '.wmv')
+
+_INVALID_FILE_NAME_CHARACTERS_REGEX = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+def find_media_files(directory, extensions=MEDIA_EXTENSIONS):
+    """
+    Find the media files of a directory tree.
+
+    :param directory: The root directory.
+    :param extensions: The lowercase extensions of the media files.
+    :returns: A generator of file paths, sorted by directory then by name.
+    """
+
+    for root, directories, file_names in os.walk(directory):
+        directories.sort()
+
+        for file_name in sorted(file_names):
+            if os.path.splitext(file_name)[1].lower() in extensions:
+                yield os.path.join(root, file_name)
+
+def _match(query, language, min_score):
+    """
+    Match a (title, year) query. Runs in the fetch_all worker threads.
+    """
+
+    title, year = query
+    results = search_movie(title, year=year, language=language, min_score=min_score, limit=1)
+
+    if results and results[0]['score'] >= min_score:
+        return results[0]
+
+def match_files(paths, language=None, min_score=DEFAULT_MIN_SCORE, concurrency=configuration.POOL_SIZE):
+    """
+    Match media files to movies, concurrently.
+
+    The files are grouped by title and year, so that each group is matched
+    once, and the matches go through the shared title index, so that most
+    of the titles seen before are matched without a request.
+
+    :param paths: An iterable of file paths.
+    :param language: The language of the searches, as a ISO 639-1 code.
+    :param min_score: The minimum similarity between the title of a file and the title of its match.
+    :param concurrency: The number of simultaneous matches.
+    :returns: A generator of (path, title, year, match) tuples, in completion order, where match is a TitleIndex.search result, or None.
+    """
+
+    groups = collections.OrderedDict()
+
+    for path in paths:
+        title, year = parse_file_name(os.path.basename(path))
+        groups.setdefault((normalize_title(title), year), (title, year, []))[2].append(path)
+
+    queries = dict(((title, year), key) for key, (title, year, _) in groups.items())
+
+    for query, result in fetch_all(_match, list(queries), concurrency, language, min_score):
+        if isinstance(result, Exception):
+            LOGGER.warning('Unable to match %s: %s', query[0], result)
+            result = None
+
+        title, year, group_paths = groups[queries[query]]
+
+        for path in group_paths:
+            yield path, title, year, result
+
+def get_file_name(match, extension):
+    """
+    Get the file name of a matched movie.
+
+    :param match: The match, as returned by match_files.
+    :param extension: The extension of the file, including the dot.
+    :returns: The file name, e.g. 'Fight Club (1999).mkv'.
+    """
+
+    name = match['title'] if match['year'] is None else '%s (%s)' % (match['title'], match['year'])
+
+    return _INVALID_FILE_NAME_CHARACTERS_REGEX.sub('', name).strip(' .') + extension
+
+def plan_renames(matches):
+    """
+    Plan the renaming of matched media files.
+
+    :param matches: An iterable of (path, title, year, match) tuples, as returned by match_files.
+    :returns: A (renames, skipped) tuple: a list of (path, new_path) tuples, sorted by path, and a list of (path, reason) tuples.
+    """
+
+    renames = []
+    skipped = []
+    targets = set()
+
+    for path, _, _, match in sorted(matches, key=lambda item: item[0]):
+        if match is None:
+            skipped.append((path, 'no match'))
+            continue
+
+        new_path = os.path.join(os.path.dirname(path), get_file_name(match, os.path.splitext(path)[1]))
+
+        if new_path == path:
+            continue
+
+        # On case-insensitive file systems, a change of case targets the file itself.
+        if new_path in targets or (os.path.exists(new_path) and not os.path.samefile(path, new_path)):
+            skipped.append((path, 'conflicts with %s' % new_path))
+            continue
+
+        targets.add(new_path)
+        renames.append((path, new_path))
+
+    return renames, skipped
+
+def _write(stream, text):
+    """
+    Write a line of text to a stream.
+    """
+
+    if sys.version_info[0] < 3 and isinstance(text, unicode):
+        text = text.encode(getattr(stream, 'encoding', None) or 'utf-8', 'replace')
+
+    stream.write(text + '\n')
+
+def _open_output(path):
+    """
+    Open an output file, or the standard output for '-'.
+    """
+
+    if path == '-':
+        return sys.stdout
+
+    return open(path, 'w')
+
+def _configure(args):
+    """
+    Apply the common options.
+    """
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format='%(levelname)s %(message)s')
+
+    # One connection per simultaneous request.
+    set_transport(Transport(get_client().base_url, pool_size=args.concurrency))
+
+    if args.cache_dir:
+        set_cache(DiskCache(args.cache_dir))
+
+    if args.rate:
+        set_rate_limiter(RateLimiter(args.rate))
+
+def _run_pipeline(args, items):
+    """
+    Fetch entities and export them as JSON Lines.
+    """
+
+    sink = JSONLinesSink(args.output)
+
+    try:
+        pipeline = Pipeline(
+            sink,
+            fetch_concurrency=args.concurrency,
+            processes=args.processes,
+            checkpoint_path=args.checkpoint,
+        )
+        counts = pipeline.run(items)
+
+    finally:
+        sink.close()
+
+    _write(sys.stderr, '%(written)s written, %(skipped)s skipped, %(failed)s failed' % counts)
+
+    return 1 if counts['failed'] else 0
+
+def fetch_command(args):
+    """
+    The fetch subcommand: fetch entities from a list of identifiers.
+    """
+
+    items = ((args.kind, int(_id)) for _id in args.ids)
+
+    if args.ids_file:
+        items = itertools.chain(items, read_ids(args.ids_file, args.kind))
+
+    return _run_pipeline(args, items)
+
+def changes_command(args):
+    """
+    The changes subcommand: fetch the entities that changed in a period.
+    """
+
+    stop_date = parse_date(args.stop_date) if args.stop_date else datetime.date.today()
+    start_date = parse_date(args.start_date) if args.start_date else stop_date - datetime.timedelta(days=1)
+    items = []
+
+    for kind in args.kinds or sorted(FETCH_FUNCTIONS):
+        ids = get_changed_ids(kind, start_date, stop_date)
+        LOGGER.info('%s %s entities changed between %s and %s', len(ids), kind, start_date, stop_date)
+        items.extend((kind, _id) for _id in ids)
+
+    return _run_pipeline(args, items)
+
+def scan_command(args):
+    """
+    The scan subcommand: match the media files of a directory tree and export the matches as JSON Lines.
+    """
+
+    output = _open_output(args.output)
+    matched = unmatched = 0
+
+    try:
+        for path, title, year, match in match_files(find_media_files(args.directory), args.language, args.min_score, args.concurrency):
+            _write(output, json.dumps({'path': path, 'title': title, 'year': year, 'match': match}, sort_keys=True))
+
+            if match is None:
+                unmatched += 1
+            else:
+                matched += 1
+
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    _write(sys.stderr, '%s matched, %s unmatched' % (matched, unmatched))
+
+    return 0
+
+def rename_command(args):
+    """
+    The rename subcommand: rename the media files of a directory tree after their matches.
+    """
+
+    matches = match_files(find_media_files(args.directory), args.language, args.min_score, args.concurrency)
+    renames, skipped = plan_renames(matches)
+
+    for path, reason in skipped:
+        _write(sys.stderr, 'Skipping %s: %s' % (path, reason))
+
+    failed = 0
+
+    for path, new_path in renames:
+        _write(sys.stdout, '%s -> %s' % (path, new_path))
+
+        if args.apply:
+            try:
+                os.rename(path, new_path)
+            except OSError as ex:
+                _write(sys.stderr, 'Unable to rename %s: %s' % (path, ex))
+                failed += 1
+
+    _write(sys.stderr, '%s %s, %s skipped' % (len(renames) - failed, 'renamed' if args.apply else 'to rename (dry run: use --apply to rename)', len(skipped)))
+
+    return 1 if failed else 0
+
+def create_parser():
+    """
+    Create the command-line parser.
+
+    :returns: An argparse.ArgumentParser.
+    """
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--concurrency', type=int, default=configuration.POOL_SIZE, help='The number of simultaneous requests. Defaults to %(default)s.')
+    common.add_argument('--cache-dir', help='A directory where the responses are cached between runs.')
+    common.add_argument('--rate', type=float, default=configuration.RATE_LIMIT, help='The maximum number of requests per second. 0, the default, means no limit.')
+    common.add_argument('-v', '--verbose', action='store_true', help='Log the progress.')
+
+    export = argparse.ArgumentParser(add_help=False)
+    export.add_argument('-o', '--output', required=True, help='The JSON Lines file where the entities are appended.')
+    export.add_argument('--processes', type=int, help='The number of processes that decode the entities. Defaults to the number of CPUs.')
+    export.add_argument('--checkpoint', help='A checkpoint file, to resume an interrupted export.')
+
+    matching = argparse.ArgumentParser(add_help=False)
+    matching.add_argument('directory', help='The root of the directory tree to scan.')
+    matching.add_argument('--language', help='The language of the titles, as a ISO 639-1 code.')
+    matching.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE, help='The minimum similarity, between 0 and 1, of a title and its match. Defaults to %(default)s.')
+
+    parser = argparse.ArgumentParser(prog='pythemoviedb', description='Bulk tools for The Movie Database API.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    fetch_parser = subparsers.add_parser('fetch', parents=[common, export], help='Fetch entities from a list of identifiers.')
+    fetch_parser.add_argument('ids', nargs='*', help='The identifiers of the entities.')
+    fetch_parser.add_argument('--ids-file', help='A file of identifiers, one per line, or a TMDb daily export file.')
+    fetch_parser.add_argument('--kind', choices=sorted(FETCH_FUNCTIONS), default='movie', help='The kind of the entities. Defaults to %(default)s.')
+    fetch_parser.set_defaults(function=fetch_command)
+
+    changes_parser = subparsers.add_parser('changes', parents=[common, export], help='Fetch the entities that changed in a period.')
+    changes_parser.add_argument('--kind', dest='kinds', action='append', choices=sorted(FETCH_FUNCTIONS), help='The kind of the entities. Can be repeated. Defaults to all of them.')
+    changes_parser.add_argument('--start-date', help='The start of the period, as YYYY-MM-DD. Defaults to the day before the stop date.')
+    changes_parser.add_argument('--stop-date', help='The end of the period, as YYYY-MM-DD. Defaults to today.')
+    changes_parser.set_defaults(function=changes_command)
+
+    scan_parser = subparsers.add_parser('scan', parents=[common, matching], help='Match the media files of a directory tree to movies.')
+    scan_parser.add_argument('-o', '--output', default='-', help='The JSON Lines file where the matches are written. Defaults to the standard output.')
+    scan_parser.set_defaults(function=scan_command)
+
+    rename_parser = subparsers.add_parser('rename', parents=[common, matching], help='Rename the media files of a directory tree after their matches.')
+    rename_parser.add_argument('--apply', action='store_true', help='Rename the files. Otherwise, only print the renaming plan.')
+    rename_parser.set_defaults(function=rename_command)
+
+    return parser
+
+def main(argv=None):
+    """
+    Run the command-line interface.
+
+    :param argv: The arguments. Defaults to sys.argv[1:].
+    :returns: The exit status.
+    """
+
+    args = create_parser().parse_args(argv)
+
+    _configure(args)
+
+    return args.function(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,3 +7,21 @@ import os
 API_URL = os.environ.get('PYTHEMOVIEDB_API_URL', 'http://api.themoviedb.org')
 API_VERSION = os.environ.get('PYTHEMOVIEDB_API_VERSION', '3')
 API_KEY = os.environ.get('PYTHEMOVIEDB_API_KEY')
+POOL_SIZE = int(os.environ.get('PYTHEMOVIEDB_POOL_SIZE', '10'))
+TIMEOUT = float(os.environ.get('PYTHEMOVIEDB_TIMEOUT', '30'))
+RATE_LIMIT = float(os.environ.get('PYTHEMOVIEDB_RATE_LIMIT', '0'))
+RATE_BURST = float(os.environ.get('PYTHEMOVIEDB_RATE_BURST', '0')) or None
+MAX_RETRIES = int(os.environ.get('PYTHEMOVIEDB_MAX_RETRIES', '3'))
+JSON_DECODER = os.environ.get('PYTHEMOVIEDB_JSON_DECODER') or None
+CONFIGURATION_TTL = float(os.environ.get('PYTHEMOVIEDB_CONFIGURATION_TTL', '86400'))
+CONFIGURATION_PATH = os.environ.get('PYTHEMOVIEDB_CONFIGURATION_PATH') or None
+DICTIONARY_PATH = os.environ.get('PYTHEMOVIEDB_DICTIONARY_PATH') or None
+STORE_PATH = os.environ.get('PYTHEMOVIEDB_STORE_PATH') or None
+STORE_MAX_AGE = float(os.environ.get('PYTHEMOVIEDB_STORE_MAX_AGE', '604800'))
+KEY_RATE_LIMIT = float(os.environ.get('PYTHEMOVIEDB_KEY_RATE_LIMIT', '0'))
+HEDGE_BUDGET = float(os.environ.get('PYTHEMOVIEDB_HEDGE_BUDGET', '0'))
+HEDGE_DELAY = float(os.environ.get('PYTHEMOVIEDB_HEDGE_DELAY', '0')) or None
+CIRCUIT_FAILURES = int(os.environ.get('PYTHEMOVIEDB_CIRCUIT_FAILURES', '0'))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get('PYTHEMOVIEDB_CIRCUIT_RESET_TIMEOUT', '30'))
+PREFETCH_DEPTH = int(os.environ.get('PYTHEMOVIEDB_PREFETCH_DEPTH', '0'))
+PREFETCH_BUDGET = float(os.environ.get('PYTHEMOVIEDB_PREFETCH_BUDGET', '2'))
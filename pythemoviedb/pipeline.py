@@ -0,0 +1,537 @@
+"""
+The bulk ingestion pipeline module.
+
+A Pipeline turns lists of identifiers into records, in stages:
+
+- fetch: a pool of threads requests the raw response bodies, as the requests
+  are I/O bound,
+- decode and transform: a pool of processes decodes the bodies, calls the
+  transform function and encodes the records, as this is CPU bound and would
+  otherwise be limited by the GIL,
+- sink: the main process writes the encoded records to a PipelineSink.
+
+The stages are connected by bounded queues, so that a slow stage holds the
+previous ones back instead of buffering the whole input in memory. The
+progress is saved in a checkpoint file so that an interrupted run resumes
+where it stopped, provided it is given the same input in the same order.
+
+The transform function and the sink encoder run in the worker processes:
+they must be defined at the top level of a module so that they can be
+pickled.
+"""
+
+import pythemoviedb.configuration as configuration
+import pythemoviedb.api.methods as methods
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.decoder import get_decoder
+from pythemoviedb.api.error import APIError
+from pythemoviedb.sync import SyncState
+
+import json
+import multiprocessing
+import os
+import sys
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+FETCH_FUNCTIONS = {
+    'movie': methods.get_movie_all,
+    'person': methods.get_person_credits,
+}
+
+_DONE = object()
+
+def default_transform(kind, _id, data):
+    """
+    The default transform: wraps the entity with its kind and identifier.
+
+    :param kind: The entity kind, e.g. 'movie' or 'person'.
+    :param _id: The entity identifier.
+    :param data: The decoded entity, as returned by the API.
+    :returns: The record, or None to skip the entity.
+    """
+
+    return {
+        'kind': kind,
+        'id': _id,
+        'data': data,
+    }
+
+def encode_json_line(record):
+    """
+    Encode a record as a line of JSON.
+
+    :param record: The record.
+    :returns: The line, as bytes, including the line feed.
+    """
+
+    return (json.dumps(record, separators=(',', ':'), sort_keys=True) + '\n').encode('utf-8')
+
+def read_ids(path, kind):
+    """
+    Read a list of identifiers.
+
+    Each line holds an identifier, or a JSON object with an 'id' key, as in
+    the TMDb daily export files. Blank lines are ignored.
+
+    :param path: The path of the file.
+    :param kind: The entity kind of the identifiers.
+    :returns: A generator of (kind, id) tuples.
+    """
+
+    with open(path) as ids_file:
+        for line in ids_file:
+            line = line.strip()
+
+            if not line:
+                continue
+
+            if line.startswith('{'):
+                yield kind, json.loads(line)['id']
+            else:
+                yield kind, int(line)
+
+def _process(transform, encoder, kind, _id, body):
+    """
+    Decode, transform and encode an entity. Runs in the worker processes.
+
+    :returns: A (record, error) tuple. The record is None if it was skipped or if the processing failed.
+    """
+
+    try:
+        record = transform(kind, _id, get_decoder().decode(body))
+
+        if record is not None and encoder is not None:
+            record = encoder(record)
+
+        return record, None
+
+    except Exception as ex:
+        return None, '%s: %s' % (ex.__class__.__name__, ex)
+
+class PipelineSink(object):
+    """
+    The base class for pipeline sinks.
+
+    `encoder`, if set, is a picklable function called in the worker processes
+    on each record before it is handed to `put`.
+    """
+
+    encoder = None
+
+    def put(self, kind, _id, record):
+        """
+        Store a record.
+
+        :param kind: The entity kind.
+        :param _id: The entity identifier.
+        :param record: The record, encoded by `encoder` if it is set.
+        """
+
+        raise NotImplementedError()
+
+    def checkpoint(self):
+        """
+        Make the records stored so far durable.
+
+        :returns: A JSON serializable position, passed to `restore` when an interrupted run resumes.
+        """
+
+        return None
+
+    def restore(self, position):
+        """
+        Discard the records stored after a checkpoint.
+
+        :param position: The position returned by `checkpoint`.
+        """
+
+        pass
+
+    def close(self):
+        """
+        Close the sink.
+        """
+
+        pass
+
+class JSONLinesSink(PipelineSink):
+    """
+    A sink that appends the records to a JSON Lines file.
+
+    When an interrupted run resumes, the lines written after the last
+    checkpoint are truncated, so that each record is written exactly once.
+    """
+
+    encoder = staticmethod(encode_json_line)
+
+    def __init__(self, path):
+        """
+        Open a JSON Lines sink.
+
+        :param path: The path of the file. It is created if it does not exist.
+        """
+
+        self.path = path
+        self.file = open(path, 'ab')
+
+    def put(self, kind, _id, record):
+        """
+        Append an encoded record.
+        """
+
+        self.file.write(record)
+
+    def checkpoint(self):
+        """
+        Flush the file to disk.
+
+        :returns: The file size.
+        """
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        return self.file.tell()
+
+    def restore(self, position):
+        """
+        Truncate the file to a checkpointed size.
+        """
+
+        if position is not None:
+            self.file.truncate(position)
+            self.file.seek(0, os.SEEK_END)
+
+    def close(self):
+        """
+        Close the file.
+        """
+
+        self.file.close()
+
+class Pipeline(object):
+    """
+    A bulk ingestion pipeline.
+    """
+
+    def __init__(self, sink, transform=default_transform, fetch_functions=None, fetch_concurrency=configuration.POOL_SIZE, processes=None, queue_size=None, checkpoint_path=None, checkpoint_interval=1000):
+        """
+        Create a pipeline.
+
+        :param sink: The PipelineSink that receives the records.
+        :param transform: A picklable function that takes the kind, identifier and decoded entity, and returns a record or None to skip the entity.
+        :param fetch_functions: A dictionary of entity kinds and the request functions of `pythemoviedb.api.methods` that fetch an entity from its identifier. Defaults to FETCH_FUNCTIONS.
+        :param fetch_concurrency: The number of simultaneous requests.
+        :param processes: The number of worker processes. Defaults to the number of CPUs.
+        :param queue_size: The maximum number of entities waiting between two stages. Defaults to 4 times the number of workers of the larger stage.
+        :param checkpoint_path: The path of the checkpoint file, or None to disable checkpointing.
+        :param checkpoint_interval: The number of entities after which the progress is saved.
+        """
+
+        self.sink = sink
+        self.transform = transform
+        self.fetch_functions = fetch_functions or FETCH_FUNCTIONS
+        self.fetch_concurrency = fetch_concurrency
+        self.processes = processes or multiprocessing.cpu_count()
+        self.queue_size = queue_size or 4 * max(self.processes, fetch_concurrency)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+
+    def fetch(self, kind, _id):
+        """
+        Fetch the raw body of an entity.
+
+        :param kind: The entity kind.
+        :param _id: The entity identifier.
+        :returns: The body, as bytes.
+        """
+
+        action, parameters, _ = methods.capture_request(self.fetch_functions[kind], _id)
+
+        return methods.make_request(action, parameters, raw=True)
+
+    def run(self, items):
+        """
+        Run the pipeline.
+
+        :param items: An iterable of (kind, id) tuples, e.g. from read_ids.
+        :returns: A dictionary with the 'written', 'skipped' and 'failed' counts of this run.
+        """
+
+        state = SyncState(self.checkpoint_path) if self.checkpoint_path else None
+        progress = _Progress(state.data if state else {})
+
+        if state is not None and 'sink' in state.data:
+            LOGGER.info('Resuming the pipeline after %s entities', progress.position)
+            self.sink.restore(state.data['sink'])
+        else:
+            # Record where the sink starts, so that a run interrupted before its first checkpoint can be undone.
+            self._checkpoint(state, progress)
+
+        fetched = queue.Queue(self.queue_size)
+        results = queue.Queue()
+        stopped = threading.Event()
+        slots = threading.BoundedSemaphore(self.queue_size)
+        pool = multiprocessing.Pool(self.processes)
+        fetchers = _Fetchers(self, items, progress, fetched, stopped)
+        counts = {'written': 0, 'skipped': 0, 'failed': 0}
+
+        dispatcher = threading.Thread(target=self._dispatch, args=(pool, fetched, results, slots, stopped))
+        dispatcher.daemon = True
+        dispatcher.start()
+
+        try:
+            while True:
+                item = results.get()
+
+                if item is _DONE:
+                    break
+
+                index, kind, _id, record, error = item
+
+                if error is not None:
+                    LOGGER.warning('Unable to process %s %s: %s', kind, _id, error)
+                    progress.fail(kind, _id, error)
+                    counts['failed'] += 1
+                elif record is None:
+                    counts['skipped'] += 1
+                else:
+                    self.sink.put(kind, _id, record)
+                    counts['written'] += 1
+
+                if progress.complete(index) % self.checkpoint_interval == 0:
+                    self._checkpoint(state, progress)
+
+            fetchers.raise_error()
+            pool.close()
+
+        except BaseException:
+            stopped.set()
+            pool.terminate()
+
+            raise
+
+        finally:
+            pool.join()
+
+        self._checkpoint(state, progress)
+
+        return counts
+
+    def _dispatch(self, pool, fetched, results, slots, stopped):
+        """
+        Hand the fetched bodies to the worker processes. Runs in a thread.
+        """
+
+        def make_callback(index, kind, _id):
+            def callback(result):
+                results.put((index, kind, _id) + tuple(result))
+                slots.release()
+
+            return callback
+
+        def make_error_callback(index, kind, _id):
+            # The task failed outside _process, e.g. its arguments could not be pickled.
+            def error_callback(ex):
+                results.put((index, kind, _id, None, '%s: %s' % (ex.__class__.__name__, ex)))
+                slots.release()
+
+            return error_callback
+
+        while not stopped.is_set():
+            try:
+                item = fetched.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if item is _DONE:
+                break
+
+            index, kind, _id, body, error = item
+
+            if error is not None:
+                results.put((index, kind, _id, None, error))
+                continue
+
+            callbacks = {'callback': make_callback(index, kind, _id)}
+
+            # Python 2 pools have no error callback.
+            if sys.version_info[0] >= 3:
+                callbacks['error_callback'] = make_error_callback(index, kind, _id)
+
+            slots.acquire()
+            pool.apply_async(_process, (self.transform, self.sink.encoder, kind, _id, body), **callbacks)
+
+        # Wait for the tasks in flight.
+        for _ in range(self.queue_size):
+            slots.acquire()
+
+        results.put(_DONE)
+
+    def _checkpoint(self, state, progress):
+        """
+        Save the progress, once the sink made the records durable.
+        """
+
+        position = self.sink.checkpoint()
+
+        if state is not None:
+            progress.save(state.data)
+            state.data['sink'] = position
+            state.save()
+
+class _Progress(object):
+    """
+    The progress of a pipeline run: the number of input entities completed in
+    order, and the indexes of the entities completed out of order.
+    """
+
+    def __init__(self, data):
+        """
+        Load the progress from checkpoint data.
+        """
+
+        self.position = data.get('position', 0)
+        self.done = set(data.get('done', ()))
+        self.failed = list(data.get('failed', ()))
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def is_done(self, index):
+        """
+        Check whether an input entity was completed by a previous run.
+        """
+
+        return index < self.position or index in self.done
+
+    def fail(self, kind, _id, error):
+        """
+        Record a failed entity. It is completed nonetheless.
+        """
+
+        self.failed.append([kind, _id, error])
+
+    def complete(self, index):
+        """
+        Record a completed entity.
+
+        :returns: The number of entities completed in this run.
+        """
+
+        with self._lock:
+            self.done.add(index)
+
+            while self.position in self.done:
+                self.done.remove(self.position)
+                self.position += 1
+
+            self.completed += 1
+
+            return self.completed
+
+    def save(self, data):
+        """
+        Store the progress in checkpoint data.
+        """
+
+        with self._lock:
+            data.update(position=self.position, done=sorted(self.done), failed=self.failed)
+
+class _Fetchers(object):
+    """
+    The fetch stage: a pool of threads that fetch the raw bodies of the input entities.
+    """
+
+    def __init__(self, pipeline, items, progress, fetched, stopped):
+        """
+        Start the fetch threads.
+        """
+
+        self.pipeline = pipeline
+        self.items = iter(enumerate(items))
+        self.progress = progress
+        self.fetched = fetched
+        self.stopped = stopped
+        self.error = None
+
+        self._lock = threading.Lock()
+        self._running = pipeline.fetch_concurrency
+        self._threads = [threading.Thread(target=self._work) for _ in range(pipeline.fetch_concurrency)]
+
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def _next(self):
+        """
+        Get the next input entity that remains to be done.
+
+        :returns: An (index, (kind, id)) tuple, or None at the end of the input.
+        """
+
+        with self._lock:
+            for index, item in self.items:
+                if not self.progress.is_done(index):
+                    return index, item
+
+        return None
+
+    def _put(self, item):
+        """
+        Put an item in the fetched queue, unless the pipeline is stopped.
+        """
+
+        while not self.stopped.is_set():
+            try:
+                self.fetched.put(item, timeout=0.1)
+
+                return
+            except queue.Full:
+                pass
+
+    def _work(self):
+        """
+        Fetch entities until the end of the input. Runs in the fetch threads.
+        """
+
+        try:
+            while not self.stopped.is_set():
+                entry = self._next()
+
+                if entry is None:
+                    break
+
+                index, (kind, _id) = entry
+
+                try:
+                    body, error = self.pipeline.fetch(kind, _id), None
+                except APIError as ex:
+                    body, error = None, str(ex)
+
+                self._put((index, kind, _id, body, error))
+
+        except Exception as ex:
+            # Any other error, e.g. the server being unreachable after the retries, stops the pipeline.
+            self.error = ex
+            self.stopped.set()
+
+        finally:
+            with self._lock:
+                self._running -= 1
+                last = self._running == 0
+
+            if last:
+                self._put(_DONE)
+
+    def raise_error(self):
+        """
+        Raise the error that stopped the fetch threads, if any.
+        """
+
+        if self.error is not None:
+            raise self.error
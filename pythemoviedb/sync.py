@@ -0,0 +1,275 @@
+"""
+The incremental synchronization module.
+
+A ChangeSync walks the change feeds of the API since its last run and hands
+the changed entities to a sink. Its progress is persisted in a state file so
+that a crashed run resumes where it stopped.
+"""
+
+import pythemoviedb.configuration as configuration
+import pythemoviedb.api.methods as methods
+from pythemoviedb.log import LOGGER
+from pythemoviedb.api.error import APIError
+from pythemoviedb.api.bulk import fetch_all
+from pythemoviedb.api.pagination import iterate_pages
+
+import datetime
+import json
+import os
+import tempfile
+
+MAX_WINDOW_DAYS = 14
+
+CHANGE_FUNCTIONS = {
+    'movie': methods.get_changed_movies,
+    'person': methods.get_changed_persons,
+}
+
+class Sink(object):
+    """
+    The base class for synchronization sinks.
+
+    Entities may be handed to a sink more than once, e.g. after a crash, so
+    sinks must be idempotent.
+    """
+
+    def put(self, kind, _id, data):
+        """
+        Store a changed entity.
+
+        :param kind: The entity kind, e.g. 'movie' or 'person'.
+        :param _id: The entity identifier.
+        :param data: The entity, as returned by the API.
+        """
+
+        raise NotImplementedError()
+
+    def delete(self, kind, _id):
+        """
+        Remove an entity that no longer exists.
+
+        :param kind: The entity kind, e.g. 'movie' or 'person'.
+        :param _id: The entity identifier.
+        """
+
+        raise NotImplementedError()
+
+class SyncState(object):
+    """
+    The persistent state of a synchronization.
+
+    For each entity kind, the state holds the high-water mark, that is the
+    date up to which changes were synchronized, and the identifiers that
+    remain to be fetched in the current run.
+    """
+
+    def __init__(self, path):
+        """
+        Load a synchronization state.
+
+        :param path: The path of the state file. It is created on the first save.
+        """
+
+        self.path = path
+
+        if os.path.exists(path):
+            with open(path) as state_file:
+                self.data = json.load(state_file)
+        else:
+            self.data = {}
+
+    def get(self, kind):
+        """
+        Get the state of an entity kind.
+
+        :param kind: The entity kind.
+        :returns: A dictionary with the 'high_water_mark', 'stop_date' and 'pending' keys.
+        """
+
+        return self.data.setdefault(kind, {
+            'high_water_mark': None,
+            'stop_date': None,
+            'pending': [],
+        })
+
+    def save(self):
+        """
+        Save the state atomically.
+        """
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w') as state_file:
+                json.dump(self.data, state_file)
+        except BaseException:
+            os.remove(temporary_path)
+
+            raise
+
+        if os.name == 'nt' and os.path.exists(self.path):
+            os.remove(self.path)
+
+        os.rename(temporary_path, self.path)
+
+def parse_date(date):
+    """
+    Parse a date in the API format.
+
+    :param date: The date to parse.
+    :returns: A Python datetime.date instance.
+    """
+
+    return datetime.datetime.strptime(date, '%Y-%m-%d').date()
+
+def get_changed_ids(kind, start_date, stop_date, change_functions=CHANGE_FUNCTIONS):
+    """
+    Get the identifiers of the entities that changed in a period.
+
+    :param kind: The entity kind.
+    :param start_date: The start date.
+    :param stop_date: The stop date.
+    :param change_functions: A dictionary of entity kinds and the paginated request functions of their change feeds.
+    :returns: The list of unique identifiers, in feed order.
+    """
+
+    function = change_functions[kind]
+    seen = set()
+    ids = []
+
+    # The API does not accept windows longer than MAX_WINDOW_DAYS.
+    while start_date < stop_date:
+        window_stop_date = min(stop_date, start_date + datetime.timedelta(days=MAX_WINDOW_DAYS))
+
+        for change in iterate_pages(function, start_date=start_date, stop_date=window_stop_date):
+            if change['id'] not in seen:
+                seen.add(change['id'])
+                ids.append(change['id'])
+
+        start_date = window_stop_date
+
+    return ids
+
+class ChangeSync(object):
+    """
+    An incremental synchronization of changed entities.
+    """
+
+    CHANGE_FUNCTIONS = CHANGE_FUNCTIONS
+
+    FETCH_FUNCTIONS = {
+        'movie': methods.get_movie,
+        'person': methods.get_person,
+    }
+
+    def __init__(self, sink, state_path, kinds=('movie', 'person'), fetch_functions=None, concurrency=configuration.POOL_SIZE, checkpoint_interval=100, initial_days=1):
+        """
+        Create a synchronization.
+
+        :param sink: The Sink that receives the changed entities.
+        :param state_path: The path of the state file.
+        :param kinds: The entity kinds to synchronize.
+        :param fetch_functions: A dictionary of entity kinds and the functions that fetch an entity from its identifier. Defaults to FETCH_FUNCTIONS.
+        :param concurrency: The number of simultaneous requests.
+        :param checkpoint_interval: The number of entities after which the state is saved.
+        :param initial_days: The number of days of changes to synchronize on the first run.
+        """
+
+        self.sink = sink
+        self.state = SyncState(state_path)
+        self.kinds = kinds
+        self.fetch_functions = fetch_functions or self.FETCH_FUNCTIONS
+        self.concurrency = concurrency
+        self.checkpoint_interval = checkpoint_interval
+        self.initial_days = initial_days
+
+    def get_changed_ids(self, kind, start_date, stop_date):
+        """
+        Get the identifiers of the entities that changed in a period.
+
+        :param kind: The entity kind.
+        :param start_date: The start date.
+        :param stop_date: The stop date.
+        :returns: The list of unique identifiers, in feed order.
+        """
+
+        return get_changed_ids(kind, start_date, stop_date, self.CHANGE_FUNCTIONS)
+
+    def run(self, stop_date=None):
+        """
+        Synchronize the changes up to a date.
+
+        If the previous run was interrupted, its remaining entities are
+        fetched along with the new changes.
+
+        :param stop_date: The date up to which changes are synchronized. Defaults to today.
+        :returns: A dictionary of entity kinds and the number of entities handed to the sink.
+        """
+
+        stop_date = stop_date or datetime.date.today()
+        counts = {}
+
+        for kind in self.kinds:
+            kind_state = self.state.get(kind)
+
+            if kind_state['stop_date'] is not None:
+                LOGGER.info('Resuming %s synchronization with %s pending entities', kind, len(kind_state['pending']))
+
+            if kind_state['high_water_mark'] is None:
+                start_date = stop_date - datetime.timedelta(days=self.initial_days)
+            else:
+                start_date = parse_date(kind_state['high_water_mark'])
+
+            if start_date < stop_date:
+                changed_ids = self.get_changed_ids(kind, start_date, stop_date)
+
+                LOGGER.info('%s %s entities changed between %s and %s', len(changed_ids), kind, start_date, stop_date)
+
+                pending = set(kind_state['pending'])
+                kind_state['pending'].extend(_id for _id in changed_ids if _id not in pending)
+                kind_state['stop_date'] = methods.format_date(stop_date)
+                self.state.save()
+
+            counts[kind] = self._fetch(kind, kind_state)
+
+        return counts
+
+    def _fetch(self, kind, kind_state):
+        """
+        Fetch the pending entities of a kind and hand them to the sink.
+
+        The entities that could not be fetched remain pending for the next run.
+        """
+
+        pending = set(kind_state['pending'])
+        failed = []
+        count = 0
+        processed = 0
+
+        for _id, result in fetch_all(self.fetch_functions[kind], list(kind_state['pending']), self.concurrency):
+            if isinstance(result, APIError):
+                if result.status_code == APIError.INVALID_ID:
+                    self.sink.delete(kind, _id)
+                    count += 1
+                else:
+                    LOGGER.warning('Unable to fetch %s %s: %s', kind, _id, result)
+                    failed.append(_id)
+
+            else:
+                self.sink.put(kind, _id, result)
+                count += 1
+
+            pending.discard(_id)
+            processed += 1
+
+            if processed % self.checkpoint_interval == 0:
+                kind_state['pending'] = failed + list(pending)
+                self.state.save()
+
+        kind_state['pending'] = failed
+        kind_state['high_water_mark'] = kind_state['stop_date'] or kind_state['high_water_mark']
+        kind_state['stop_date'] = None
+        self.state.save()
+
+        return count
@@ -26,6 +26,16 @@ setup(
     install_requires = [
     ],
 
+    extras_require = {
+        'speedups': ['orjson', 'pysimdjson'],
+    },
+
+    entry_points = {
+        'console_scripts': [
+            'pythemoviedb = pythemoviedb.cli:main',
+        ],
+    },
+
     classifiers = [
         'Environment :: Console',
         'Intended Audience :: End Users/Desktop',
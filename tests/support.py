@@ -0,0 +1,87 @@
+"""
+The test helpers.
+
+The tests run the library against the fake API server of the benchmarks, in
+a background thread, with the shared state of the library reset for each
+test.
+"""
+
+import os
+import sys
+import unittest
+
+BENCHMARKS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIRECTORY))
+sys.path.insert(0, BENCHMARKS_DIRECTORY)
+
+from fake_server import start_server
+
+from pythemoviedb.api import cache, circuit, client, hedging, instrumentation, prefetch, ratelimit, singleflight, store, transport
+
+# The shared state of the library, as (getter, setter) pairs.
+SHARED_STATE = [
+    (cache.get_cache, cache.set_cache),
+    (circuit.get_circuit_breaker, circuit.set_circuit_breaker),
+    (client.get_client, client.set_client),
+    (hedging.get_hedge_policy, hedging.set_hedge_policy),
+    (prefetch.get_prefetcher, prefetch.set_prefetcher),
+    (ratelimit.get_rate_limiter, ratelimit.set_rate_limiter),
+    (ratelimit.get_retry_policy, ratelimit.set_retry_policy),
+    (singleflight.get_single_flight, singleflight.set_single_flight),
+    (store.get_store, store.set_store),
+]
+
+class FastRetryPolicy(ratelimit.RetryPolicy):
+    """
+    A retry policy that never waits more than a few milliseconds, whatever the Retry-After headers say.
+    """
+
+    def get_delay(self, attempt, response=None):
+        """
+        Get the delay before retrying a request, capped to 10 milliseconds.
+        """
+
+        delay = super(FastRetryPolicy, self).get_delay(attempt, response)
+
+        return delay if delay is None else min(delay, 0.01)
+
+class APITestCase(unittest.TestCase):
+    """
+    A test case that runs against a fake API server.
+
+    `server_options` holds the `fake_server.make_server` parameters. Each
+    test gets its own server, transport and client, and no cache, rate
+    limiter, circuit breaker, hedging nor prefetching unless it sets them.
+    """
+
+    server_options = {}
+
+    def setUp(self):
+        """
+        Start the fake API server and reset the shared state of the library.
+        """
+
+        for getter, setter in SHARED_STATE:
+            self.addCleanup(setter, getter())
+
+        self.server = start_server(**self.server_options)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.transport = transport.Transport(self.server.url, pool_size=4)
+        self.addCleanup(self.transport.close)
+        transport.set_transport(self.transport)
+
+        self.client = client.Client(['test-key'], base_url=self.server.url)
+        client.set_client(self.client)
+
+        for setter in (cache.set_cache, circuit.set_circuit_breaker, hedging.set_hedge_policy, prefetch.set_prefetcher, ratelimit.set_rate_limiter, store.set_store):
+            setter(None)
+
+        ratelimit.set_retry_policy(FastRetryPolicy(max_retries=3))
+        singleflight.set_single_flight(singleflight.SingleFlight())
+
+        self.events = []
+        instrumentation.add_hook(self.events.append)
+        self.addCleanup(instrumentation.remove_hook, self.events.append)
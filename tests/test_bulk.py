@@ -0,0 +1,73 @@
+"""
+The bulk request tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import bulk, methods
+from pythemoviedb.api.error import APIError
+
+import itertools
+import threading
+import unittest
+
+class BulkTests(APITestCase):
+    """
+    The bulk request tests.
+    """
+
+    def test_get_movies(self):
+        results = dict(methods.get_movies(range(1, 51), concurrency=4))
+
+        self.assertEqual(sorted(results), list(range(1, 51)))
+        self.assertTrue(all(movie['id'] == _id for _id, movie in results.items()))
+
+    def test_get_persons_and_collections(self):
+        self.assertEqual(sorted(_id for _id, _ in methods.get_persons([1, 2, 3])), [1, 2, 3])
+        self.assertEqual(sorted(_id for _id, _ in methods.get_collections([10, 20])), [10, 20])
+
+    def test_api_errors_are_returned(self):
+        results = dict(methods.get_movies([1, 'unknown', 2], concurrency=2))
+
+        self.assertIsInstance(results['unknown'], APIError)
+        self.assertEqual(results['unknown'].status_code, APIError.INVALID_ID)
+        self.assertEqual(results[2]['id'], 2)
+
+    def test_other_errors_are_raised(self):
+        def function(_id):
+            if _id == 5:
+                raise RuntimeError('Unexpected')
+
+            return _id
+
+        with self.assertRaises(RuntimeError):
+            list(bulk.fetch_all(function, range(10), 2))
+
+    def test_ids_are_consumed_lazily(self):
+        consumed = []
+        lock = threading.Lock()
+
+        def ids():
+            for _id in itertools.count(1):
+                with lock:
+                    consumed.append(_id)
+
+                yield _id
+
+        results = bulk.fetch_all(methods.get_movie, ids(), 2)
+
+        for _ in range(10):
+            next(results)
+
+        results.close()
+
+        # The workers stop after their current request, and the queue holds at most 2 results per worker.
+        self.assertLess(len(consumed), 20)
+
+    def test_arguments_are_passed(self):
+        results = list(bulk.fetch_all(lambda _id, factor, offset=0: _id * factor + offset, [1, 2], 2, 10, offset=1))
+
+        self.assertEqual(sorted(result for _, result in results), [11, 21])
+
+if __name__ == '__main__':
+    unittest.main()
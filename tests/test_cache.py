@@ -0,0 +1,162 @@
+"""
+The response cache tests.
+"""
+
+from pythemoviedb.api import cache
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+BODY = b'x' * 100
+
+class CacheTests(object):
+    """
+    The tests shared by the cache classes. The max_size of `make_cache` holds 3 entries of BODY.
+    """
+
+    def make_cache(self, **kwargs):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.cache = self.make_cache()
+
+    def test_get_and_set(self):
+        self.cache.set('movie/1?', b'{"id": 1}', 60)
+
+        self.assertEqual(self.cache.get('movie/1?'), b'{"id": 1}')
+        self.assertIsNone(self.cache.get('movie/2?'))
+        self.assertEqual(self.cache.get_statistics()['hits'], 1)
+        self.assertEqual(self.cache.get_statistics()['misses'], 1)
+
+    def test_entries_expire(self):
+        self.cache.set('movie/1?', b'{"id": 1}', 0.05)
+        time.sleep(0.1)
+
+        self.assertIsNone(self.cache.get('movie/1?'))
+
+    def test_expired_entries_are_kept_for_revalidation(self):
+        self.cache.set('movie/1?', b'{"id": 1}', 0.05, {'etag': '"abc"'})
+        time.sleep(0.1)
+
+        self.assertEqual(self.cache.get_stale('movie/1?'), (b'{"id": 1}', {'etag': '"abc"'}))
+
+        self.cache.renew('movie/1?', b'{"id": 1}', 60, {'etag': '"abc"'})
+
+        self.assertEqual(self.cache.get('movie/1?'), b'{"id": 1}')
+        self.assertEqual(self.cache.get_statistics()['revalidations'], 1)
+
+    def test_entries_without_validators(self):
+        self.cache.set('movie/1?', b'{"id": 1}', 60)
+
+        self.assertEqual(self.cache.get_stale('movie/1?'), (b'{"id": 1}', None))
+        self.assertIsNone(self.cache.get_stale('movie/2?'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for name in 'abc':
+            self.cache.set(name, BODY, 60)
+
+        self.cache.get('a')
+        self.cache.set('d', BODY, 60)
+
+        self.assertEqual([name for name in 'abcd' if self.cache.get(name) is not None], ['a', 'c', 'd'])
+        self.assertEqual(self.cache.get_statistics()['evictions'], 1)
+        self.assertLessEqual(self.cache.get_statistics()['size'], self.cache.max_size)
+
+    def test_replaced_entries_are_not_counted_twice(self):
+        for _ in range(10):
+            self.cache.set('a', BODY, 60)
+
+        self.assertEqual(self.cache.get_statistics()['evictions'], 0)
+        self.assertEqual(self.cache.get('a'), BODY)
+
+    def test_entries_that_are_not_stored(self):
+        self.cache.set('a', BODY * 10, 60)
+        self.cache.set('b', BODY, 0)
+
+        self.assertIsNone(self.cache.get_stale('a'))
+        self.assertIsNone(self.cache.get_stale('b'))
+
+    def test_clear(self):
+        self.cache.set('a', BODY, 60)
+        self.cache.clear()
+
+        self.assertIsNone(self.cache.get_stale('a'))
+        self.assertEqual(self.cache.get_statistics()['size'], 0)
+
+class MemoryCacheTests(CacheTests, unittest.TestCase):
+    """
+    The MemoryCache tests.
+    """
+
+    def make_cache(self, **kwargs):
+        return cache.MemoryCache(max_size=350, **kwargs)
+
+class DiskCacheTests(CacheTests, unittest.TestCase):
+    """
+    The DiskCache tests.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        super(DiskCacheTests, self).setUp()
+
+    def make_cache(self, **kwargs):
+        # The entry files start with a header line.
+        return cache.DiskCache(self.directory, max_size=400, **kwargs)
+
+    def test_entries_survive_a_restart(self):
+        self.cache.set('a', BODY, 60, {'last-modified': 'Sat, 01 Jan 2000 00:00:00 GMT'})
+        self.cache.set('b', b'{"id": 2}', 60)
+
+        disk_cache = self.make_cache()
+
+        self.assertEqual(disk_cache.get('b'), b'{"id": 2}')
+        self.assertEqual(disk_cache.get_stale('a'), (BODY, {'last-modified': 'Sat, 01 Jan 2000 00:00:00 GMT'}))
+        self.assertEqual(disk_cache.get_statistics()['size'], self.cache.get_statistics()['size'])
+
+    def test_recency_survives_a_restart(self):
+        for index, name in enumerate('abc'):
+            self.cache.set(name, BODY, 60)
+            path = os.path.join(self.directory, self.cache._get_filename(name))
+            os.utime(path, (1000 + index, 1000 + index))
+
+        os.utime(os.path.join(self.directory, self.cache._get_filename('a')), (2000, 2000))
+
+        disk_cache = self.make_cache()
+        disk_cache.set('d', BODY, 60)
+
+        self.assertEqual([name for name in 'abcd' if disk_cache.get(name) is not None], ['a', 'c', 'd'])
+
+    def test_unreadable_entries_are_removed(self):
+        self.cache.set('a', BODY, 60)
+        path = os.path.join(self.directory, self.cache._get_filename('a'))
+
+        with open(path, 'wb') as cache_file:
+            cache_file.write(b'garbage\n')
+
+        self.assertIsNone(self.cache.get('a'))
+        self.assertFalse(os.path.exists(path))
+
+class CacheKeyTests(unittest.TestCase):
+    """
+    The cache key and TTL tests.
+    """
+
+    def test_cache_keys_ignore_the_api_key(self):
+        self.assertEqual(cache.make_cache_key('movie/550', {'language': 'fr', 'api_key': 'secret', 'a': 1}), 'movie/550?a=1&language=fr')
+
+    def test_ttls(self):
+        memory_cache = cache.MemoryCache(default_ttl=10, ttls=dict(cache.DEFAULT_TTLS, **{'movie/*/images': 5}))
+
+        self.assertEqual(memory_cache.get_ttl('authentication/token/new'), 0)
+        self.assertEqual(memory_cache.get_ttl('movie/latest'), 60)
+        self.assertEqual(memory_cache.get_ttl('movie/550/images'), 5)
+        self.assertEqual(memory_cache.get_ttl('movie/550'), 10)
+
+if __name__ == '__main__':
+    unittest.main()
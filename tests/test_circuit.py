@@ -0,0 +1,104 @@
+"""
+The circuit breaker tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import circuit, methods
+
+import sys
+import time
+import unittest
+
+ENDPOINT = 'movie/{id}'
+
+class _InterruptedTransport(object):
+    """
+    A transport whose requests are interrupted.
+    """
+
+    def request(self, url, headers=None):
+        raise KeyboardInterrupt()
+
+class CircuitBreakerTests(unittest.TestCase):
+    """
+    The CircuitBreaker tests.
+    """
+
+    def setUp(self):
+        self.circuit_breaker = circuit.CircuitBreaker(failure_threshold=2, reset_timeout=0.01)
+
+    def fail(self, count):
+        for _ in range(count):
+            self.circuit_breaker.acquire(ENDPOINT)
+            self.circuit_breaker.record(ENDPOINT, True)
+
+    def test_failures_open_the_circuit(self):
+        self.fail(2)
+
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.OPEN)
+        self.assertRaises(circuit.CircuitOpenError, self.circuit_breaker.acquire, ENDPOINT)
+
+    def test_a_successful_probe_closes_the_circuit(self):
+        self.fail(2)
+        time.sleep(0.02)
+        self.circuit_breaker.acquire(ENDPOINT)
+
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.HALF_OPEN)
+        self.assertRaises(circuit.CircuitOpenError, self.circuit_breaker.acquire, ENDPOINT)
+
+        self.circuit_breaker.record(ENDPOINT, False)
+
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.CLOSED)
+
+    def test_a_released_probe_can_be_sent_again(self):
+        self.fail(2)
+        time.sleep(0.02)
+        self.circuit_breaker.acquire(ENDPOINT)
+        self.circuit_breaker.release(ENDPOINT)
+        self.circuit_breaker.acquire(ENDPOINT)
+
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.HALF_OPEN)
+
+class CancelledProbeTests(APITestCase):
+    """
+    The tests of a probe request that is cancelled.
+    """
+
+    server_options = {'latency': 0.3}
+
+    def setUp(self):
+        super(CancelledProbeTests, self).setUp()
+
+        self.circuit_breaker = circuit.CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        circuit.set_circuit_breaker(self.circuit_breaker)
+        self.circuit_breaker.acquire(ENDPOINT)
+        self.circuit_breaker.record(ENDPOINT, True)
+        time.sleep(0.02)
+
+    def test_interrupted_probes_are_released(self):
+        self.assertRaises(KeyboardInterrupt, methods.make_request, 'movie/550', transport=_InterruptedTransport())
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.HALF_OPEN)
+        self.assertEqual(methods.get_movie(550)['id'], 550)
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.CLOSED)
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'The asyncio API needs Python 3.5')
+    def test_cancelled_probes_are_released(self):
+        import asyncio
+
+        from pythemoviedb.api import aio
+
+        # The single flight shields the requests from the cancellation of their callers.
+        self.addCleanup(aio.set_single_flight, aio.get_single_flight())
+        aio.set_single_flight(None)
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        self.assertRaises(asyncio.TimeoutError, loop.run_until_complete, asyncio.wait_for(aio.get_movie(550), 0.05))
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.HALF_OPEN)
+        self.assertEqual(loop.run_until_complete(aio.get_movie(550))['id'], 550)
+        self.assertEqual(self.circuit_breaker.get_state(ENDPOINT), circuit.CLOSED)
+
+if __name__ == '__main__':
+    unittest.main()
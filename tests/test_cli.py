@@ -0,0 +1,139 @@
+"""
+The command-line interface tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb import cli
+from pythemoviedb.api import titles, transport
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+FIGHT_CLUB = {'id': 550, 'title': 'Fight Club', 'original_title': 'Fight Club', 'release_date': '1999-10-15'}
+
+class CommandTests(APITestCase):
+    """
+    The subcommand tests.
+    """
+
+    def setUp(self):
+        super(CommandTests, self).setUp()
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.output = os.path.join(self.directory, 'output.jsonl')
+
+        # The commands replace the shared transport with their own.
+        self.addCleanup(lambda: transport.get_transport(self.server.url).close())
+
+        self.addCleanup(titles.set_title_index, titles.get_title_index())
+        self.index = titles.TitleIndex()
+        self.index.add_movie(FIGHT_CLUB)
+        titles.set_title_index(self.index)
+
+        for name in ('stdout', 'stderr'):
+            self.addCleanup(setattr, sys, name, getattr(sys, name))
+            setattr(sys, name, StringIO())
+
+    def create_files(self, *file_names):
+        """
+        Create empty files in the test directory.
+        """
+
+        for file_name in file_names:
+            open(os.path.join(self.directory, file_name), 'w').close()
+
+    def read_output(self):
+        """
+        Read the JSON Lines output file.
+        """
+
+        with open(self.output) as output_file:
+            return [json.loads(line) for line in output_file]
+
+    def test_fetch(self):
+        ids_path = os.path.join(self.directory, 'ids.txt')
+
+        with open(ids_path, 'w') as ids_file:
+            ids_file.write('3\n4\n')
+
+        status = cli.main(['fetch', '--processes', '1', '--output', self.output, '--ids-file', ids_path, '1', '2'])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(record['id'] for record in self.read_output()), [1, 2, 3, 4])
+        self.assertIn('4 written, 0 skipped, 0 failed', sys.stderr.getvalue())
+
+    def test_changes(self):
+        status = cli.main(['changes', '--processes', '1', '--output', self.output, '--kind', 'movie', '--start-date', '2024-01-01', '--stop-date', '2024-01-02'])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(record['id'] for record in self.read_output()), list(range(300)))
+
+    def test_scan(self):
+        self.create_files('Fight.Club.1999.1080p.BluRay.x264.mkv', 'fight club (1999).avi', 'Unknown.Movie.2001.mp4', 'notes.txt')
+
+        status = cli.main(['scan', self.directory, '--output', self.output])
+        records = dict((os.path.basename(record['path']), record) for record in self.read_output())
+
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(records), ['Fight.Club.1999.1080p.BluRay.x264.mkv', 'Unknown.Movie.2001.mp4', 'fight club (1999).avi'])
+        self.assertEqual(records['fight club (1999).avi']['match']['id'], 550)
+        self.assertEqual(records['Fight.Club.1999.1080p.BluRay.x264.mkv']['match']['id'], 550)
+        self.assertIsNone(records['Unknown.Movie.2001.mp4']['match'])
+        self.assertIn('2 matched, 1 unmatched', sys.stderr.getvalue())
+
+        # The two Fight Club files are matched once, from the index.
+        self.assertEqual(self.index.get_statistics()['hits'], 1)
+
+    def test_rename_dry_run(self):
+        self.create_files('fight.club.1999.720p.mkv')
+
+        status = cli.main(['rename', self.directory])
+
+        self.assertEqual(status, 0)
+        self.assertIn('Fight Club (1999).mkv', sys.stdout.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'fight.club.1999.720p.mkv')))
+
+    def test_rename(self):
+        self.create_files('fight.club.1999.720p.mkv')
+
+        status = cli.main(['rename', self.directory, '--apply'])
+
+        self.assertEqual(status, 0)
+        self.assertEqual(os.listdir(self.directory), ['Fight Club (1999).mkv'])
+
+class RenamePlanTests(unittest.TestCase):
+    """
+    The get_file_name and plan_renames tests.
+    """
+
+    def test_get_file_name(self):
+        self.assertEqual(cli.get_file_name({'title': 'Face/Off: Part 2?', 'year': 1997}, '.mkv'), 'FaceOff Part 2 (1997).mkv')
+        self.assertEqual(cli.get_file_name({'title': 'Memento', 'year': None}, '.avi'), 'Memento.avi')
+
+    def test_plan_renames(self):
+        match = {'title': 'Fight Club', 'year': 1999}
+        matches = [
+            ('/movies/b.mkv', 'b', None, match),
+            ('/movies/a.mkv', 'a', None, match),
+            ('/movies/c.mkv', 'c', None, None),
+            ('/movies/Fight Club (1999).mkv', 'Fight Club', 1999, match),
+        ]
+
+        renames, skipped = cli.plan_renames(matches)
+
+        self.assertEqual(renames, [('/movies/a.mkv', '/movies/Fight Club (1999).mkv')])
+        self.assertEqual(skipped, [('/movies/b.mkv', 'conflicts with /movies/Fight Club (1999).mkv'), ('/movies/c.mkv', 'no match')])
+
+if __name__ == '__main__':
+    unittest.main()
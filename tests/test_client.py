@@ -0,0 +1,169 @@
+"""
+The API client and key rotation tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import client, methods, ratelimit
+from pythemoviedb.api.error import APIError
+from pythemoviedb.api.transport import Response
+
+import json
+import time
+import unittest
+
+def make_response(status, headers=None, data=None):
+    """
+    Make a transport response.
+    """
+
+    return Response(status, '', headers or {}, json.dumps(data).encode('utf-8') if data is not None else b'')
+
+class APIKeyTests(unittest.TestCase):
+    """
+    The APIKey tests.
+    """
+
+    def test_keys_are_not_disclosed(self):
+        key = client.APIKey('0123456789abcdef')
+
+        self.assertEqual(repr(key), '<APIKey 0123...>')
+        self.assertEqual(key.get_statistics()['key'], '0123...')
+
+    def test_throttled_keys_rest(self):
+        key = client.APIKey('key1')
+
+        self.assertTrue(key.report(make_response(429, {'retry-after': '30'})))
+        self.assertTrue(29 <= key.get_delay() <= 30)
+        self.assertTrue(29 <= key.reserve() <= 30)
+        self.assertEqual(key.get_statistics()['throttled'], 1)
+
+    def test_the_cooldown_doubles(self):
+        key = client.APIKey('key1', cooldown=10, max_cooldown=25)
+
+        for expected in (10, 20, 25):
+            key.available_at = 0.0
+            key.report(make_response(429))
+
+            self.assertAlmostEqual(key.get_delay(), expected, places=0)
+
+        key.report(make_response(200))
+        key.available_at = 0.0
+        key.report(make_response(429))
+
+        self.assertAlmostEqual(key.get_delay(), 10, places=0)
+
+    def test_invalid_keys_are_disabled(self):
+        key = client.APIKey('key1')
+
+        self.assertTrue(key.report(make_response(401, data={'status_code': APIError.INVALID_API_KEY, 'status_message': 'Invalid API key'})))
+        self.assertTrue(key.disabled)
+        self.assertEqual(key.disabled_reason, 'Invalid API key')
+
+    def test_other_failures_are_not_the_fault_of_the_key(self):
+        key = client.APIKey('key1')
+
+        self.assertFalse(key.report(make_response(401, data={'status_code': 3, 'status_message': 'Authentication failed'})))
+        self.assertFalse(key.report(make_response(503)))
+        self.assertFalse(key.report(error=IOError()))
+        self.assertFalse(key.disabled)
+        self.assertEqual(key.get_statistics()['errors'], 2)
+
+class ClientTests(unittest.TestCase):
+    """
+    The Client tests.
+    """
+
+    def test_parse_api_keys(self):
+        self.assertEqual(client.parse_api_keys(' key1, key2,,'), ['key1', 'key2'])
+        self.assertEqual(client.parse_api_keys(None), [])
+
+    def test_from_environment(self):
+        environ = {'PYTHEMOVIEDB_API_KEY': 'key1,key2', 'PYTHEMOVIEDB_KEY_RATE_LIMIT': '40'}
+        api_client = client.Client.from_environment(environ)
+
+        self.assertEqual([key.key for key in api_client.keys], ['key1', 'key2'])
+        self.assertEqual(api_client.keys[0].rate_limiter.rate, 40)
+
+    def test_keys_are_rotated(self):
+        api_client = client.Client(['key1', 'key2', 'key3'])
+
+        self.assertEqual([api_client.reserve()[0].key for _ in range(4)], ['key1', 'key2', 'key3', 'key1'])
+
+    def test_the_key_that_waits_the_least_is_chosen(self):
+        api_client = client.Client(['key1', 'key2', 'key3'])
+        now = time.time()
+
+        for key, rest in zip(api_client.keys, (30, 10, 20)):
+            key.available_at = now + rest
+
+        key, delay = api_client.reserve()
+
+        self.assertEqual(key.key, 'key2')
+        self.assertTrue(9 <= delay <= 10)
+
+    def test_disabled_keys_are_skipped(self):
+        api_client = client.Client(['key1', 'key2'])
+        api_client.keys[0].disabled = True
+
+        self.assertEqual([api_client.reserve()[0].key for _ in range(2)], ['key2', 'key2'])
+
+        api_client.keys[1].disabled = True
+
+        with self.assertRaises(RuntimeError):
+            api_client.reserve()
+
+    def test_no_keys(self):
+        with self.assertRaises(RuntimeError):
+            client.Client([]).reserve()
+
+    def test_report_only_rotates_to_usable_keys(self):
+        api_client = client.Client(['key1'])
+
+        self.assertFalse(api_client.report(api_client.keys[0], make_response(429)))
+
+class KeyRotationTestCase(APITestCase):
+    """
+    A test case whose requests are made with two keys.
+    """
+
+    def setUp(self):
+        super(KeyRotationTestCase, self).setUp()
+
+        self.client = client.Client(['key1', 'key2'], base_url=self.server.url)
+        client.set_client(self.client)
+
+class KeyRotationTests(KeyRotationTestCase):
+    """
+    The tests of requests made with several keys.
+    """
+
+    def test_requests_are_spread_across_the_keys(self):
+        for _id in range(1, 5):
+            methods.get_movie(_id)
+
+        self.assertEqual([event.api_key for event in self.events], ['key1...', 'key2...', 'key1...', 'key2...'])
+        self.assertEqual([statistics['requests'] for statistics in self.client.get_statistics()], [2, 2])
+
+    def test_client_functions(self):
+        self.assertEqual(self.client.get_movie(550)['id'], 550)
+        self.assertEqual(self.events[-1].api_key, 'key1...')
+
+class ThrottledKeyRotationTests(KeyRotationTestCase):
+    """
+    The tests of requests made with several keys against a server that throttles every request.
+    """
+
+    server_options = {'throttle_rate': 1.0}
+
+    def test_throttled_requests_are_retried_with_the_other_keys(self):
+        ratelimit.set_retry_policy(None)
+
+        with self.assertRaises(APIError):
+            methods.get_movie(550)
+
+        # Each key is tried, then the one that rests the least once more.
+        self.assertEqual([statistics['throttled'] for statistics in self.client.get_statistics()], [2, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+The compression and conditional requests tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import cache, methods
+
+import time
+import unittest
+
+class CompressionTests(APITestCase):
+    """
+    The tests against a server that compresses its responses.
+    """
+
+    def test_responses_are_decompressed(self):
+        self.assertEqual(methods.get_movie(550)['id'], 550)
+
+        event = self.events[-1]
+
+        self.assertLess(event.wire_bytes, event.response_bytes)
+
+class UncompressedTests(APITestCase):
+    """
+    The tests against a server that does not compress its responses.
+    """
+
+    server_options = {'compression': False}
+
+    def test_responses_are_not_compressed(self):
+        self.assertEqual(methods.get_movie(550)['id'], 550)
+
+        event = self.events[-1]
+
+        self.assertEqual(event.wire_bytes, event.response_bytes)
+
+class ConditionalRequestTests(APITestCase):
+    """
+    The tests against a server that sends validators.
+    """
+
+    def setUp(self):
+        super(ConditionalRequestTests, self).setUp()
+
+        self.cache = cache.MemoryCache(default_ttl=0.05, ttls={})
+        cache.set_cache(self.cache)
+
+    def test_expired_entries_are_revalidated(self):
+        first = methods.get_movie(550)
+        time.sleep(0.1)
+        second = methods.get_movie(550)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.not_modified, 1)
+        self.assertEqual([bool(event.revalidated) for event in self.events], [False, True])
+        self.assertEqual(self.cache.get_statistics()['revalidations'], 1)
+        self.assertLess(self.events[-1].wire_bytes, self.events[0].wire_bytes)
+
+    def test_fresh_entries_are_not_requested(self):
+        methods.get_movie(550)
+        methods.get_movie(550)
+
+        self.assertEqual(self.server.not_modified, 0)
+        self.assertEqual([event.cache for event in self.events], ['miss', 'hit'])
+
+class NoValidatorsTests(ConditionalRequestTests):
+    """
+    The tests against a server that sends no validators.
+    """
+
+    server_options = {'validators': False}
+
+    # Without validators, expired entries are requested again.
+    def test_expired_entries_are_revalidated(self):
+        methods.get_movie(550)
+        time.sleep(0.1)
+        methods.get_movie(550)
+
+        self.assertEqual(self.server.not_modified, 0)
+        self.assertEqual([bool(event.revalidated) for event in self.events], [False, False])
+        self.assertEqual(self.cache.get_statistics()['revalidations'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
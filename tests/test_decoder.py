@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+The response decoder tests.
+"""
+
+from pythemoviedb.api import decoder
+
+import json
+import unittest
+
+BODY = u'{"id": 550, "title": "Fight Club é 日本", "casts": {"cast": [{"id": 819}], "crew": []}, "genres": [{"id": 18}], "vote": 8.4, "adult": false, "video": null}'.encode('utf-8')
+
+class DecoderTests(object):
+    """
+    The tests shared by the decoder classes.
+    """
+
+    decoder_class = None
+
+    def setUp(self):
+        if not self.decoder_class.is_available():
+            self.skipTest('The %s decoder is not installed' % self.decoder_class.name)
+
+        self.decoder = self.decoder_class()
+        self.expected = json.loads(BODY.decode('utf-8'))
+
+    def test_loads(self):
+        self.assertEqual(self.decoder.loads(BODY), self.expected)
+
+    def test_loads_memoryview(self):
+        self.assertEqual(self.decoder.loads(memoryview(BODY)), self.expected)
+        self.assertEqual(self.decoder.loads(memoryview(b'  ' + BODY)[2:]), self.expected)
+
+    def test_projection(self):
+        self.assertEqual(self.decoder.decode(BODY, ['id', 'casts.cast', 'genres.id', 'missing']), {
+            'id': 550,
+            'casts': {'cast': [{'id': 819}]},
+            'genres': [{'id': 18}],
+        })
+
+    def test_projection_of_a_list(self):
+        self.assertEqual(self.decoder.decode(b'[1, 2]', ['id']), [1, 2])
+
+    def test_invalid_bodies(self):
+        for body in (b'{"id": ', b'', b'\xff'):
+            self.assertRaises(ValueError, self.decoder.decode, body)
+
+class JSONDecoderTests(DecoderTests, unittest.TestCase):
+    decoder_class = decoder.JSONDecoder
+
+class UJSONDecoderTests(DecoderTests, unittest.TestCase):
+    decoder_class = decoder.UJSONDecoder
+
+class ORJSONDecoderTests(DecoderTests, unittest.TestCase):
+    decoder_class = decoder.ORJSONDecoder
+
+class SIMDJSONDecoderTests(DecoderTests, unittest.TestCase):
+    decoder_class = decoder.SIMDJSONDecoder
+
+class ProjectionTests(unittest.TestCase):
+    """
+    The projection function tests.
+    """
+
+    def test_parse_fields(self):
+        self.assertEqual(decoder.parse_fields(['id', 'casts.cast', 'casts', 'a.b.c', 'a.d']), {
+            'id': None,
+            'casts': None,
+            'a': {'b': {'c': None}, 'd': None},
+        })
+        self.assertEqual(decoder.parse_fields(['casts', 'casts.cast']), {'casts': None})
+
+    def test_project(self):
+        data = {'id': 1, 'casts': {'cast': [], 'crew': []}, 'title': 'x'}
+
+        self.assertEqual(decoder.project(data, decoder.parse_fields(['casts.crew', 'title'])), {'casts': {'crew': []}, 'title': 'x'})
+
+class CreateDecoderTests(unittest.TestCase):
+    """
+    The create_decoder and set_decoder tests.
+    """
+
+    def test_named_decoders(self):
+        self.assertIsInstance(decoder.create_decoder('json'), decoder.JSONDecoder)
+        self.assertRaises(ValueError, decoder.create_decoder, 'yaml')
+
+    def test_default_decoder(self):
+        default_decoder = decoder.create_decoder()
+        available = [decoder_class.name for decoder_class in decoder.DECODERS if decoder_class.is_available()]
+
+        self.assertEqual(default_decoder.name, available[0])
+        self.assertEqual(default_decoder.decode(BODY, ['id']), {'id': 550})
+
+        if decoder.SIMDJSONDecoder.is_available() and available[0] != 'simdjson':
+            self.assertIsInstance(default_decoder, decoder.ProjectionDecoder)
+
+    def test_set_decoder(self):
+        self.addCleanup(decoder.set_decoder, decoder.get_decoder())
+        decoder.set_decoder('json')
+
+        self.assertIsInstance(decoder.get_decoder(), decoder.JSONDecoder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+The name dictionary tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import dictionary, ratelimit
+
+import os
+import shutil
+import tempfile
+import unittest
+
+class NameDictionaryTests(APITestCase):
+    """
+    The NameDictionary tests.
+    """
+
+    def setUp(self):
+        super(NameDictionaryTests, self).setUp()
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'names.gz')
+
+    def test_genres_are_loaded_in_bulk(self):
+        names = dictionary.NameDictionary(path=None)
+
+        self.assertEqual(names.resolve('genre', [28, 12, 16]), ['Action', 'Adventure', 'Animation'])
+        self.assertEqual(names.get_name('genre', 12), 'Adventure')
+        self.assertIsNone(names.get_name('genre', 1))
+        self.assertEqual(names.requests, 1)
+
+    def test_genres_are_loaded_per_language(self):
+        names = dictionary.NameDictionary(path=None)
+        names.resolve('genre', [28])
+        names.resolve('genre', [28], language='fr')
+        names.resolve('genre', [28], language='fr')
+
+        self.assertEqual(names.requests, 2)
+
+    def test_names_are_fetched_once(self):
+        names = dictionary.NameDictionary(path=None, concurrency=4)
+
+        self.assertEqual(names.resolve('keyword', [1, 2, 3]), ['keyword 1', 'keyword 2', 'keyword 3'])
+        self.assertEqual(names.resolve('keyword', [3, 2, 4]), ['keyword 3', 'keyword 2', 'keyword 4'])
+        self.assertEqual(names.get_name('company', 1), 'company 1')
+        self.assertEqual(names.requests, 5)
+        self.assertEqual(len(self.events), 5)
+
+    def test_unknown_kinds_are_rejected(self):
+        names = dictionary.NameDictionary(path=None)
+
+        with self.assertRaises(ValueError):
+            names.resolve('network', [1])
+
+    def test_names_are_persisted(self):
+        names = dictionary.NameDictionary(path=self.path)
+        names.resolve('genre', [28], language='fr')
+        names.resolve('company', [7])
+        names.save()
+
+        # The dictionary is loaded from its file: no request is made.
+        names = dictionary.NameDictionary(path=self.path)
+
+        self.assertEqual(names.resolve('genre', [28], language='fr'), ['Action'])
+        self.assertEqual(names.resolve('company', [7]), ['company 7'])
+        self.assertEqual(names.requests, 0)
+
+    def test_unmodified_dictionaries_are_not_saved(self):
+        names = dictionary.NameDictionary(path=self.path)
+        names.save()
+
+        self.assertFalse(os.path.exists(self.path))
+
+class MissingNameTests(APITestCase):
+    """
+    The tests against a server that fails every request.
+    """
+
+    server_options = {'throttle_rate': 1.0}
+
+    def test_missing_names_are_not_fetched_again(self):
+        ratelimit.set_retry_policy(None)
+        names = dictionary.NameDictionary(path=None)
+
+        self.assertEqual(names.resolve('keyword', [1, 2]), [None, None])
+        self.assertEqual(names.resolve('keyword', [1, 2]), [None, None])
+        self.assertEqual(names.requests, 2)
+
+if __name__ == '__main__':
+    unittest.main()
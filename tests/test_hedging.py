@@ -0,0 +1,153 @@
+"""
+The request hedging tests.
+"""
+
+from pythemoviedb.api import hedging, ratelimit
+from pythemoviedb.api.transport import RequestCancelled, Response
+
+import sys
+import time
+import unittest
+
+class StubTransport(object):
+    """
+    A transport whose first request is slow, and whose next requests answer at once with a given status.
+    """
+
+    def __init__(self, hedge_status, latency=0.3):
+        self.hedge_status = hedge_status
+        self.latency = latency
+        self.requests = 0
+        self.cancelled = False
+
+    def is_saturated(self):
+        return False
+
+    def request(self, url, headers=None, cancellation=None):
+        self.requests += 1
+
+        if self.requests > 1:
+            return Response(self.hedge_status, 'Hedge', {}, b'hedge')
+
+        deadline = time.time() + self.latency
+
+        while time.time() < deadline:
+            if cancellation is not None and cancellation.cancelled:
+                self.cancelled = True
+
+                raise RequestCancelled()
+
+            time.sleep(0.005)
+
+        return Response(200, 'OK', {}, b'primary')
+
+class AsyncStubTransport(StubTransport):
+    """
+    The asyncio counterpart of StubTransport.
+    """
+
+    def __init__(self, loop, hedge_status, latency=0.3):
+        super(AsyncStubTransport, self).__init__(hedge_status, latency)
+
+        self.loop = loop
+
+    def request(self, url, headers=None):
+        self.requests += 1
+        future = self.loop.create_future()
+
+        if self.requests > 1:
+            future.set_result(Response(self.hedge_status, 'Hedge', {}, b'hedge'))
+        else:
+            self.loop.call_later(self.latency, lambda: future.done() or future.set_result(Response(200, 'OK', {}, b'primary')))
+
+        return future
+
+class HedgePolicyTests(unittest.TestCase):
+    """
+    The HedgePolicy tests.
+    """
+
+    def setUp(self):
+        self.addCleanup(ratelimit.set_rate_limiter, ratelimit.get_rate_limiter())
+        ratelimit.set_rate_limiter(None)
+
+        self.hedge_policy = hedging.HedgePolicy(delay=0.05, budget=1.0)
+        self.measurements = {}
+
+    def test_fast_requests_are_not_hedged(self):
+        transport = StubTransport(200, latency=0.0)
+        response = self.hedge_policy.request(transport, 'movie/{id}', 'http://localhost/3/movie/1', measurements=self.measurements)
+
+        time.sleep(0.1)
+
+        self.assertEqual(response.body, b'primary')
+        self.assertEqual(transport.requests, 1)
+        self.assertEqual(self.measurements, {})
+
+    def test_a_successful_hedge_wins(self):
+        transport = StubTransport(200)
+        response = self.hedge_policy.request(transport, 'movie/{id}', 'http://localhost/3/movie/1', measurements=self.measurements)
+
+        self.assertEqual(response.body, b'hedge')
+        self.assertTrue(transport.cancelled)
+        self.assertEqual(self.measurements, {'hedge': 'won'})
+        self.assertEqual(self.hedge_policy.get_statistics()['wins'], 1)
+
+    def test_a_failed_hedge_does_not_cancel_the_request(self):
+        for status in (429, 503):
+            transport = StubTransport(status)
+            response = self.hedge_policy.request(transport, 'movie/{id}', 'http://localhost/3/movie/1', measurements=self.measurements)
+
+            self.assertEqual(transport.requests, 2)
+            self.assertEqual(response.body, b'primary')
+            self.assertFalse(transport.cancelled)
+            self.assertEqual(self.measurements, {'hedge': 'lost'})
+
+        self.assertEqual(self.hedge_policy.get_statistics()['wins'], 0)
+
+@unittest.skipIf(sys.version_info < (3, 5), 'The asyncio API needs Python 3.5')
+class AsyncHedgeTests(HedgePolicyTests):
+    """
+    The tests of the asyncio hedged requests.
+    """
+
+    def setUp(self):
+        super(AsyncHedgeTests, self).setUp()
+
+        import asyncio
+
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def request(self, hedge_status, latency=0.3):
+        from pythemoviedb.api import aio
+
+        transport = AsyncStubTransport(self.loop, hedge_status, latency)
+        response = self.loop.run_until_complete(aio.hedged_request(self.hedge_policy, transport, 'movie/{id}', 'http://localhost/3/movie/1', measurements=self.measurements))
+
+        return transport, response
+
+    def test_fast_requests_are_not_hedged(self):
+        transport, response = self.request(200, latency=0.0)
+
+        self.assertEqual(response.body, b'primary')
+        self.assertEqual(transport.requests, 1)
+
+    def test_a_successful_hedge_wins(self):
+        transport, response = self.request(200)
+
+        self.assertEqual(response.body, b'hedge')
+        self.assertEqual(self.measurements, {'hedge': 'won'})
+
+    def test_a_failed_hedge_does_not_cancel_the_request(self):
+        for status in (429, 503):
+            transport, response = self.request(status)
+
+            self.assertEqual(transport.requests, 2)
+            self.assertEqual(response.body, b'primary')
+            self.assertEqual(self.measurements, {'hedge': 'lost'})
+
+        self.assertEqual(self.hedge_policy.get_statistics()['wins'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+The API configuration and image URL tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import images
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+class APIConfigurationTests(APITestCase):
+    """
+    The APIConfiguration tests.
+    """
+
+    def setUp(self):
+        super(APIConfigurationTests, self).setUp()
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'configuration.json')
+
+    def test_the_configuration_is_fetched_once(self):
+        api_configuration = images.APIConfiguration(ttl=60, path=None)
+
+        first = api_configuration.get()
+        second = api_configuration.get()
+
+        self.assertIs(first, second)
+        self.assertIn('images', first)
+        self.assertEqual(api_configuration.refreshes, 1)
+        self.assertEqual(len(self.events), 1)
+
+    def test_expired_configurations_are_refreshed_in_the_background(self):
+        api_configuration = images.APIConfiguration(ttl=0.05, path=None)
+        first = api_configuration.get()
+        time.sleep(0.1)
+
+        # The expired configuration is returned while it is refreshed.
+        self.assertIs(api_configuration.get(), first)
+
+        deadline = time.time() + 5
+
+        while api_configuration.refreshes < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(api_configuration.refreshes, 2)
+        self.assertEqual(api_configuration.get(), first)
+
+    def test_the_configuration_is_persisted(self):
+        images.APIConfiguration(ttl=60, path=self.path).load()
+
+        with open(self.path) as configuration_file:
+            self.assertIn('images', json.load(configuration_file)['data'])
+
+        # A warm start makes no request.
+        api_configuration = images.APIConfiguration(ttl=60, path=self.path)
+
+        self.assertIn('images', api_configuration.load())
+        self.assertEqual(api_configuration.refreshes, 0)
+        self.assertEqual(len(self.events), 1)
+
+    def test_corrupt_persisted_configurations_are_ignored(self):
+        with open(self.path, 'w') as configuration_file:
+            configuration_file.write('{"fetched_at"')
+
+        api_configuration = images.APIConfiguration(ttl=60, path=self.path)
+
+        self.assertIn('images', api_configuration.load())
+        self.assertEqual(api_configuration.refreshes, 1)
+
+class ImageURLBuilderTests(APITestCase):
+    """
+    The ImageURLBuilder tests.
+    """
+
+    def setUp(self):
+        super(ImageURLBuilderTests, self).setUp()
+
+        self.builder = images.ImageURLBuilder(images.APIConfiguration(ttl=60, path=None)).load()
+
+    def test_get_url(self):
+        self.assertEqual(self.builder.get_url('/a.jpg', 'w92'), 'https://image.tmdb.org/t/p/w92/a.jpg')
+        self.assertIsNone(self.builder.get_url(None))
+
+    def test_insecure_urls(self):
+        builder = images.ImageURLBuilder(self.builder.api_configuration, secure=False)
+
+        self.assertEqual(builder.get_url('/a.jpg'), 'http://image.tmdb.org/t/p/original/a.jpg')
+
+    def test_get_best_size(self):
+        # poster_sizes: w92, w154, w185, w342, w500, w780 and original.
+        self.assertEqual(self.builder.get_best_size('poster', 1), 'w92')
+        self.assertEqual(self.builder.get_best_size('poster', 92), 'w92')
+        self.assertEqual(self.builder.get_best_size('poster', 300), 'w342')
+        self.assertEqual(self.builder.get_best_size('poster', 2000), 'original')
+
+    def test_height_based_sizes_are_ignored(self):
+        # profile_sizes: w45, w185, h632 and original.
+        self.assertEqual(self.builder.get_best_size('profile', 200), 'original')
+
+    def test_unknown_kinds_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.builder.get_best_size('banner', 300)
+
+    def test_get_best_url(self):
+        self.assertEqual(self.builder.get_best_url('backdrop', '/b.jpg', 700), 'https://image.tmdb.org/t/p/w780/b.jpg')
+        self.assertIsNone(self.builder.get_best_url('backdrop', None, 700))
+
+    def test_urls_are_built_without_requests(self):
+        for width in range(0, 1000, 10):
+            self.builder.get_best_url('poster', '/a.jpg', width)
+
+        self.assertEqual(len(self.events), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+The instrumentation tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import instrumentation, methods
+from pythemoviedb.api.error import APIError
+
+import unittest
+
+class InstrumentationTests(unittest.TestCase):
+    """
+    The instrumentation function tests.
+    """
+
+    def test_get_endpoint(self):
+        self.assertEqual(instrumentation.get_endpoint('movie/550/casts'), 'movie/{id}/casts')
+        self.assertEqual(instrumentation.get_endpoint('list/509ec17b19c2950a0600050d'), 'list/{id}')
+        self.assertEqual(instrumentation.get_endpoint('search/movie'), 'search/movie')
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(instrumentation.percentile(values, 0.5), 50)
+        self.assertEqual(instrumentation.percentile(values, 0.99), 99)
+        self.assertEqual(instrumentation.percentile(values, 1.0), 100)
+        self.assertEqual(instrumentation.percentile([7], 0.0), 7)
+
+    def test_unexpected_measurements(self):
+        self.assertRaises(TypeError, instrumentation.RequestEvent, 'movie/550', latency=1.0)
+
+    def test_failing_hooks_are_ignored(self):
+        events = []
+
+        def failing_hook(event):
+            raise RuntimeError('Broken hook')
+
+        for hook in (failing_hook, events.append):
+            instrumentation.add_hook(hook)
+            self.addCleanup(instrumentation.remove_hook, hook)
+
+        instrumentation.emit(instrumentation.RequestEvent('movie/550'))
+
+        self.assertEqual(len(events), 1)
+
+    def test_latency_aggregator(self):
+        aggregator = instrumentation.LatencyAggregator(max_samples=10)
+
+        for index in range(20):
+            aggregator(instrumentation.RequestEvent('movie/%s' % index, total_time=index / 100.0, error=None if index % 5 else IOError()))
+
+        statistics = aggregator.get_statistics()['movie/{id}']
+
+        self.assertEqual(statistics['count'], 20)
+        self.assertEqual(statistics['errors'], 4)
+        self.assertEqual(statistics['p50'], 0.14)
+        self.assertEqual(aggregator.get_percentile('movie/{id}', 0.99), 0.19)
+        self.assertIsNone(aggregator.get_percentile('person/{id}', 0.5))
+        self.assertIn('movie/{id}', aggregator.report())
+
+class RequestEventTests(APITestCase):
+    """
+    The tests of the events of the requests to the fake API server.
+    """
+
+    def test_events(self):
+        methods.get_movie(550)
+        methods.get_movie(551)
+
+        first, second = self.events
+
+        self.assertEqual(first.action, 'movie/550')
+        self.assertEqual(first.endpoint, 'movie/{id}')
+        self.assertEqual(first.status, 200)
+        self.assertEqual(first.retries, 0)
+        self.assertIsNotNone(first.connect_time)
+        self.assertIsNone(second.connect_time)
+
+        for event in self.events:
+            self.assertTrue(event.total_time >= event.ttfb > 0)
+            self.assertGreater(event.decode_time, 0)
+            self.assertGreater(event.response_bytes, 0)
+
+    def test_error_events(self):
+        self.assertRaises(APIError, methods.get_movie, 'unknown')
+
+        self.assertEqual(self.events[0].status, 404)
+        self.assertIsInstance(self.events[0].error, APIError)
+
+    def test_transfer_aggregator(self):
+        aggregator = instrumentation.TransferAggregator()
+        instrumentation.add_hook(aggregator)
+        self.addCleanup(instrumentation.remove_hook, aggregator)
+
+        methods.get_movie(550)
+        statistics = aggregator.get_statistics()
+
+        self.assertEqual(statistics['requests'], 1)
+        self.assertEqual(statistics['compression_saved_bytes'], statistics['response_bytes'] - statistics['wire_bytes'])
+        self.assertGreater(statistics['compression_saved_bytes'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
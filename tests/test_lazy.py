@@ -0,0 +1,102 @@
+"""
+The lazy resources tests.
+"""
+
+from pythemoviedb.api import lazy
+
+import threading
+import time
+import unittest
+
+class FlakyMovie(lazy.LazyMovie):
+    """
+    A movie whose first request fails.
+    """
+
+    calls = None
+
+    @classmethod
+    def get_resource(cls, _id, append_to_response=None, **parameters):
+        cls.calls.append(append_to_response)
+
+        if len(cls.calls) == 1:
+            raise IOError('The API is down')
+
+        return dict({'id': _id}, **dict((name, {'id': _id}) for name in append_to_response or ()))
+
+class RecordedMovie(lazy.LazyMovie):
+    """
+    A movie whose requests are recorded.
+    """
+
+    calls = None
+
+    @classmethod
+    def get_resource(cls, _id, append_to_response=None, **parameters):
+        cls.calls.append(append_to_response)
+
+        return dict({'id': _id}, **dict((name, {'id': _id}) for name in append_to_response or ()))
+
+class LazyResourceTests(unittest.TestCase):
+    """
+    The LazyResource tests.
+    """
+
+    def setUp(self):
+        FlakyMovie.calls = []
+        RecordedMovie.calls = []
+
+    def test_requests_are_batched_by_default(self):
+        self.assertGreater(lazy.DEFAULT_BATCH_WINDOW, 0)
+        self.assertEqual(RecordedMovie(550).batch_window, lazy.DEFAULT_BATCH_WINDOW)
+
+    def test_concurrent_accesses_share_a_request(self):
+        movie = RecordedMovie(550, learn=False, batch_window=0.1)
+        names = ['casts', 'images', 'keywords', 'releases']
+        threads = [threading.Thread(target=movie.load, args=(name,)) for name in names]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(RecordedMovie.calls, [names])
+
+    def test_no_batch_window(self):
+        movie = RecordedMovie(550, learn=False, batch_window=0)
+        movie.load('casts')
+
+        self.assertEqual(RecordedMovie.calls, [['casts']])
+
+    def test_waiters_load_their_names_after_a_failed_load(self):
+        movie = FlakyMovie(550, learn=False, batch_window=0.2)
+        errors = []
+
+        def load():
+            try:
+                movie.load('casts')
+            except IOError as ex:
+                errors.append(ex)
+
+        thread = threading.Thread(target=load)
+        thread.daemon = True
+        thread.start()
+
+        # Queue another name during the batch window, so that it is part of the failed request.
+        time.sleep(0.05)
+        waiter = threading.Thread(target=movie.load, args=('images',))
+        waiter.daemon = True
+        waiter.start()
+
+        thread.join(5)
+        waiter.join(5)
+
+        self.assertFalse(waiter.is_alive(), 'The waiting load did not finish')
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(FlakyMovie.calls, [['casts', 'images'], ['images']])
+        self.assertTrue(movie.is_loaded('images'))
+        self.assertFalse(movie.is_loaded('casts'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+The result model tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import methods, objects
+
+import datetime
+import sys
+import unittest
+
+class ModelTests(unittest.TestCase):
+    """
+    The Model tests.
+    """
+
+    def test_only_declared_fields_are_kept(self):
+        genre = objects.Genre({'id': 28, 'name': 'Action', 'unknown': True})
+
+        self.assertEqual((genre.id, genre.name), (28, 'Action'))
+        self.assertFalse(hasattr(genre, 'unknown'))
+        self.assertFalse(hasattr(genre, '__dict__'))
+
+    def test_missing_fields_are_none(self):
+        movie = objects.Movie({'id': 550})
+
+        self.assertIsNone(movie.title)
+        self.assertIsNone(movie.release_date)
+        self.assertIsNone(movie.genres)
+
+    def test_strings_are_interned(self):
+        first = objects.Crew({'job': u''.join([u'Dir', u'ector'])})
+        second = objects.Crew({'job': u''.join([u'Direc', u'tor'])})
+
+        self.assertIs(first.job, second.job)
+
+    def test_lazy_fields_are_decoded_once(self):
+        movie = objects.Movie({'id': 550, 'release_date': '1999-10-15', 'genres': [{'id': 18, 'name': 'Drama'}]})
+
+        self.assertEqual(movie.release_date, datetime.date(1999, 10, 15))
+        self.assertEqual(movie.genres[0].name, 'Drama')
+        self.assertIs(movie.genres, movie.genres)
+
+    def test_invalid_dates(self):
+        self.assertIsNone(objects.Person({'birthday': ''}).birthday)
+        self.assertIsNone(objects.Person({'birthday': 'soon'}).birthday)
+
+    def test_pages(self):
+        page = objects.Page({'page': 1, 'total_pages': 2, 'results': [{'id': 1}, {'id': 2}]}, objects.Movie)
+
+        self.assertEqual(len(page), 2)
+        self.assertEqual([movie.id for movie in page], [1, 2])
+        self.assertIsInstance(page.results[0], objects.Movie)
+
+class RequestModelTests(APITestCase):
+    """
+    The tests of the request functions that build models.
+    """
+
+    def test_dictionaries_are_returned_by_default(self):
+        self.assertIsInstance(methods.get_movie(550), dict)
+
+    def test_movie(self):
+        movie = methods.get_movie(550, append_to_response=['casts', 'similar_movies'], model=True)
+
+        self.assertIsInstance(movie, objects.Movie)
+        self.assertEqual(movie.id, 550)
+        self.assertIsInstance(movie.release_date, datetime.date)
+        self.assertIsInstance(movie.belongs_to_collection, objects.Collection)
+        self.assertEqual(movie.casts.cast[0].id, 1000)
+        self.assertEqual(movie.similar_movies.results[0].id, 600)
+
+    def test_other_entities(self):
+        self.assertIsInstance(methods.get_person(1, model=True), objects.Person)
+        self.assertEqual([movie.id for movie in methods.get_collection(10, model=True).parts][:2], [11, 12])
+        self.assertEqual(methods.get_company(3, model=True).name, 'company 3')
+        self.assertEqual(methods.get_keyword(4, model=True).name, 'keyword 4')
+        self.assertIsInstance(methods.get_movie_casts(550, model=True), objects.Credits)
+
+    def test_search(self):
+        page = methods.search_movie('Fight Club', model=True)
+
+        self.assertEqual(page.page, 1)
+        self.assertIsInstance(page.results[0], objects.Movie)
+
+    def test_models_and_fields(self):
+        movie = methods.get_movie(550, fields=['id', 'title'], model=True)
+
+        self.assertEqual(movie.id, 550)
+        self.assertIsNone(movie.overview)
+
+    def test_client_functions(self):
+        self.assertIsInstance(self.client.get_movie(550, model=True), objects.Movie)
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'The asyncio API needs Python 3.5')
+    def test_asyncio(self):
+        import asyncio
+
+        from pythemoviedb.api import aio
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        self.assertIsInstance(loop.run_until_complete(aio.get_movie(550, model=True)), objects.Movie)
+
+if __name__ == '__main__':
+    unittest.main()
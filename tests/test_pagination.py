@@ -0,0 +1,107 @@
+"""
+The pagination tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import pagination
+
+import datetime
+import threading
+import time
+import unittest
+
+class Pages(object):
+    """
+    A paginated request function over 5 pages of 3 results, that records the requested pages.
+    """
+
+    def __init__(self, total_pages=5, delay=0.0, failing_page=None):
+        self.total_pages = total_pages
+        self.delay = delay
+        self.failing_page = failing_page
+        self.pages = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, query, page=None):
+        with self.lock:
+            self.pages.append(page)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        try:
+            time.sleep(self.delay)
+
+            if page == self.failing_page:
+                raise IOError('Page %s failed' % page)
+
+            return {
+                'page': page,
+                'total_pages': self.total_pages,
+                'results': ['%s-%s-%s' % (query, page, index) for index in range(3)],
+            }
+
+        finally:
+            with self.lock:
+                self.running -= 1
+
+class IteratePagesTests(unittest.TestCase):
+    """
+    The iterate_pages tests.
+    """
+
+    def test_all_pages_are_iterated_in_order(self):
+        pages = Pages()
+        results = list(pagination.iterate_pages(pages, 'q'))
+
+        self.assertEqual(results, ['q-%s-%s' % (page, index) for page in range(1, 6) for index in range(3)])
+        self.assertEqual(sorted(pages.pages), [1, 2, 3, 4, 5])
+
+    def test_limits(self):
+        self.assertEqual(len(list(pagination.iterate_pages(Pages(), 'q', max_items=7))), 7)
+        self.assertEqual(list(pagination.iterate_pages(Pages(), 'q', max_items=0)), [])
+        self.assertEqual(len(list(pagination.iterate_pages(Pages(), 'q', max_pages=2))), 6)
+        self.assertEqual(list(pagination.iterate_pages(Pages(), 'q', first_page=5)), ['q-5-0', 'q-5-1', 'q-5-2'])
+
+    def test_pages_are_fetched_lazily(self):
+        pages = Pages(total_pages=100)
+        results = pagination.iterate_pages(pages, 'q', prefetch=2)
+
+        next(results)
+        time.sleep(0.05)
+
+        self.assertEqual(sorted(pages.pages), [1, 2, 3])
+
+    def test_prefetched_pages_are_bounded(self):
+        pages = Pages(total_pages=10, delay=0.01)
+        list(pagination.iterate_pages(pages, 'q', prefetch=3))
+
+        self.assertLessEqual(pages.max_running, 3)
+        self.assertEqual(sorted(pages.pages), list(range(1, 11)))
+
+    def test_errors_are_raised_in_order(self):
+        results = pagination.iterate_pages(Pages(failing_page=3), 'q')
+
+        self.assertEqual(len([next(results) for _ in range(6)]), 6)
+        self.assertRaises(IOError, next, results)
+
+class IteratorFunctionTests(APITestCase):
+    """
+    The tests of the iterator functions against the fake API server.
+    """
+
+    def test_iterator_functions(self):
+        self.assertIn('iter_search_movie', pagination.__all__)
+        self.assertNotIn('iter_get_movie', pagination.__all__)
+        self.assertEqual(pagination.iter_get_changed_movies.__name__, 'iter_get_changed_movies')
+
+    def test_changed_movies(self):
+        ids = [change['id'] for change in pagination.iter_get_changed_movies(start_date=datetime.date(2024, 1, 1))]
+
+        self.assertEqual(ids, list(range(300)))
+        self.assertEqual(len(self.events), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+The ingestion pipeline tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb import pipeline
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+class PipelineTests(APITestCase):
+    """
+    The Pipeline tests.
+    """
+
+    def setUp(self):
+        super(PipelineTests, self).setUp()
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'movies.jsonl')
+
+    def run_pipeline(self, transform=pipeline.default_transform, count=10):
+        """
+        Run a pipeline over movies in a thread, and fail if it does not finish in time.
+        """
+
+        sink = pipeline.JSONLinesSink(self.path)
+        items = [('movie', _id) for _id in range(1, count + 1)]
+        outcome = {}
+
+        def run():
+            try:
+                outcome['counts'] = pipeline.Pipeline(sink, transform=transform, fetch_concurrency=2, processes=2, queue_size=4).run(items)
+            finally:
+                sink.close()
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        thread.join(30)
+
+        self.assertFalse(thread.is_alive(), 'The pipeline did not finish')
+
+        return outcome['counts']
+
+    def test_records_are_written(self):
+        counts = self.run_pipeline()
+
+        with open(self.path) as f:
+            ids = sorted(json.loads(line)['id'] for line in f)
+
+        self.assertEqual(counts, {'written': 10, 'skipped': 0, 'failed': 0})
+        self.assertEqual(ids, list(range(1, 11)))
+
+    @unittest.skipIf(sys.version_info[0] < 3, 'Python 2 pools have no error callback')
+    def test_unpicklable_transforms_fail_the_entities(self):
+        counts = self.run_pipeline(transform=lambda kind, _id, data: data)
+
+        self.assertEqual(counts, {'written': 0, 'skipped': 0, 'failed': 10})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+The prefetching tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import cache, methods, prefetch
+
+import time
+import unittest
+
+MOVIE = {
+    'id': 550,
+    'belongs_to_collection': {'id': 10},
+    'casts': {'cast': [{'id': 3, 'order': 2}, {'id': 1, 'order': 0}, {'id': 2, 'order': 1}, {'id': 4, 'order': 3}]},
+    'similar_movies': {'results': [{'id': 600}, {'id': 601}, {'id': 602}, {'id': 603}]},
+}
+
+class RelatedTests(unittest.TestCase):
+    """
+    The get_related tests.
+    """
+
+    def test_movie(self):
+        related = prefetch.get_related('movie/550', {'language': 'fr'}, MOVIE)
+
+        self.assertEqual(related, [
+            ('collection/10', {'language': 'fr'}),
+            ('person/1', {}),
+            ('person/2', {}),
+            ('person/3', {}),
+            ('movie/600', {'language': 'fr'}),
+            ('movie/601', {'language': 'fr'}),
+            ('movie/602', {'language': 'fr'}),
+        ])
+
+    def test_limits(self):
+        related = prefetch.get_related('movie/550', None, MOVIE, max_people=1, max_movies=0)
+
+        self.assertEqual(related, [('collection/10', {'language': None}), ('person/1', {})])
+
+    def test_sub_resources(self):
+        self.assertEqual(prefetch.get_related('movie/550/casts', None, MOVIE['casts'], max_people=1), [('person/1', {})])
+        self.assertEqual(prefetch.get_related('movie/550/similar_movies', None, MOVIE['similar_movies'], max_movies=1), [('movie/600', {'language': None})])
+
+    def test_collection(self):
+        related = prefetch.get_related('collection/10', None, {'id': 10, 'parts': [{'id': 11}, {'id': 12}]})
+
+        self.assertEqual(related, [('movie/11', {'language': None}), ('movie/12', {'language': None})])
+
+    def test_unrelated(self):
+        self.assertEqual(prefetch.get_related('person/1', None, {'id': 1}), [])
+        self.assertEqual(prefetch.get_related('movie/550', None, None), [])
+
+class PrefetcherTests(APITestCase):
+    """
+    The Prefetcher tests.
+    """
+
+    def setUp(self):
+        super(PrefetcherTests, self).setUp()
+
+        cache.set_cache(cache.MemoryCache())
+
+    def wait(self, prefetcher):
+        """
+        Wait until the prefetcher has nothing left to do.
+        """
+
+        deadline = time.time() + 10
+
+        while prefetcher.get_statistics()['pending'] and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(prefetcher.get_statistics()['pending'], 0)
+
+    def test_related_entities_are_prefetched(self):
+        prefetcher = prefetch.Prefetcher(depth=1)
+        prefetch.set_prefetcher(prefetcher)
+
+        methods.get_movie(550)
+        self.wait(prefetcher)
+
+        self.assertEqual([event.prefetch for event in self.events], [None, True])
+
+        methods.get_collection(10)
+
+        self.assertEqual(self.events[-1].cache, 'hit')
+
+        statistics = prefetcher.get_statistics()
+
+        self.assertEqual((statistics['requests'], statistics['prefetched'], statistics['hits']), (2, 1, 1))
+        self.assertEqual(statistics['hit_rate'], 1.0)
+
+    def test_prefetches_are_limited_by_the_budget(self):
+        prefetcher = prefetch.Prefetcher(depth=1, budget=2.0)
+        prefetch.set_prefetcher(prefetcher)
+
+        methods.get_movie(550, append_to_response=['casts', 'similar_movies'])
+        self.wait(prefetcher)
+
+        statistics = prefetcher.get_statistics()
+
+        self.assertEqual((statistics['queued'], statistics['prefetched'], statistics['skipped']), (7, 2, 5))
+
+    def test_related_entities_of_prefetches_are_prefetched_up_to_the_depth(self):
+        prefetcher = prefetch.Prefetcher(depth=2, budget=10.0)
+        prefetch.set_prefetcher(prefetcher)
+
+        methods.get_movie(550)
+        self.wait(prefetcher)
+
+        # The collection, then its first three parts.
+        self.assertEqual(prefetcher.get_statistics()['prefetched'], 4)
+        self.assertEqual(sorted(event.endpoint for event in self.events), ['collection/{id}'] + ['movie/{id}'] * 4)
+
+    def test_nothing_is_prefetched_without_a_cache(self):
+        cache.set_cache(None)
+        prefetcher = prefetch.Prefetcher(depth=1)
+        prefetch.set_prefetcher(prefetcher)
+
+        methods.get_movie(550)
+
+        self.assertEqual(prefetcher.get_statistics()['queued'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+The rate limiting and retry tests.
+"""
+
+from support import APITestCase, FastRetryPolicy
+
+from pythemoviedb.api import methods, ratelimit
+from pythemoviedb.api.error import APIError
+from pythemoviedb.api.transport import Response
+
+import email.utils
+import random
+import time
+import unittest
+
+class RateLimiterTests(unittest.TestCase):
+    """
+    The RateLimiter tests.
+    """
+
+    def test_burst_is_not_delayed(self):
+        rate_limiter = ratelimit.RateLimiter(10, burst=3)
+
+        self.assertEqual([rate_limiter.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertEqual(rate_limiter.get_statistics()['delayed_requests'], 0)
+
+    def test_requests_over_the_burst_are_spaced(self):
+        rate_limiter = ratelimit.RateLimiter(10, burst=1)
+        rate_limiter.reserve()
+
+        self.assertAlmostEqual(rate_limiter.get_delay(), 0.1, places=2)
+        self.assertAlmostEqual(rate_limiter.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(rate_limiter.reserve(), 0.2, places=2)
+
+    def test_get_delay_does_not_reserve(self):
+        rate_limiter = ratelimit.RateLimiter(10, burst=1)
+
+        self.assertEqual(rate_limiter.get_delay(), 0.0)
+        self.assertEqual(rate_limiter.get_delay(), 0.0)
+        self.assertEqual(rate_limiter.reserve(), 0.0)
+
+    def test_pause(self):
+        rate_limiter = ratelimit.RateLimiter(100)
+        rate_limiter.pause(5)
+
+        self.assertGreater(rate_limiter.reserve(), 4.9)
+
+class RetryAfterTests(unittest.TestCase):
+    """
+    The parse_retry_after tests.
+    """
+
+    def test_seconds(self):
+        self.assertEqual(ratelimit.parse_retry_after('3'), 3.0)
+        self.assertEqual(ratelimit.parse_retry_after('-1'), 0.0)
+
+    def test_date(self):
+        delay = ratelimit.parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True))
+
+        self.assertTrue(58 <= delay <= 60, delay)
+
+    def test_invalid(self):
+        self.assertIsNone(ratelimit.parse_retry_after(None))
+        self.assertIsNone(ratelimit.parse_retry_after('soon'))
+
+class RetryPolicyTests(unittest.TestCase):
+    """
+    The RetryPolicy tests.
+    """
+
+    def test_backoff_is_bounded(self):
+        retry_policy = ratelimit.RetryPolicy(max_retries=10, backoff_base=0.5, backoff_max=2.0)
+
+        for attempt in range(10):
+            self.assertTrue(0 <= retry_policy.get_delay(attempt) <= min(2.0, 0.5 * 2 ** attempt))
+
+    def test_retries_are_limited(self):
+        retry_policy = ratelimit.RetryPolicy(max_retries=2)
+
+        self.assertIsNotNone(retry_policy.get_delay(1))
+        self.assertIsNone(retry_policy.get_delay(2))
+        self.assertEqual(retry_policy.get_statistics(), {'retries': 1, 'failures': 1})
+
+    def test_only_transient_statuses_are_retried(self):
+        retry_policy = ratelimit.RetryPolicy()
+
+        self.assertIsNone(retry_policy.get_delay(0, Response(404, 'Not Found', {}, b'')))
+        self.assertEqual(retry_policy.get_delay(0, Response(429, 'Too Many Requests', {'retry-after': '7'}, b'')), 7.0)
+
+class ThrottlingTests(APITestCase):
+    """
+    The tests against a server that throttles half of the requests.
+    """
+
+    server_options = {'throttle_rate': 0.5}
+
+    def setUp(self):
+        super(ThrottlingTests, self).setUp()
+
+        # The server decides which requests are throttled with the random module.
+        random.seed(0)
+
+    def test_throttled_requests_are_retried(self):
+        retry_policy = FastRetryPolicy(max_retries=20)
+        ratelimit.set_retry_policy(retry_policy)
+
+        for _id in range(1, 21):
+            self.assertEqual(methods.get_movie(_id)['id'], _id)
+
+        self.assertGreater(retry_policy.get_statistics()['retries'], 0)
+        self.assertEqual(retry_policy.get_statistics()['failures'], 0)
+        self.assertEqual(sum(event.retries for event in self.events), retry_policy.get_statistics()['retries'])
+
+    def test_retries_give_up(self):
+        ratelimit.set_retry_policy(None)
+
+        with self.assertRaises(APIError) as context:
+            while True:
+                methods.get_movie(1)
+
+        self.assertEqual(context.exception.status_code, 25)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+The request coalescing tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import methods, singleflight
+
+import threading
+import time
+import unittest
+
+def run_threads(count, target):
+    """
+    Run a function in several threads at once, and get their results or exceptions.
+    """
+
+    outcomes = [None] * count
+
+    def run(index):
+        try:
+            outcomes[index] = target()
+        except BaseException as ex:
+            outcomes[index] = ex
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join(5)
+
+    return outcomes
+
+class SingleFlightTests(unittest.TestCase):
+    """
+    The SingleFlight tests.
+    """
+
+    def setUp(self):
+        self.single_flight = singleflight.SingleFlight()
+        self.calls = []
+
+    def slow(self, result=None, error=None):
+        def function():
+            self.calls.append(1)
+            time.sleep(0.1)
+
+            if error is not None:
+                raise error
+
+            return result
+
+        return function
+
+    def test_concurrent_calls_are_coalesced(self):
+        outcomes = run_threads(5, lambda: self.single_flight.do('key', self.slow('result')))
+
+        self.assertEqual(outcomes, ['result'] * 5)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.single_flight.get_statistics(), {'calls': 5, 'coalesced': 4})
+        self.assertFalse(self.single_flight.is_in_flight('key'))
+
+    def test_exceptions_are_shared(self):
+        error = IOError('The API is down')
+        outcomes = run_threads(3, lambda: self.single_flight.do('key', self.slow(error=error)))
+
+        self.assertEqual(outcomes, [error] * 3)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_interrupted_calls_are_made_again(self):
+        calls = []
+
+        def function():
+            calls.append(1)
+            time.sleep(0.1)
+
+            if len(calls) == 1:
+                raise KeyboardInterrupt()
+
+            return 'result'
+
+        outcomes = run_threads(3, lambda: self.single_flight.do('key', function))
+
+        self.assertEqual(len([outcome for outcome in outcomes if isinstance(outcome, KeyboardInterrupt)]), 1)
+        self.assertEqual(outcomes.count('result'), 2)
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(self.single_flight.is_in_flight('key'))
+
+    def test_different_keys_are_not_coalesced(self):
+        keys = iter(range(3))
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                key = next(keys)
+
+            return self.single_flight.do(key, self.slow(key))
+
+        self.assertEqual(sorted(run_threads(3, call)), [0, 1, 2])
+        self.assertEqual(len(self.calls), 3)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        self.single_flight.do('key', self.slow(1))
+        self.single_flight.do('key', self.slow(2))
+
+        self.assertEqual(len(self.calls), 2)
+
+class CoalescedRequestTests(APITestCase):
+    """
+    The tests of the requests coalesced against the fake API server.
+    """
+
+    server_options = {'latency': 0.1}
+
+    def test_identical_requests_are_coalesced(self):
+        outcomes = run_threads(5, lambda: methods.get_movie(550))
+
+        self.assertEqual([movie['id'] for movie in outcomes], [550] * 5)
+        self.assertEqual(len([event for event in self.events if event.coalesced]), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+"""
+The entity store tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import methods, store
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+class EntityStoreTests(unittest.TestCase):
+    """
+    The EntityStore tests.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def open(self, **kwargs):
+        """
+        Open the store of the test directory, and close it at the end of the test.
+        """
+
+        entity_store = store.EntityStore(self.directory, **kwargs)
+        self.addCleanup(entity_store.close)
+
+        return entity_store
+
+    def get(self, entity_store, key):
+        """
+        Get an entry as bytes, or None.
+        """
+
+        body = entity_store.get(key)
+
+        return None if body is None else bytes(body)
+
+    def test_put_and_get(self):
+        entity_store = self.open()
+        entity_store.put('movie/1', b'{"id": 1}')
+        entity_store.put('movie/2', b'{"id": 2}')
+        entity_store.put('movie/1', b'{"id": 1, "title": "Updated"}')
+
+        self.assertEqual(self.get(entity_store, 'movie/1'), b'{"id": 1, "title": "Updated"}')
+        self.assertEqual(self.get(entity_store, 'movie/2'), b'{"id": 2}')
+        self.assertIsNone(self.get(entity_store, 'movie/3'))
+        self.assertEqual(len(entity_store), 2)
+
+    def test_delete(self):
+        entity_store = self.open()
+        entity_store.put('movie/1', b'{"id": 1}')
+        entity_store.delete('movie/1')
+        entity_store.delete('movie/2')
+
+        self.assertIsNone(self.get(entity_store, 'movie/1'))
+        self.assertEqual(len(entity_store), 0)
+
+    def test_stale_entries_are_not_returned(self):
+        entity_store = self.open(max_age=60)
+        entity_store.put('movie/1', b'{"id": 1}', fetched_at=time.time() - 120)
+
+        self.assertIsNone(entity_store.get('movie/1'))
+        self.assertEqual(bytes(entity_store.get_entry('movie/1')[0]), b'{"id": 1}')
+        self.assertEqual(bytes(entity_store.get('movie/1', max_age=600)), b'{"id": 1}')
+        self.assertEqual(entity_store.get_statistics()['stale'], 1)
+
+    def test_reopen(self):
+        entity_store = store.EntityStore(self.directory)
+
+        for _id in range(100):
+            entity_store.put('movie/%s' % _id, ('{"id": %s}' % _id).encode('utf-8'))
+
+        entity_store.delete('movie/0')
+        entity_store.close()
+
+        entity_store = self.open()
+
+        self.assertEqual(len(entity_store), 99)
+        self.assertIsNone(self.get(entity_store, 'movie/0'))
+
+        for _id in range(1, 100):
+            self.assertEqual(self.get(entity_store, 'movie/%s' % _id), ('{"id": %s}' % _id).encode('utf-8'))
+
+    def test_reopen_indexes_the_records_appended_after_the_index(self):
+        entity_store = store.EntityStore(self.directory, index_interval=10)
+
+        # 10 records are in the index file, 5 are only in the data file.
+        for _id in range(15):
+            entity_store.put('movie/%s' % _id, ('{"id": %s}' % _id).encode('utf-8'))
+
+        entity_store._data_file.close()
+        entity_store = self.open()
+
+        self.assertEqual(len(entity_store), 15)
+        self.assertEqual(self.get(entity_store, 'movie/14'), b'{"id": 14}')
+
+    def test_reads_after_an_append_past_the_map(self):
+        entity_store = self.open()
+        entity_store.put('movie/1', b'{"id": 1}')
+
+        self.assertEqual(self.get(entity_store, 'movie/1'), b'{"id": 1}')
+
+        body = b'{"id": 2, "overview": "%s"}' % (b'x' * 100000)
+        entity_store.put('movie/2', body)
+
+        self.assertEqual(self.get(entity_store, 'movie/2'), body)
+        self.assertEqual(self.get(entity_store, 'movie/1'), b'{"id": 1}')
+
+    def test_compaction_keeps_the_latest_versions(self):
+        entity_store = self.open(index_interval=4)
+
+        for version in range(5):
+            for _id in range(5):
+                entity_store.put('movie/%s' % _id, ('{"id": %s, "version": %s}' % (_id, version)).encode('utf-8'))
+
+        entity_store.delete('movie/4')
+        entity_store.put('movie/5', b'{"id": 5}', fetched_at=time.time() - 3600)
+        previous_size = os.path.getsize(entity_store.data_path)
+
+        reclaimed = entity_store.compact(max_age=60)
+
+        self.assertEqual(reclaimed, previous_size - os.path.getsize(entity_store.data_path))
+        self.assertGreater(reclaimed, 0)
+        self.assertEqual(len(entity_store), 4)
+
+        for _id in range(4):
+            self.assertEqual(self.get(entity_store, 'movie/%s' % _id), ('{"id": %s, "version": 4}' % _id).encode('utf-8'))
+
+        self.assertIsNone(self.get(entity_store, 'movie/4'))
+        self.assertIsNone(self.get(entity_store, 'movie/5'))
+
+        entity_store.put('movie/6', b'{"id": 6}')
+        entity_store.close()
+        entity_store = self.open()
+
+        self.assertEqual(len(entity_store), 5)
+        self.assertEqual(self.get(entity_store, 'movie/3'), b'{"id": 3, "version": 4}')
+        self.assertEqual(self.get(entity_store, 'movie/6'), b'{"id": 6}')
+
+    def test_a_truncated_record_is_removed(self):
+        entity_store = store.EntityStore(self.directory)
+        entity_store.put('movie/1', b'{"id": 1}')
+        entity_store.close()
+        size = os.path.getsize(entity_store.data_path)
+
+        # A crash in the middle of an append.
+        with open(entity_store.data_path, 'ab') as data_file:
+            data_file.write(store._RECORD_HEADER.pack(7, 1000, time.time()) + b'movie/2{"id"')
+
+        entity_store = self.open()
+
+        self.assertEqual(os.path.getsize(entity_store.data_path), size)
+        self.assertEqual(len(entity_store), 1)
+        self.assertEqual(self.get(entity_store, 'movie/1'), b'{"id": 1}')
+        self.assertIsNone(self.get(entity_store, 'movie/2'))
+
+        entity_store.put('movie/2', b'{"id": 2}')
+
+        self.assertEqual(self.get(entity_store, 'movie/2'), b'{"id": 2}')
+
+    def test_a_corrupt_index_is_rebuilt(self):
+        entity_store = store.EntityStore(self.directory)
+        entity_store.put('movie/1', b'{"id": 1}')
+        entity_store.put('movie/2', b'{"id": 2}')
+        entity_store.close()
+
+        with open(entity_store.index_path, 'r+b') as index_file:
+            index_file.seek(store._INDEX_HEADER.size + 3)
+            index_file.truncate()
+
+        entity_store = self.open()
+
+        self.assertEqual(len(entity_store), 2)
+        self.assertEqual(self.get(entity_store, 'movie/2'), b'{"id": 2}')
+
+    def test_a_foreign_data_file_is_rejected(self):
+        with open(os.path.join(self.directory, 'entities.dat'), 'wb') as data_file:
+            data_file.write(b'not a store data file')
+
+        self.assertRaises(ValueError, store.EntityStore, self.directory)
+
+class StoredRequestTests(APITestCase):
+    """
+    The tests of the requests answered from the entity store.
+    """
+
+    def setUp(self):
+        super(StoredRequestTests, self).setUp()
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = store.EntityStore(directory)
+        self.addCleanup(self.store.close)
+        store.set_store(self.store)
+
+    def test_entities_are_stored(self):
+        first = methods.get_movie(550)
+        second = methods.get_movie(550)
+
+        self.assertEqual(first, second)
+        self.assertEqual([event.store for event in self.events], ['miss', 'hit'])
+        self.assertIsNotNone(self.store.get(store.make_key('movie', 550)))
+
+    def test_other_actions_are_not_stored(self):
+        self.assertFalse(self.store.accepts('search/movie'))
+        self.assertTrue(self.store.accepts('movie/550'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+The streaming parser tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import methods, streaming
+
+import json
+import unittest
+
+DOCUMENT = u'''{
+    "id": 550,
+    "title": "Fight Club \\"1999\\" \\\\ \\/ \\u00e9\\ud83c\\udfac",
+    "original_title": "Боевой клуб 日本 🎬",
+    "budget": -63000000.5e-2, "popularity": 1E+3, "adult": false, "video": true, "tagline": null,
+    "genres": [{"id": 18, "name": "Drame"}, [1, [2, "]"]], "{"],
+    "empty": {}, "nothing": [],
+    "casts": {
+        "id": 550,
+        "cast": [{"name": "Édouard \\"Ed\\" Norton", "order": 0, "ids": [1, 2.5]}, {"name": "ブラッド", "order": 1}],
+        "crew": []
+    },
+    "results" : [ 1 , "two" , {"three": [3]} , [4] , null ]
+}'''.encode('utf-8')
+
+class SplitStream(object):
+    """
+    A stream that returns predefined chunks, whatever the size that is read.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def read(self, size):
+        return self.chunks.pop(0) if self.chunks else b''
+
+def rebuild(events, arrays=streaming.STREAMED_ARRAYS):
+    """
+    Rebuild a document from the events of a parser.
+    """
+
+    document = {}
+
+    for path, value in events:
+        if not path:
+            return value
+
+        parent = document
+        names = path.split('.')
+
+        for name in names[:-1]:
+            parent = parent.setdefault(name, {})
+
+        if any(path == name or path.endswith('.' + name) for name in arrays):
+            parent.setdefault(names[-1], []).append(value)
+        else:
+            parent[names[-1]] = value
+
+    return document
+
+class StreamParserTests(unittest.TestCase):
+    """
+    The StreamParser tests.
+    """
+
+    def setUp(self):
+        self.expected = json.loads(DOCUMENT.decode('utf-8'))
+
+        # Empty streamed arrays have no events.
+        del self.expected['casts']['crew']
+
+    def parse(self, chunks, chunk_size=streaming.CHUNK_SIZE):
+        return list(streaming.parse(SplitStream(chunks), chunk_size=chunk_size))
+
+    def test_whole_document(self):
+        events = self.parse([DOCUMENT])
+
+        self.assertEqual(rebuild(events), self.expected)
+        self.assertEqual([value for path, value in events if path == 'results'], self.expected['results'])
+        self.assertEqual(len([path for path, value in events if path == 'casts.cast']), 2)
+
+    def test_split_at_every_offset(self):
+        events = self.parse([DOCUMENT])
+
+        for offset in range(1, len(DOCUMENT)):
+            self.assertEqual(self.parse([DOCUMENT[:offset], DOCUMENT[offset:]], chunk_size=8), events, 'Split at offset %s' % offset)
+
+    def test_one_byte_chunks(self):
+        chunks = [DOCUMENT[offset:offset + 1] for offset in range(len(DOCUMENT))]
+
+        for chunk_size in (1, 2, 7, 64):
+            self.assertEqual(rebuild(self.parse(chunks, chunk_size=chunk_size)), self.expected)
+
+    def test_values_that_are_not_streamed(self):
+        for document in (b'[1, 2, {"a": [3]}]', b'"\\u00e9t\\u00e9"', b'-1.5e3', b'[]'):
+            for offset in range(1, len(document)):
+                events = self.parse([document[:offset], document[offset:]], chunk_size=1)
+
+                self.assertEqual(events, [('', json.loads(document.decode('utf-8')))])
+
+    def test_top_level_object_fields(self):
+        document = b'{"a": {"b": [1]}, "c": "\\""}'
+
+        for offset in range(1, len(document)):
+            self.assertEqual(self.parse([document[:offset], document[offset:]], chunk_size=1), [('a', {'b': [1]}), ('c', '"')])
+
+        self.assertEqual(self.parse([b'{}']), [])
+
+    def test_streamed_top_level_array(self):
+        self.assertEqual(list(streaming.parse(SplitStream([b'[{"id": 1}, ', b'{"id": 2}]']), arrays=('',))), [('', {'id': 1}), ('', {'id': 2})])
+
+    def test_invalid_documents(self):
+        for document in (b'{"id": 550', b'{"id": 550}}', b'{"id" 550}', b'{"results": [1 2]}', b'"unterminated', b''):
+            self.assertRaises(ValueError, self.parse, [document])
+
+class StreamRequestTests(APITestCase):
+    """
+    The tests of the requests streamed from the fake API server.
+    """
+
+    def test_stream_matches_the_response(self):
+        events = list(streaming.stream(methods.get_movie, 550, append_to_response=['casts']))
+
+        self.assertEqual(rebuild(events), methods.get_movie(550, append_to_response=['casts']))
+        self.assertGreater(len([path for path, value in events if path == 'casts.cast']), 1)
+        self.assertTrue(self.events[0].response_bytes > 0)
+
+if __name__ == '__main__':
+    unittest.main()
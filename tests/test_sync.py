@@ -0,0 +1,144 @@
+"""
+The incremental synchronization tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb import sync
+from pythemoviedb.api import methods
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+# The fake API server reports 3 pages of 100 changed movies for any period.
+CHANGED_IDS = list(range(300))
+
+class MemorySink(sync.Sink):
+    """
+    A sink that keeps the entities in memory, and may fail after a number of them.
+    """
+
+    def __init__(self, fail_after=None):
+        self.entities = {}
+        self.fail_after = fail_after
+
+    def put(self, kind, _id, data):
+        if self.fail_after is not None and len(self.entities) >= self.fail_after:
+            raise RuntimeError('The sink crashed')
+
+        self.entities[(kind, _id)] = data
+
+    def delete(self, kind, _id):
+        self.entities.pop((kind, _id), None)
+
+class BrokenJSON(object):
+    """
+    A json module whose dump writes half of the document, then fails.
+    """
+
+    load = staticmethod(json.load)
+
+    @staticmethod
+    def dump(data, output_file):
+        document = json.dumps(data)
+        output_file.write(document[:len(document) // 2])
+
+        raise IOError('No space left on device')
+
+class SyncTests(APITestCase):
+    """
+    The ChangeSync tests.
+    """
+
+    def setUp(self):
+        super(SyncTests, self).setUp()
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.state_path = os.path.join(directory, 'state.json')
+        self.windows = set()
+        self.lock = threading.Lock()
+
+    def get_changed_movies(self, **kwargs):
+        """
+        Get the changed movies, and record the requested period.
+        """
+
+        with self.lock:
+            self.windows.add((kwargs['start_date'], kwargs['stop_date']))
+
+        return methods.get_changed_movies(**kwargs)
+
+    def test_long_periods_are_split(self):
+        start_date = datetime.date(2024, 1, 1)
+        ids = sync.get_changed_ids('movie', start_date, start_date + datetime.timedelta(days=40), {'movie': self.get_changed_movies})
+
+        self.assertEqual(ids, CHANGED_IDS)
+        self.assertEqual(sorted(self.windows), [
+            (datetime.date(2024, 1, 1), datetime.date(2024, 1, 15)),
+            (datetime.date(2024, 1, 15), datetime.date(2024, 1, 29)),
+            (datetime.date(2024, 1, 29), datetime.date(2024, 2, 10)),
+        ])
+
+    def test_empty_periods_are_not_requested(self):
+        date = datetime.date(2024, 1, 1)
+
+        self.assertEqual(sync.get_changed_ids('movie', date, date, {'movie': self.get_changed_movies}), [])
+        self.assertEqual(self.windows, set())
+
+    def test_run(self):
+        sink = MemorySink()
+        stop_date = datetime.date(2024, 1, 31)
+        counts = sync.ChangeSync(sink, self.state_path, kinds=('movie',), initial_days=30).run(stop_date)
+
+        self.assertEqual(counts, {'movie': 300})
+        self.assertEqual(sorted(_id for _, _id in sink.entities), CHANGED_IDS)
+        self.assertEqual(sync.SyncState(self.state_path).get('movie'), {'high_water_mark': '2024-01-31', 'stop_date': None, 'pending': []})
+
+        # Nothing changed since the high-water mark.
+        self.assertEqual(sync.ChangeSync(MemorySink(), self.state_path, kinds=('movie',)).run(stop_date), {'movie': 0})
+
+    def test_resume_after_a_crash(self):
+        stop_date = datetime.date(2024, 1, 31)
+        sink = MemorySink(fail_after=120)
+
+        with self.assertRaises(RuntimeError):
+            sync.ChangeSync(sink, self.state_path, kinds=('movie',), concurrency=2, checkpoint_interval=50).run(stop_date)
+
+        state = sync.SyncState(self.state_path).get('movie')
+        fetched = set(_id for _, _id in sink.entities)
+
+        # The last checkpoint is at 100 entities: the entities handed to the sink since are fetched again.
+        self.assertEqual(state['stop_date'], '2024-01-31')
+        self.assertIsNone(state['high_water_mark'])
+        self.assertEqual(len(state['pending']), 200)
+        self.assertEqual(set(state['pending']) | fetched, set(CHANGED_IDS))
+
+        sink = MemorySink()
+        counts = sync.ChangeSync(sink, self.state_path, kinds=('movie',)).run(stop_date)
+        state = sync.SyncState(self.state_path).get('movie')
+
+        self.assertTrue(set(_id for _, _id in sink.entities) >= set(CHANGED_IDS) - fetched)
+        self.assertEqual(counts, {'movie': len(sink.entities)})
+        self.assertEqual(state, {'high_water_mark': '2024-01-31', 'stop_date': None, 'pending': []})
+
+    def test_interrupted_state_write(self):
+        state = sync.SyncState(self.state_path)
+        state.get('movie')['pending'] = [1, 2, 3]
+        state.save()
+
+        self.addCleanup(setattr, sync, 'json', json)
+        sync.json = BrokenJSON
+        state.get('movie')['pending'] = [4]
+
+        self.assertRaises(IOError, state.save)
+        self.assertEqual(sync.SyncState(self.state_path).get('movie')['pending'], [1, 2, 3])
+        self.assertEqual(os.listdir(os.path.dirname(self.state_path)), ['state.json'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+The title index tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import titles
+
+import unittest
+
+FIGHT_CLUB = {
+    'id': 550,
+    'title': 'Fight Club',
+    'original_title': 'Fight Club',
+    'release_date': '1999-10-15',
+    'alternative_titles': {'titles': [{'title': 'El club de la lucha'}]},
+}
+
+SE7EN = {
+    'id': 807,
+    'title': 'Se7en',
+    'original_title': 'Se7en',
+    'release_date': '1995-09-22',
+    'translations': {'translations': [{'data': {'title': u'Sept p\u00e9ch\u00e9s capitaux'}}]},
+}
+
+class FileNameTests(unittest.TestCase):
+    """
+    The normalize_title and parse_file_name tests.
+    """
+
+    def test_normalize_title(self):
+        self.assertEqual(titles.normalize_title(u'Am\u00e9lie & Co.'), u'amelie and co')
+        self.assertEqual(titles.normalize_title(b'Se7en'), u'se7en')
+
+    def test_parse_file_name(self):
+        self.assertEqual(titles.parse_file_name('Fight.Club.1999.1080p.BluRay.x264.mkv'), ('Fight Club', 1999))
+        self.assertEqual(titles.parse_file_name('Se7en (1995).avi'), ('Se7en', 1995))
+        self.assertEqual(titles.parse_file_name('Memento.mkv'), ('Memento', None))
+
+class TitleIndexTests(unittest.TestCase):
+    """
+    The TitleIndex tests.
+    """
+
+    def setUp(self):
+        self.index = titles.TitleIndex()
+        self.index.add_movies([FIGHT_CLUB, SE7EN])
+
+    def test_exact_matches(self):
+        results = self.index.search('fight club')
+
+        self.assertEqual([result['id'] for result in results], [550])
+        self.assertEqual(results[0]['score'], 1.0)
+        self.assertEqual(results[0]['year'], 1999)
+
+    def test_alternative_titles_and_translations_are_indexed(self):
+        self.assertEqual(self.index.search('El Club de la Lucha')[0]['id'], 550)
+        self.assertEqual(self.index.search('Sept peches capitaux')[0]['id'], 807)
+
+    def test_fuzzy_matches(self):
+        results = self.index.search('Fight Clubb', min_score=0.5)
+
+        self.assertEqual(results[0]['id'], 550)
+        self.assertLess(results[0]['score'], 1.0)
+
+    def test_the_minimum_score_does_not_change_the_results(self):
+        for query in ('Fight Clubb', 'Sevn', 'club', 'Sept peches'):
+            expected = [result for result in self.index.search(query) if result['score'] >= 0.4]
+
+            self.assertEqual(self.index.search(query, min_score=0.4), expected)
+
+    def test_years(self):
+        self.assertEqual(self.index.search('Fight Club', year=1999)[0]['score'], 1.0)
+        self.assertEqual(self.index.search('Fight Club', year=2000)[0]['score'], 0.95)
+        self.assertEqual(self.index.search('Fight Club', year=2005), [])
+
+    def test_aliases(self):
+        self.assertIsNone(self.index.search_alias('Project Mayhem'))
+
+        self.index.add_alias('Project Mayhem', None, [550])
+
+        self.assertEqual([result['id'] for result in self.index.search_alias('project mayhem')], [550])
+        self.assertEqual(self.index.get_statistics()['aliases'], 1)
+
+class LookupTests(unittest.TestCase):
+    """
+    The TitleIndex.lookup_or_remember tests.
+    """
+
+    def setUp(self):
+        self.index = titles.TitleIndex()
+        self.index.add_movie(FIGHT_CLUB)
+        self.fetches = []
+
+    def fetch(self):
+        self.fetches.append(True)
+
+        return [SE7EN]
+
+    def test_indexed_titles_are_not_fetched(self):
+        results = self.index.lookup_or_remember('Fight Club', self.fetch)
+
+        self.assertEqual(results[0]['id'], 550)
+        self.assertEqual(self.fetches, [])
+        self.assertEqual(self.index.get_statistics()['hits'], 1)
+
+    def test_fetched_movies_are_remembered(self):
+        first = self.index.lookup_or_remember('Seven', self.fetch)
+        second = self.index.lookup_or_remember('Seven', self.fetch)
+
+        self.assertEqual([result['id'] for result in first], [807])
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.fetches), 1)
+        self.assertEqual(len(self.index), 2)
+
+        statistics = self.index.get_statistics()
+
+        self.assertEqual((statistics['hits'], statistics['misses']), (1, 1))
+
+class SearchMovieTests(APITestCase):
+    """
+    The search_movie tests.
+    """
+
+    def setUp(self):
+        super(SearchMovieTests, self).setUp()
+
+        self.index = titles.TitleIndex()
+
+    def test_the_api_is_searched_once_per_query(self):
+        first = titles.search_movie('Unknown Movie', index=self.index)
+        second = titles.search_movie('Unknown Movie', index=self.index)
+
+        self.assertEqual([result['id'] for result in first], list(range(100, 110)))
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.events), 1)
+
+    def test_the_api_results_are_indexed(self):
+        titles.search_movie('Unknown Movie', index=self.index, limit=20)
+
+        self.assertEqual(titles.search_movie('Result 12', index=self.index)[0]['id'], 112)
+        self.assertEqual(len(self.events), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+The connection pool tests.
+"""
+
+from support import APITestCase
+
+from pythemoviedb.api import methods
+
+import threading
+import unittest
+
+class TransportTests(APITestCase):
+    """
+    The Transport tests.
+    """
+
+    def test_sequential_requests_reuse_the_connection(self):
+        for _id in range(1, 6):
+            self.assertEqual(methods.get_movie(_id)['id'], _id)
+
+        connected = [event for event in self.events if event.connect_time is not None]
+
+        self.assertEqual(len(self.events), 5)
+        self.assertEqual(len(connected), 1)
+
+    def test_concurrent_requests_are_bounded_by_the_pool_size(self):
+        errors = []
+
+        def worker():
+            try:
+                for _id in range(1, 11):
+                    methods.get_movie(_id)
+            except Exception as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        connected = [event for event in self.events if event.connect_time is not None]
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.events), 80)
+        self.assertLessEqual(len(connected), self.transport.pool_size)
+
+    def test_the_transport_can_be_used_after_it_was_closed(self):
+        methods.get_movie(1)
+        self.transport.close()
+
+        self.assertEqual(methods.get_movie(2)['id'], 2)
+
+if __name__ == '__main__':
+    unittest.main()